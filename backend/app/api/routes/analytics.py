@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime, timedelta
 
@@ -21,6 +22,11 @@ from app.schemas.analytics import (
     HiringDemandPrediction
 )
 from app.services.analytics_service import AnalyticsService
+from app.services import analytics_jobs
+from app.services.report_service import generate_report_data
+from app.services import report_export
+from app.services import metrics_collector
+from app.services.analytics_jobs import MODEL_STEPS, run_predictive_models, prediction_fields
 from bson import ObjectId
 import io
 import json
@@ -48,6 +54,7 @@ async def get_executive_dashboard(
 
 @router.get("/dashboard/team-productivity", response_model=List[TeamProductivityMetrics])
 async def get_team_productivity(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="Only count XP from the last N days"),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -58,13 +65,14 @@ async def get_team_productivity(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     analytics_service = AnalyticsService()
-    team_metrics = await analytics_service.get_team_productivity_metrics()
+    team_metrics = await analytics_service.get_team_productivity_metrics(days=days)
     
     return team_metrics
 
 
 @router.get("/dashboard/hiring-pipeline", response_model=HiringPipelineHealth)
 async def get_hiring_pipeline_health(
+    job_posting_id: Optional[str] = Query(None, description="Only candidates for this job posting"),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -74,8 +82,11 @@ async def get_hiring_pipeline_health(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    if job_posting_id and not ObjectId.is_valid(job_posting_id):
+        raise HTTPException(status_code=400, detail="Invalid job posting ID")
+    
     analytics_service = AnalyticsService()
-    pipeline_health = await analytics_service.get_hiring_pipeline_health()
+    pipeline_health = await analytics_service.get_hiring_pipeline_health(job_posting_id)
     
     return pipeline_health
 
@@ -115,6 +126,7 @@ async def list_reports(
             "schedule_frequency": report.get("schedule_frequency"),
             "schedule_time": report.get("schedule_time"),
             "recipients": report.get("recipients", []),
+            "max_age_seconds": report.get("max_age_seconds"),
             "last_generated": report.get("last_generated")
         }
         for report in reports
@@ -141,7 +153,8 @@ async def create_report(
         is_scheduled=report_data.is_scheduled,
         schedule_frequency=report_data.schedule_frequency,
         schedule_time=report_data.schedule_time,
-        recipients=report_data.recipients
+        recipients=report_data.recipients,
+        max_age_seconds=report_data.max_age_seconds
     )
     
     report_dict = report.dict(by_alias=True, exclude_none=True)
@@ -164,6 +177,7 @@ async def create_report(
         "schedule_frequency": created_report.get("schedule_frequency"),
         "schedule_time": created_report.get("schedule_time"),
         "recipients": created_report.get("recipients", []),
+        "max_age_seconds": created_report.get("max_age_seconds"),
         "last_generated": created_report.get("last_generated")
     }
 
@@ -204,6 +218,7 @@ async def get_report(
         "schedule_frequency": report.get("schedule_frequency"),
         "schedule_time": report.get("schedule_time"),
         "recipients": report.get("recipients", []),
+        "max_age_seconds": report.get("max_age_seconds"),
         "last_generated": report.get("last_generated")
     }
 
@@ -232,6 +247,9 @@ async def update_report(
     
     update_data = report_data.dict(exclude_none=True)
     update_data["updated_at"] = datetime.utcnow()
+    if "metrics" in update_data or "filters" in update_data:
+        # Cached data no longer matches the report definition
+        update_data["last_data"] = None
     
     await db.reports.update_one(
         {"_id": ObjectId(report_id)},
@@ -255,6 +273,7 @@ async def update_report(
         "schedule_frequency": updated_report.get("schedule_frequency"),
         "schedule_time": updated_report.get("schedule_time"),
         "recipients": updated_report.get("recipients", []),
+        "max_age_seconds": updated_report.get("max_age_seconds"),
         "last_generated": updated_report.get("last_generated")
     }
 
@@ -288,6 +307,7 @@ async def delete_report(
 @router.post("/reports/{report_id}/generate", response_model=ReportDataResponse)
 async def generate_report(
     report_id: str,
+    force: bool = Query(False, description="Recompute even if the cached data is still fresh"),
     current_user: User = Depends(get_current_user),
     db = Depends(get_db)
 ):
@@ -306,43 +326,18 @@ async def generate_report(
     if current_user.role != "admin" and report["created_by"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    analytics_service = AnalyticsService()
-    
-    # Generate report data based on report type
-    report_data = {}
-    
-    if report["report_type"] == "executive":
-        report_data = await analytics_service.get_executive_dashboard()
-    elif report["report_type"] == "team":
-        report_data = {"teams": await analytics_service.get_team_productivity_metrics()}
-    elif report["report_type"] == "hiring":
-        report_data = await analytics_service.get_hiring_pipeline_health()
-    else:
-        # Custom report - compile requested metrics
-        if "executive_dashboard" in report.get("metrics", []):
-            report_data["executive"] = await analytics_service.get_executive_dashboard()
-        if "team_productivity" in report.get("metrics", []):
-            report_data["teams"] = await analytics_service.get_team_productivity_metrics()
-        if "hiring_pipeline" in report.get("metrics", []):
-            report_data["hiring"] = await analytics_service.get_hiring_pipeline_health()
-    
-    # Cache the generated data
-    await db.reports.update_one(
-        {"_id": ObjectId(report_id)},
-        {"$set": {
-            "last_generated": datetime.utcnow(),
-            "last_data": report_data
-        }}
-    )
+    # Served from last_data while fresh; concurrent calls share one computation
+    report_data, generated_at, cached = await generate_report_data(db, report, force=force)
     
     return {
         "report_id": report_id,
         "report_name": report["report_name"],
-        "generated_at": datetime.utcnow(),
+        "generated_at": generated_at,
         "data": report_data,
         "metadata": {
             "filters": report.get("filters", {}),
-            "visualization_type": report.get("visualization_type", "table")
+            "visualization_type": report.get("visualization_type", "table"),
+            "cached": cached
         }
     }
 
@@ -350,12 +345,13 @@ async def generate_report(
 @router.get("/reports/{report_id}/export")
 async def export_report(
     report_id: str,
-    format: str = Query("json", regex="^(json|csv)$"),
+    format: str = Query("json", regex="^(json|csv|ndjson|parquet)$"),
     current_user: User = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
-    Export report data in various formats (JSON, CSV).
+    Export report data in various formats (JSON, CSV, NDJSON, Parquet).
+    CSV, NDJSON and Parquet are streamed as flattened (section, item, metric, value) rows.
     """
     if not ObjectId.is_valid(report_id):
         raise HTTPException(status_code=400, detail="Invalid report ID")
@@ -369,123 +365,128 @@ async def export_report(
     if current_user.role != "admin" and report["created_by"] != str(current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get cached data or generate new
-    report_data = report.get("last_data")
-    if not report_data:
-        # Generate fresh data
-        analytics_service = AnalyticsService()
-        if report["report_type"] == "executive":
-            report_data = await analytics_service.get_executive_dashboard()
-        elif report["report_type"] == "team":
-            report_data = {"teams": await analytics_service.get_team_productivity_metrics()}
-        elif report["report_type"] == "hiring":
-            report_data = await analytics_service.get_hiring_pipeline_health()
-    
     if format == "json":
+        # Get cached data or generate new
+        report_data, _, _ = await generate_report_data(db, report)
         return report_data
-    elif format == "csv":
-        # Simple CSV conversion for flat data
-        return {"message": "CSV export not yet implemented", "data": report_data}
+    
+    if format == "parquet" and not report_export.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    
+    filename = f"report-{report_id}.{format}"
+    return StreamingResponse(
+        report_export.stream_report(db, report, format),
+        media_type=report_export.EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
-@router.post("/predictive/analyze", response_model=PredictiveAnalyticsResponse)
+@router.post("/predictive/analyze")
 async def run_predictive_analytics(
     request: PredictiveAnalyticsRequest,
+    response: Response,
+    wait: bool = Query(False, description="Run the models inside the request and return the result"),
     current_user: User = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
     Run predictive analytics models.
+    Queues a background job and returns its id (poll /predictive/jobs/{job_id});
+    with ``wait=true`` the models run inside the request as before.
     Admin only access.
     """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    analytics_service = AnalyticsService()
+    if not wait:
+        if request.model_type not in MODEL_STEPS:
+            raise HTTPException(status_code=400, detail=f"Unknown model type: {request.model_type}")
+        job_id = await analytics_jobs.submit_predictive_job(db, request, str(current_user.id))
+        response.status_code = 202
+        return {"job_id": job_id, "status": "queued"}
     
-    response_data = {
-        "model_type": request.model_type,
-        "prediction_date": datetime.utcnow(),
-        "overall_summary": {},
-        "recommendations": []
-    }
-    
-    if request.model_type == "attrition" or request.model_type == "all":
-        attrition_predictions = await analytics_service.predict_employee_attrition()
-        response_data["attrition_predictions"] = attrition_predictions
-        response_data["overall_summary"]["high_risk_employees"] = sum(
-            1 for p in attrition_predictions if p["attrition_risk"] == "High"
-        )
-        
-        if attrition_predictions:
-            response_data["recommendations"].extend([
-                "Schedule retention conversations with high-risk employees",
-                "Review compensation and career growth opportunities",
-                "Implement employee engagement initiatives"
-            ])
-    
-    if request.model_type == "project_risk" or request.model_type == "all":
-        project_risks = await analytics_service.predict_project_risks()
-        response_data["project_risks"] = project_risks
-        response_data["overall_summary"]["at_risk_projects"] = sum(
-            1 for p in project_risks if p["risk_level"] in ["High", "Critical"]
-        )
-        
-        if project_risks:
-            response_data["recommendations"].extend([
-                "Conduct immediate review of high-risk projects",
-                "Reallocate resources to critical projects",
-                "Consider scope reduction or timeline adjustments"
-            ])
-    
-    if request.model_type == "resource_shortage" or request.model_type == "all":
-        resource_shortages = await analytics_service.predict_resource_shortages()
-        response_data["resource_shortages"] = resource_shortages
-        response_data["overall_summary"]["skill_gaps"] = len(resource_shortages)
-        
-        if resource_shortages:
-            response_data["recommendations"].extend([
-                "Initiate hiring for critical skill gaps",
-                "Plan cross-training programs",
-                "Consider contractor support for immediate needs"
-            ])
-    
-    if request.model_type == "hiring_demand" or request.model_type == "all":
-        hiring_demands = await analytics_service.predict_hiring_demand()
-        response_data["hiring_demands"] = hiring_demands
-        response_data["overall_summary"]["predicted_hires"] = sum(
-            h["predicted_openings"] for h in hiring_demands
-        )
-        
-        if hiring_demands:
-            response_data["recommendations"].extend([
-                "Begin recruitment planning for predicted roles",
-                "Update job descriptions and requirements",
-                "Allocate budget for upcoming hiring needs"
-            ])
+    response_data = await run_predictive_models(request)
     
     # Store prediction in database
     prediction = PredictiveModel(
         model_type=request.model_type,
-        predictions=response_data.get("attrition_predictions", []) + 
-                   response_data.get("project_risks", []) +
-                   response_data.get("resource_shortages", []) +
-                   response_data.get("hiring_demands", []),
-        recommendations=response_data["recommendations"],
-        data_points_used=response_data["overall_summary"].get("data_points", 0)
+        requested_by=str(current_user.id),
+        **prediction_fields(response_data)
     )
     
     prediction_dict = prediction.dict(by_alias=True, exclude_none=True)
     await db.predictive_models.insert_one(prediction_dict)
     
-    return response_data
+    return PredictiveAnalyticsResponse(**response_data)
+
+
+@router.post("/predictive/jobs", status_code=202)
+async def submit_predictive_job(
+    request: PredictiveAnalyticsRequest,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Queue a predictive analytics run in the background.
+    Poll /predictive/jobs/{job_id} for progress and the result.
+    Admin only access.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if request.model_type not in MODEL_STEPS:
+        raise HTTPException(status_code=400, detail=f"Unknown model type: {request.model_type}")
+    
+    job_id = await analytics_jobs.submit_predictive_job(db, request, str(current_user.id))
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/predictive/jobs/{job_id}")
+async def get_predictive_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Get status, progress and (once completed) the result of a predictive job.
+    Admin only access.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = await analytics_jobs.get_predictive_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+
+@router.post("/predictive/jobs/{job_id}/retry", status_code=202)
+async def retry_predictive_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Re-run a failed or interrupted predictive job with the same request.
+    The original job is kept; poll the returned job_id instead.
+    Admin only access.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    new_job_id = await analytics_jobs.retry_predictive_job(db, job_id, str(current_user.id))
+    if not new_job_id:
+        raise HTTPException(status_code=409, detail="Job not found or not failed/interrupted")
+    return {"job_id": new_job_id, "status": "queued"}
 
 
 @router.get("/predictive/history")
 async def get_prediction_history(
     current_user: User = Depends(get_current_user),
     db = Depends(get_db),
-    limit: int = Query(10, ge=1, le=50)
+    limit: int = Query(10, ge=1, le=50),
+    include_payload: bool = Query(False, description="Include the full stored result of each run")
 ):
     """
     Get history of predictive analytics runs.
@@ -494,19 +495,26 @@ async def get_prediction_history(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    predictions = await db.predictive_models.find().sort("prediction_date", -1).limit(limit).to_list(None)
+    await analytics_jobs.mark_interrupted_jobs(db)
+    projection = None if include_payload else {"payload": 0}
+    predictions = await db.predictive_models.find({}, projection).sort("prediction_date", -1).limit(limit).to_list(None)
     
-    return [
-        {
+    history = []
+    for p in predictions:
+        entry = {
             "id": str(p["_id"]),
             "model_type": p["model_type"],
             "prediction_date": p["prediction_date"],
+            "status": p.get("status", "completed"),
             "data_points_used": p.get("data_points_used", 0),
             "predictions_count": len(p.get("predictions", [])),
             "recommendations_count": len(p.get("recommendations", []))
         }
-        for p in predictions
-    ]
+        if include_payload:
+            entry["payload"] = p.get("payload")
+        history.append(entry)
+    
+    return history
 
 
 @router.get("/trends")
@@ -514,24 +522,55 @@ async def get_trends(
     current_user: User = Depends(get_current_user),
     db = Depends(get_db),
     metric: str = Query(..., description="Metric to analyze trends for"),
-    days: int = Query(30, ge=7, le=365, description="Number of days to analyze")
+    days: int = Query(30, ge=7, le=365, description="Number of days to analyze"),
+    resolution: Optional[str] = Query(None, regex="^(hour|day|week)$", description="Rollup resolution (chosen from days if omitted)")
 ):
     """
     Get trend analysis for specific metrics over time.
+
+    Collected metrics are read from pre-aggregated rollups, so the number of
+    points is bounded by the resolution rather than the sampling rate; metrics
+    without rollups fall back to the raw analytics_metrics documents.
     """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
-    
-    # Query metrics from database
-    metrics = await db.analytics_metrics.find({
-        "metric_name": metric,
-        "calculated_at": {"$gte": start_date, "$lte": end_date}
-    }).sort("calculated_at", 1).to_list(None)
-    
-    if not metrics:
+    resolution = resolution or metrics_collector.resolution_for_range(days)
+    
+    rollups = await metrics_collector.get_metric_rollups(metric, resolution, start_date, end_date)
+    if rollups:
+        data_points = [
+            {
+                "date": r["bucket_start"].isoformat(),
+                "value": r["sum"] / r["count"] if r["count"] else 0,
+                "metadata": {"min": r["min"], "max": r["max"], "last": r["last"], "samples": r["count"]}
+            }
+            for r in rollups
+        ]
+        min_value = min(r["min"] for r in rollups)
+        max_value = max(r["max"] for r in rollups)
+    else:
+        # Query metrics from database
+        metrics = await db.analytics_metrics.find({
+            "metric_name": metric,
+            "calculated_at": {"$gte": start_date, "$lte": end_date}
+        }).sort("calculated_at", 1).to_list(None)
+        
+        data_points = [
+            {
+                "date": m["calculated_at"].isoformat(),
+                "value": m["metric_value"],
+                "metadata": m.get("metric_metadata", {})
+            }
+            for m in metrics
+        ]
+        min_value = min((d["value"] for d in data_points), default=0)
+        max_value = max((d["value"] for d in data_points), default=0)
+        resolution = "raw"
+    
+    if not data_points:
         return {
             "metric": metric,
             "period_days": days,
@@ -539,19 +578,10 @@ async def get_trends(
             "trend": "insufficient_data"
         }
     
-    data_points = [
-        {
-            "date": m["calculated_at"].isoformat(),
-            "value": m["metric_value"],
-            "metadata": m.get("metric_metadata", {})
-        }
-        for m in metrics
-    ]
-    
     # Calculate trend direction
-    if len(metrics) >= 2:
-        first_value = metrics[0]["metric_value"]
-        last_value = metrics[-1]["metric_value"]
+    if len(data_points) >= 2:
+        first_value = data_points[0]["value"]
+        last_value = data_points[-1]["value"]
         change_percent = ((last_value - first_value) / first_value * 100) if first_value != 0 else 0
         
         if change_percent > 10:
@@ -566,13 +596,14 @@ async def get_trends(
     return {
         "metric": metric,
         "period_days": days,
+        "resolution": resolution,
         "data_points": data_points,
         "trend": trend,
         "summary": {
-            "first_value": data_points[0]["value"] if data_points else 0,
-            "last_value": data_points[-1]["value"] if data_points else 0,
-            "min_value": min(d["value"] for d in data_points) if data_points else 0,
-            "max_value": max(d["value"] for d in data_points) if data_points else 0,
-            "avg_value": sum(d["value"] for d in data_points) / len(data_points) if data_points else 0
+            "first_value": data_points[0]["value"],
+            "last_value": data_points[-1]["value"],
+            "min_value": min_value,
+            "max_value": max_value,
+            "avg_value": sum(d["value"] for d in data_points) / len(data_points)
         }
     }
@@ -3,18 +3,22 @@ GitHub Insights API Routes
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from beanie import PydanticObjectId
 import asyncio
 
 from app.api.deps import get_current_user
+from app.core.cache import cached
+from app.core.config import settings as app_settings
 from app.models import (
     User, Repo, RepositoryMetadata, Branch, Commit, Issue, PullRequest,
     Contributor, Release, Milestone, ProjectBoard, Activity, XPLeaderboard,
     AppSettings
 )
 from app.services.github_insights import GitHubInsightsService
-from app.services.xp_calculator import XPCalculator
+from app.services.github_rate_limit import Priority
+from app.services.xp_calculator import XPCalculator, get_latest_leaderboard
+from app.services.xp_rank import XPRankIndex, get_user_ranks
 from app.schemas.github_insights import (
     RepositoryMetadataOut, BranchOut, CommitOut, IssueOut, PullRequestOut,
     ContributorOut, ReleaseOut, MilestoneOut, ProjectBoardOut, ActivityOut,
@@ -122,7 +126,7 @@ async def get_repository_branches(
         if github_pat and repo.owner and repo.repo_name:
             try:
                 service = GitHubInsightsService(github_pat)
-                await service.sync_branches(repo)
+                await service.sync_branches(repo, full=True)
                 # Re-query after sync
                 results = await query.to_list()
             except Exception:
@@ -170,7 +174,7 @@ async def get_repository_commits(
         if github_pat and repo.owner and repo.repo_name:
             try:
                 service = GitHubInsightsService(github_pat)
-                await service.sync_recent_commits(repo, limit)
+                await service.sync_recent_commits(repo, limit, full=True)
                 # Re-query after sync
                 results = await query.sort(-Commit.author_date).limit(limit).to_list()
             except Exception:
@@ -179,57 +183,157 @@ async def get_repository_commits(
     return results
 
 
+PERIOD_BUCKETS = {
+    "daily": (timedelta(days=1), 30),
+    "weekly": (timedelta(weeks=1), 12),
+    "monthly": (timedelta(days=30), 12),
+}
+MAX_VELOCITY_BUCKETS = 1000
+
+
+def _commit_velocity_pipeline(
+    repo_id: PydanticObjectId,
+    boundaries: List[datetime],
+    breakdown_limit: int
+) -> List[Dict[str, Any]]:
+    """Per-bucket counts plus the author breakdown for commits within the boundaries"""
+    return [
+        {"$match": {
+            "repo_id": repo_id,
+            "author_date": {"$gte": boundaries[0], "$lt": boundaries[-1]}
+        }},
+        {"$facet": {
+            "buckets": [
+                {"$bucket": {
+                    "groupBy": "$author_date",
+                    "boundaries": boundaries,
+                    "output": {
+                        "commit_count": {"$sum": 1},
+                        "authors": {"$addToSet": "$author_login"},
+                        "total_changes": {"$sum": "$total_changes"}
+                    }
+                }}
+            ],
+            "by_author": [
+                {"$group": {
+                    "_id": "$author_login",
+                    "commit_count": {"$sum": 1},
+                    "additions": {"$sum": "$additions"},
+                    "deletions": {"$sum": "$deletions"},
+                    "total_changes": {"$sum": "$total_changes"},
+                    "first_commit": {"$min": "$author_date"},
+                    "last_commit": {"$max": "$author_date"}
+                }},
+                {"$sort": {"commit_count": -1, "_id": 1}},
+                {"$limit": breakdown_limit}
+            ],
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "commit_count": {"$sum": 1},
+                    "authors": {"$addToSet": "$author_login"}
+                }}
+            ]
+        }}
+    ]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored dates are naive UTC; convert aware query parameters to match"""
+    if value and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _velocity_boundaries(start_date: datetime, end_date: datetime, bucket_size: timedelta) -> List[datetime]:
+    """Bucket boundaries from start_date, the last bucket ending at end_date.
+
+    BSON dates only keep milliseconds, so boundaries are whole seconds: the
+    $bucket _ids that come back must equal them to be matched to their bucket.
+    """
+    start_date = start_date.replace(microsecond=0)
+    end_date = end_date.replace(microsecond=0)
+    bucket_size = timedelta(seconds=int(bucket_size.total_seconds()))
+    num_buckets = -(-(end_date - start_date) // bucket_size)  # ceiling division
+    return [start_date + bucket_size * i for i in range(num_buckets)] + [end_date]
+
+
+def _author_count(authors: List[Optional[str]]) -> int:
+    return len([a for a in authors if a])
+
+
 @router.get("/repos/{repo_id}/commit-velocity")
 async def get_commit_velocity(
     repo_id: str,
     period: str = Query(default="weekly", regex="^(daily|weekly|monthly)$"),
+    start: Optional[datetime] = Query(default=None, description="Range start (defaults to the period's usual window before end)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (defaults to now)"),
+    bucket_hours: Optional[int] = Query(default=None, ge=1, le=24 * 366, description="Bucket size in hours (overrides period)"),
+    breakdown_limit: int = Query(default=20, ge=1, le=100),
     current_user: User = Depends(get_current_user)
 ):
-    """Get commit velocity graph data"""
+    """Get commit velocity graph data with a per-author breakdown"""
     repo = await Repo.get(PydanticObjectId(repo_id))
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
     # Calculate time buckets
-    now = datetime.utcnow()
-    if period == "daily":
-        start_date = now - timedelta(days=30)
-        bucket_size = timedelta(days=1)
-        num_buckets = 30
-    elif period == "weekly":
-        start_date = now - timedelta(weeks=12)
-        bucket_size = timedelta(weeks=1)
-        num_buckets = 12
-    else:  # monthly
-        start_date = now - timedelta(days=365)
-        bucket_size = timedelta(days=30)
-        num_buckets = 12
-    
-    # Aggregate commits by time bucket
+    bucket_size, num_buckets = PERIOD_BUCKETS[period]
+    if bucket_hours:
+        bucket_size = timedelta(hours=bucket_hours)
+    end_date = (_naive_utc(end) or datetime.utcnow()).replace(microsecond=0)
+    start_date = (_naive_utc(start) or end_date - bucket_size * num_buckets).replace(microsecond=0)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    num_buckets = -(-(end_date - start_date) // bucket_size)  # ceiling division
+    if num_buckets > MAX_VELOCITY_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range would produce {num_buckets} buckets; use a larger bucket size (max {MAX_VELOCITY_BUCKETS})"
+        )
+    boundaries = _velocity_boundaries(start_date, end_date, bucket_size)
+    
+    results = await Commit.aggregate(_commit_velocity_pipeline(repo.id, boundaries, breakdown_limit)).to_list()
+    facets = results[0] if results else {}
+    
+    # $bucket omits empty buckets, so fill the gaps with zeros
+    found = {row["_id"]: row for row in facets.get("buckets", [])}
     buckets = []
-    for i in range(num_buckets):
-        bucket_start = start_date + (bucket_size * i)
-        bucket_end = bucket_start + bucket_size
-        
-        commits = await Commit.find(
-            Commit.repo_id == repo.id,
-            Commit.author_date >= bucket_start,
-            Commit.author_date < bucket_end
-        ).to_list()
-        
+    for bucket_start, bucket_end in zip(boundaries, boundaries[1:]):
+        row = found.get(bucket_start, {})
         buckets.append({
             "period_start": bucket_start,
             "period_end": bucket_end,
-            "commit_count": len(commits),
-            "unique_authors": len(set(c.author_login for c in commits if c.author_login)),
-            "total_changes": sum(c.total_changes for c in commits)
+            "commit_count": row.get("commit_count", 0),
+            "unique_authors": _author_count(row.get("authors", [])),
+            "total_changes": row.get("total_changes", 0)
         })
     
+    totals = (facets.get("totals") or [{}])[0]
+    total_commits = totals.get("commit_count", 0)
+    
     return {
         "period": period,
+        "start": start_date,
+        "end": end_date,
+        "bucket_hours": bucket_size.total_seconds() / 3600,
         "buckets": buckets,
-        "total_commits": sum(b["commit_count"] for b in buckets),
-        "average_commits": sum(b["commit_count"] for b in buckets) / num_buckets
+        "total_commits": total_commits,
+        "average_commits": total_commits / num_buckets,
+        "unique_authors": _author_count(totals.get("authors", [])),
+        "by_author": [
+            {
+                "author_login": row["_id"],
+                "commit_count": row["commit_count"],
+                "additions": row["additions"],
+                "deletions": row["deletions"],
+                "total_changes": row["total_changes"],
+                "first_commit": row["first_commit"],
+                "last_commit": row["last_commit"]
+            }
+            for row in facets.get("by_author", [])
+        ]
     }
 
 
@@ -288,7 +392,7 @@ async def get_repository_issues(
         if github_pat and repo.owner and repo.repo_name:
             try:
                 service = GitHubInsightsService(github_pat)
-                await service.sync_issues(repo, state)
+                await service.sync_issues(repo, state, full=True)
                 # Re-query after sync
                 results = await query.to_list()
             except Exception:
@@ -351,7 +455,7 @@ async def get_repository_pull_requests(
         if github_pat and repo.owner and repo.repo_name:
             try:
                 service = GitHubInsightsService(github_pat)
-                await service.sync_pull_requests(repo, state)
+                await service.sync_pull_requests(repo, state, full=True)
                 # Re-query after sync
                 results = await query.to_list()
             except Exception:
@@ -371,10 +475,19 @@ async def get_pr_review_stats(
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
+    return await _pr_review_stats(repo.id, period_days)
+
+
+@cached(
+    "github_insights:pull_requests",
+    ttl=app_settings.GITHUB_INSIGHTS_CACHE_SECONDS,
+    depends_on=("pull_requests",),
+)
+async def _pr_review_stats(repo_id: PydanticObjectId, period_days: int) -> Dict[str, Any]:
     since = datetime.utcnow() - timedelta(days=period_days)
     
     prs = await PullRequest.find(
-        PullRequest.repo_id == repo.id,
+        PullRequest.repo_id == repo_id,
         PullRequest.created_at >= since
     ).to_list()
     
@@ -454,7 +567,7 @@ async def get_repository_contributors(
         if github_pat and repo.owner and repo.repo_name:
             try:
                 service = GitHubInsightsService(github_pat)
-                await service.sync_contributors(repo)
+                await service.sync_contributors(repo, full=True)
                 # Re-query after sync
                 results = await query.sort(-Contributor.commits_count).limit(limit).to_list()
             except Exception:
@@ -473,7 +586,16 @@ async def get_contributor_analytics(
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    contributors = await Contributor.find(Contributor.repo_id == repo.id).to_list()
+    return await _contributor_analytics(repo.id)
+
+
+@cached(
+    "github_insights:contributors",
+    ttl=app_settings.GITHUB_INSIGHTS_CACHE_SECONDS,
+    depends_on=("contributors",),
+)
+async def _contributor_analytics(repo_id: PydanticObjectId) -> Dict[str, Any]:
+    contributors = await Contributor.find(Contributor.repo_id == repo_id).to_list()
     
     # Calculate statistics
     total_contributors = len(contributors)
@@ -606,9 +728,15 @@ async def get_activity_feed(
 async def get_xp_leaderboard(
     period: str = Query(default="all-time", regex="^(daily|weekly|monthly|all-time)$"),
     limit: int = Query(default=10, le=50),
+    refresh: bool = Query(default=False, description="Regenerate instead of reusing a recent snapshot"),
     current_user: User = Depends(get_current_user)
 ):
     """Get XP leaderboard"""
+    if not refresh:
+        snapshot = await get_latest_leaderboard(period, limit)
+        if snapshot:
+            return snapshot
+    
     calculator = XPCalculator()
     leaderboard = await calculator.generate_leaderboard(period, limit)
     return leaderboard
@@ -625,6 +753,24 @@ async def get_user_xp_stats(
     return stats
 
 
+@router.get("/xp/user/{user_id}/rank")
+async def get_user_xp_rank(
+    user_id: str,
+    window: str = Query(default="all-time", regex="^(daily|weekly|monthly|all-time)$"),
+    neighbours: int = Query(default=3, ge=0, le=25),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a user's leaderboard position and the users directly around them"""
+    try:
+        user_oid = PydanticObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    result = await XPRankIndex(window).get_neighbours(user_oid, neighbours)
+    result["ranks"] = await get_user_ranks(user_oid)
+    return result
+
+
 @router.post("/repos/{repo_id}/sync-all")
 async def sync_all_repository_data(
     repo_id: str,
@@ -654,18 +800,24 @@ async def sync_all_repository_data(
 
 async def sync_repository_data(repo: Repo, github_pat: str):
     """Background task to sync all repository data"""
-    service = GitHubInsightsService(github_pat)
+    service = GitHubInsightsService(github_pat, priority=Priority.BACKGROUND)
     
     try:
         # Sync all data types
         await service.sync_repository_metadata(repo)
-        await service.sync_branches(repo)
-        await service.sync_recent_commits(repo)
-        await service.sync_issues(repo)
-        await service.sync_pull_requests(repo)
-        await service.sync_contributors(repo)
-        await service.sync_releases(repo)
-        await service.sync_milestones(repo)
+        counts = {
+            "branches": await service.sync_branches(repo),
+            "commits": await service.sync_recent_commits(repo),
+            "issues": await service.sync_issues(repo),
+            "pull_requests": await service.sync_pull_requests(repo),
+            "contributors": await service.sync_contributors(repo),
+            "releases": await service.sync_releases(repo),
+            "milestones": await service.sync_milestones(repo),
+        }
+        summary = ", ".join(
+            f"{entity} +{stats.inserted}/~{stats.updated}/={stats.unchanged}"
+            for entity, stats in counts.items()
+        )
         
         # Create activity entry for successful sync
         await Activity(
@@ -673,7 +825,8 @@ async def sync_repository_data(repo: Repo, github_pat: str):
             event_type="sync_completed",
             actor_login="system",
             title="Repository data synchronized",
-            description=f"Successfully synced all data for {repo.name}",
+            description=f"Successfully synced all data for {repo.name} (inserted/updated/unchanged: {summary})",
+            metadata={"sync_counts": {entity: stats.as_dict() for entity, stats in counts.items()}},
             occurred_at=datetime.utcnow()
         ).insert()
         
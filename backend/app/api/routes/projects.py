@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List, Optional
 from beanie import PydanticObjectId
+from bson import ObjectId
 
 from app.api.deps import get_current_user
 from app.models import Repo, Project, User, AppSettings
@@ -220,48 +221,82 @@ async def get_project_member_stats(project_id: str, current_user: User = Depends
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    members = project.members or []
+    
+    # All member users in one query; ids may be stored as ObjectId or string
+    member_ids = [ObjectId(str(m.user_id)) for m in members if ObjectId.is_valid(str(m.user_id))]
+    user_docs = await User.get_motor_collection().find(
+        {"_id": {"$in": member_ids + [str(oid) for oid in member_ids]}},
+        {"email": 1, "full_name": 1, "position": 1}
+    ).to_list(None)
+    users_by_id = {str(doc["_id"]): doc for doc in user_docs}
+    
+    # Totals, recent activity and skill XP for every member in one aggregation
+    facets = await XPEvent.aggregate([
+        {"$match": {"person_id": {"$in": member_ids}}},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": "$person_id",
+                    "total_xp": {"$sum": "$amount"},
+                    "xp_events_count": {"$sum": 1},
+                    "recent_activity": {"$topN": {
+                        "n": 5,
+                        "sortBy": {"created_at": -1},
+                        "output": {"source": "$source", "amount": "$amount", "created_at": "$created_at"}
+                    }}
+                }}
+            ],
+            "skills": [
+                {"$project": {
+                    "person_id": 1,
+                    "amount": 1,
+                    "skills": {"$objectToArray": {"$ifNull": ["$skill_distribution", {}]}}
+                }},
+                {"$unwind": "$skills"},
+                {"$group": {
+                    "_id": {"person_id": "$person_id", "skill": "$skills.k"},
+                    "xp": {"$sum": {"$multiply": ["$amount", "$skills.v"]}}
+                }}
+            ]
+        }}
+    ]).to_list()
+    facets = facets[0] if facets else {}
+    totals_by_user = {str(row["_id"]): row for row in facets.get("totals", [])}
+    skills_by_user: dict = {}
+    for row in facets.get("skills", []):
+        skills_by_user.setdefault(str(row["_id"]["person_id"]), {})[row["_id"]["skill"]] = row["xp"]
+    
     member_stats = []
-    for member in project.members or []:
-        user = await _get_user_by_id_any(str(member.user_id))
+    for member in members:
+        user = users_by_id.get(str(member.user_id))
         if not user:
             continue
         
-        # Get XP events for this user
-        xp_events = await XPEvent.find(XPEvent.person_id == user.id).to_list()
-        total_xp = sum(event.amount for event in xp_events)
-        
-        # Calculate XP by skill
-        xp_by_skill = {}
-        for event in xp_events:
-            if event.skill_distribution:
-                for skill, amount in event.skill_distribution.items():
-                    xp_by_skill[skill] = xp_by_skill.get(skill, 0) + amount
-        
-        # Get recent activity (last 5 events)
-        recent_events = await XPEvent.find(
-            XPEvent.person_id == user.id
-        ).sort(-XPEvent.created_at).limit(5).to_list()
+        user_id = str(user["_id"])
+        totals = totals_by_user.get(user_id, {})
+        xp_by_skill = skills_by_user.get(user_id, {})
         
         member_stats.append({
-            "user_id": str(user.id),
-            "email": user.email,
-            "full_name": user.full_name or "Unknown",
-            "position": user.position,
+            "user_id": user_id,
+            "email": user.get("email"),
+            "full_name": user.get("full_name") or "Unknown",
+            "position": user.get("position"),
             "role": member.role,
             "added_at": member.added_at.isoformat() if member.added_at else None,
             "stats": {
-                "total_xp": total_xp,
-                "xp_events_count": len(xp_events),
+                "total_xp": totals.get("total_xp", 0),
+                "xp_events_count": totals.get("xp_events_count", 0),
                 "xp_by_skill": xp_by_skill,
                 "top_skill": max(xp_by_skill.items(), key=lambda x: x[1])[0] if xp_by_skill else None,
             },
             "recent_activity": [
                 {
-                    "source": event.source,
-                    "amount": event.amount,
-                    "created_at": event.created_at.isoformat() if event.created_at else None
+                    "source": event.get("source"),
+                    "amount": event.get("amount", 0),
+                    "created_at": event["created_at"].isoformat() if event.get("created_at") else None
                 }
-                for event in recent_events
+                for event in totals.get("recent_activity", [])
             ]
         })
     
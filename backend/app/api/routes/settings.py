@@ -142,32 +142,26 @@ async def test_github_connection(
         )
     
     try:
-        # Test the connection
-        from app.services.github_insights import GitHubInsightsService
-        service = GitHubInsightsService(github_pat)
-        
         # Try to fetch user info to test the token
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {github_pat}",
-                "Accept": "application/vnd.github.v3+json"
+        from app.services.github_client import GitHubRESTClient
+        client = GitHubRESTClient(github_pat)
+        response = await client.request("GET", "/user", expected=(200, 401, 403, 404))
+        if response.status_code == 200:
+            user_data = response.json()
+            budget = client.rate_limiter.budgets.get("core")
+            return {
+                "status": "success",
+                "message": "GitHub connection successful",
+                "user": user_data.get("login"),
+                "scopes": response.headers.get("X-OAuth-Scopes", "").split(", "),
+                "rate_limit": budget.as_dict() if budget else None,
+            }
+        else:
+            error_data = response.json()
+            return {
+                "status": "error",
+                "message": error_data.get("message", "Failed to connect to GitHub")
             }
-            async with session.get("https://api.github.com/user", headers=headers) as response:
-                if response.status == 200:
-                    user_data = await response.json()
-                    return {
-                        "status": "success",
-                        "message": "GitHub connection successful",
-                        "user": user_data.get("login"),
-                        "scopes": response.headers.get("X-OAuth-Scopes", "").split(", ")
-                    }
-                else:
-                    error_data = await response.json()
-                    return {
-                        "status": "error",
-                        "message": error_data.get("message", "Failed to connect to GitHub")
-                    }
     except Exception as e:
         return {
             "status": "error",
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from fastapi.security import OAuth2PasswordBearer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from app.models import User, XPEvent, Project
 from app.schemas.user import UserOut, UserUpdate
@@ -8,6 +8,8 @@ from app.core.config import settings
 from jose import jwt, JWTError
 from beanie import PydanticObjectId
 from app.api.deps import get_current_user
+from app.services.xp_rollup import get_user_totals, decode_skill_xp
+from app.services import org_leaderboard
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/auth/login")
 
@@ -93,57 +95,14 @@ async def list_users(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/leaderboard/organization")
-async def get_organization_leaderboard(current_user: User = Depends(get_current_user)) -> Dict[str, Any]:
+async def get_organization_leaderboard(
+    skip: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    top_n: Optional[int] = Query(default=None, ge=1),
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
     """Get organization-wide XP leaderboard with all user details"""
-    # Get all active users
-    all_users = await User.find(User.is_active == True).to_list()
-    
-    # Calculate XP for each user
-    leaderboard_data = []
-    for user in all_users:
-        xp_events = await XPEvent.find(XPEvent.person_id == user.id).to_list()
-        total_xp = sum(event.amount for event in xp_events)
-        
-        # Get project count
-        projects = await Project.find().to_list()
-        user_projects = [
-            p for p in projects 
-            if any(str(m.user_id) == str(user.id) for m in p.members)
-        ]
-        
-        # Calculate XP by skill
-        xp_by_skill = {}
-        for event in xp_events:
-            if event.skill_distribution:
-                for skill, amount in event.skill_distribution.items():
-                    xp_by_skill[skill] = xp_by_skill.get(skill, 0) + amount
-        
-        leaderboard_data.append({
-            "user_id": str(user.id),
-            "full_name": user.full_name or "Unknown",
-            "email": user.email,
-            "position": user.position or "Employee",
-            "github_username": user.github_username,
-            "role": user.role,
-            "total_xp": total_xp,
-            "project_count": len(user_projects),
-            "xp_events_count": len(xp_events),
-            "top_skill": max(xp_by_skill.items(), key=lambda x: x[1])[0] if xp_by_skill else None,
-            "top_skill_xp": max(xp_by_skill.values()) if xp_by_skill else 0
-        })
-    
-    # Sort by total XP descending
-    leaderboard_data.sort(key=lambda x: x["total_xp"], reverse=True)
-    
-    # Add rank
-    for idx, entry in enumerate(leaderboard_data, 1):
-        entry["rank"] = idx
-    
-    return {
-        "leaderboard": leaderboard_data,
-        "total_users": len(leaderboard_data),
-        "total_xp": sum(entry["total_xp"] for entry in leaderboard_data)
-    }
+    return await org_leaderboard.get_organization_leaderboard(skip=skip, limit=limit, top_n=top_n)
 
 
 @router.get("/{user_id}/profile")
@@ -154,8 +113,8 @@ async def get_user_profile(user_id: str, current_user: User = Depends(get_curren
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get total XP
-    xp_events = await XPEvent.find(XPEvent.person_id == target_user.id).to_list()
-    total_xp = sum(event.amount for event in xp_events)
+    totals = await get_user_totals(target_user.id)
+    total_xp = totals.total_xp if totals else 0
     
     # Get project count (projects where user is a member)
     projects = await Project.find().to_list()
@@ -169,12 +128,9 @@ async def get_user_profile(user_id: str, current_user: User = Depends(get_curren
         XPEvent.person_id == target_user.id
     ).sort(-XPEvent.created_at).limit(10).to_list()
     
-    # Calculate XP by skill
-    xp_by_skill = {}
-    for event in xp_events:
-        if event.skill_distribution:
-            for skill, amount in event.skill_distribution.items():
-                xp_by_skill[skill] = xp_by_skill.get(skill, 0) + amount
+    # XP earned per skill (amount * skill weight, summed over events), as
+    # XPCalculator reports it; before the rollup this summed the raw weights
+    xp_by_skill = decode_skill_xp(totals.skill_xp) if totals else {}
     
     return {
         "user": UserOut(
@@ -189,7 +145,7 @@ async def get_user_profile(user_id: str, current_user: User = Depends(get_curren
         "stats": {
             "total_xp": total_xp,
             "project_count": len(user_projects),
-            "xp_events_count": len(xp_events),
+            "xp_events_count": totals.event_count if totals else 0,
             "xp_by_skill": xp_by_skill
         },
         "projects": [
@@ -0,0 +1,260 @@
+"""
+Application cache - shared read-through cache for expensive reads
+
+Values live in an in-process LRU with per-entry TTLs, or in Redis when
+REDIS_URL is set so every worker shares them. Async functions opt in with
+``@cached(namespace, ttl)``: keys are built from the namespace, its current
+version and the call's arguments, and concurrent misses for the same key share
+a single computation. ``invalidate(namespace)`` bumps the namespace version, so
+every key built before it is unreachable at once (old entries just expire) and
+computations started before it are not stored. Functions declare the
+collections they read with ``depends_on`` and are invalidated by the change events (app.core.events)
+published for writes to them, so TTLs only bound staleness from writes that
+bypass the event bus.
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.core.events import ChangeEvent, subscribe
+
+try:  # Redis backend is optional
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache"
+
+_MISS = object()
+
+
+class MemoryCache:
+    """In-process LRU cache with a TTL per entry.
+
+    Values are copied on the way in and out so callers can mutate results
+    without corrupting the cached copy.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    async def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    async def bump(self, namespace: str) -> None:
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        # Old versions are unreachable; free their slots now rather than waiting for the LRU
+        prefix = _namespace_prefix(namespace)
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISS
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISS
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Redis-backed cache shared by every worker; values are pickled.
+
+    Namespace versions are Redis counters, so an invalidation in one worker is
+    seen by all of them with a single INCR and no key scans.
+    """
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url)
+
+    async def version(self, namespace: str) -> int:
+        raw = await self._redis.get(f"{_namespace_prefix(namespace)}version")
+        return int(raw) if raw is not None else 0
+
+    async def bump(self, namespace: str) -> None:
+        await self._redis.incr(f"{_namespace_prefix(namespace)}version")
+
+    async def get(self, key: str) -> Any:
+        raw = await self._redis.get(key)
+        return _MISS if raw is None else pickle.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self._redis.set(key, pickle.dumps(value), ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_backend = None
+
+# Versioned cache key -> in-flight computation shared by concurrent callers
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def get_cache():
+    """The configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        if settings.REDIS_URL and aioredis is not None:
+            _backend = RedisCache(settings.REDIS_URL)
+            logger.info("Using Redis cache backend")
+        else:
+            if settings.REDIS_URL:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using in-process cache")
+            _backend = MemoryCache(settings.CACHE_MAX_ENTRIES)
+    return _backend
+
+
+async def close_cache() -> None:
+    global _backend
+    if isinstance(_backend, RedisCache):
+        await _backend.close()
+    _backend = None
+
+
+def _namespace_prefix(namespace: str) -> str:
+    return f"{KEY_PREFIX}:{namespace}:"
+
+
+def make_key(*parts: Any) -> str:
+    """Key within a namespace; the parts are hashed so keys stay short whatever the arguments"""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+async def _versioned_key(namespace: str, key: str) -> Tuple[int, str]:
+    version = await get_cache().version(namespace)
+    return version, f"{_namespace_prefix(namespace)}v{version}:{key}"
+
+
+async def invalidate(*namespaces: str) -> None:
+    """Make every cached value in the given namespaces unreachable"""
+    cache = get_cache()
+    for namespace in namespaces:
+        try:
+            await cache.bump(namespace)
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {namespace}: {e}")
+
+
+async def get_or_compute(namespace: str, key: str, ttl: int, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Cached value for ``key`` in ``namespace``, computing and storing it on a miss.
+
+    Concurrent misses for the same key in this process await one computation.
+    A result is not stored if its namespace was invalidated while computing.
+    Backend errors are logged and treated as misses so the cache never fails a read.
+    """
+    cache = get_cache()
+    try:
+        version, full_key = await _versioned_key(namespace, key)
+        value = await cache.get(full_key)
+    except Exception as e:
+        logger.warning(f"Cache read failed for {namespace}: {e}")
+        return await compute()
+    if value is not _MISS:
+        return value
+
+    task = _inflight.get(full_key)
+    if task is None:
+        async def _compute_and_store() -> Any:
+            result = await compute()
+            try:
+                if await cache.version(namespace) == version:
+                    await cache.set(full_key, result, ttl)
+            except Exception as e:
+                logger.warning(f"Cache write failed for {namespace}: {e}")
+            return result
+
+        task = asyncio.create_task(_compute_and_store())
+        _inflight[full_key] = task
+        task.add_done_callback(lambda done: _inflight.pop(full_key, None) if _inflight.get(full_key) is done else None)
+
+    # Shielded so one caller disconnecting does not cancel the others' result
+    result = await asyncio.shield(task)
+    return copy.deepcopy(result)
+
+
+def cached(
+    namespace: str,
+    ttl: Optional[int] = None,
+    key: Optional[Callable[..., Any]] = None,
+    depends_on: Iterable[str] = (),
+):
+    """Read-through caching for an async function or method.
+
+    The key is built from the call's bound arguments (``self``/``cls`` are
+    skipped), or from ``key(*args, **kwargs)`` when given. Changes to any
+    collection in ``depends_on`` invalidate the namespace. The wrapper gains
+    ``invalidate(*args, **kwargs)`` for a single entry and
+    ``invalidate_all()`` for the whole namespace.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+        skip_first = next(iter(signature.parameters), None) in ("self", "cls")
+
+        def _key(*args: Any, **kwargs: Any) -> str:
+            if key is not None:
+                return make_key(key(*args, **kwargs))
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            items = list(bound.arguments.items())
+            if skip_first:
+                items = items[1:]
+            return make_key(func.__qualname__, tuple(items))
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await get_or_compute(
+                namespace,
+                _key(*args, **kwargs),
+                ttl or settings.CACHE_DEFAULT_TTL_SECONDS,
+                lambda: func(*args, **kwargs),
+            )
+
+        async def _invalidate(*args: Any, **kwargs: Any) -> None:
+            try:
+                _, full_key = await _versioned_key(namespace, _key(*args, **kwargs))
+                await get_cache().delete(full_key)
+            except Exception as e:
+                logger.warning(f"Cache invalidation failed for {namespace}: {e}")
+
+        async def _invalidate_all() -> None:
+            await invalidate(namespace)
+
+        async def _on_change(event: ChangeEvent) -> None:
+            await invalidate(namespace)
+
+        subscribe(depends_on, _on_change)
+
+        wrapper.invalidate = _invalidate
+        wrapper.invalidate_all = _invalidate_all
+        wrapper.cache_namespace = namespace
+        return wrapper
+
+    return decorator
@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List
 import os
-from pydantic import Field
+from pydantic import Field, model_validator
 
 
 class Settings(BaseSettings):
@@ -44,5 +44,49 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: str | None = os.getenv("SMTP_FROM_EMAIL")
     SMTP_USE_TLS: bool = os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes")
 
+    # XP leaderboard snapshots younger than this are reused instead of regenerated
+    LEADERBOARD_CACHE_SECONDS: int = int(os.getenv("LEADERBOARD_CACHE_SECONDS", "300"))
+    # Background leaderboard snapshots (every period, rebuilt on an interval)
+    LEADERBOARD_SNAPSHOT_INTERVAL_SECONDS: int = int(os.getenv("LEADERBOARD_SNAPSHOT_INTERVAL_SECONDS", "300"))
+    LEADERBOARD_SNAPSHOT_SIZE: int = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", "50"))
+    LEADERBOARD_SNAPSHOT_RETENTION: int = int(os.getenv("LEADERBOARD_SNAPSHOT_RETENTION", "24"))  # kept per period
+
+    # Analytics reports: cached data older than this is regenerated (reports may override)
+    REPORT_MAX_AGE_SECONDS: int = int(os.getenv("REPORT_MAX_AGE_SECONDS", "900"))
+    REPORT_SCHEDULER_INTERVAL_SECONDS: int = int(os.getenv("REPORT_SCHEDULER_INTERVAL_SECONDS", "60"))
+
+    # Dashboard metric samples feeding /analytics/trends (raw samples expire, rollups are kept)
+    METRICS_COLLECTION_INTERVAL_SECONDS: int = int(os.getenv("METRICS_COLLECTION_INTERVAL_SECONDS", "900"))
+    METRICS_SAMPLE_RETENTION_DAYS: int = int(os.getenv("METRICS_SAMPLE_RETENTION_DAYS", "30"))
+
+    # Shared read cache: Redis when REDIS_URL is set, in-process LRU otherwise.
+    # Cached reads are invalidated by change events. Those only reach every worker through
+    # Redis or change streams, so the long TTLs default on only with one of them; otherwise
+    # the short TTLs bound how stale another worker's write leaves this worker's cache
+    REDIS_URL: str | None = os.getenv("REDIS_URL")
+    CACHE_DEFAULT_TTL_SECONDS: int = int(os.getenv("CACHE_DEFAULT_TTL_SECONDS", "60"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    ANALYTICS_CACHE_SECONDS: int | None = None  # 900 shared / 120 per process
+    GITHUB_INSIGHTS_CACHE_SECONDS: int | None = None  # 1800 shared / 300 per process
+    # Connections kept open to api.github.com, shared by every token
+    GITHUB_MAX_CONNECTIONS: int = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+    # Per-token pacing of GitHub requests; background syncs leave the reserve to interactive requests
+    GITHUB_REQUESTS_PER_SECOND: int = int(os.getenv("GITHUB_REQUESTS_PER_SECOND", "10"))
+    GITHUB_REQUEST_BURST: int = int(os.getenv("GITHUB_REQUEST_BURST", "20"))
+    GITHUB_RATE_LIMIT_RESERVE: int = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "200"))
+    GITHUB_RATE_LIMIT_RETRIES: int = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))
+    GITHUB_INTERACTIVE_MAX_WAIT_SECONDS: int = int(os.getenv("GITHUB_INTERACTIVE_MAX_WAIT_SECONDS", "30"))
+    # Also publish change events from a MongoDB change stream (replica sets only)
+    CHANGE_STREAMS_ENABLED: bool = os.getenv("CHANGE_STREAMS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    @model_validator(mode="after")
+    def _default_cache_ttls(self) -> "Settings":
+        shared = bool(self.REDIS_URL) or self.CHANGE_STREAMS_ENABLED
+        if self.ANALYTICS_CACHE_SECONDS is None:
+            self.ANALYTICS_CACHE_SECONDS = 900 if shared else 120
+        if self.GITHUB_INSIGHTS_CACHE_SECONDS is None:
+            self.GITHUB_INSIGHTS_CACHE_SECONDS = 1800 if shared else 300
+        return self
+
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,85 @@
+"""
+Change events - in-process bus announcing writes to MongoDB collections
+
+Documents that mix in ``ChangeEventsMixin`` publish a ``ChangeEvent`` after
+every insert, save, update or delete made through Beanie. Code that writes
+around Beanie (bulk writes, raw motor updates) publishes with
+``publish_change``. Subscribers, such as cached aggregates, register the
+collections they depend on with ``subscribe``. When change streams are enabled
+(app.db.change_streams), writes made by other processes are published too.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+import logging
+
+from beanie import after_event, Insert, Replace, Save, SaveChanges, Update, Delete
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    collection: str
+    operation: str  # insert, update, delete
+    document_id: Optional[str] = None
+    source: str = "app"  # app, bulk, change_stream
+    occurred_at: datetime = field(default_factory=datetime.utcnow)
+
+
+ChangeHandler = Callable[[ChangeEvent], Awaitable[None]]
+
+_subscribers: Dict[str, List[ChangeHandler]] = defaultdict(list)
+
+
+def subscribe(collections: Iterable[str], handler: ChangeHandler) -> None:
+    """Call ``handler`` for every change to any of ``collections``"""
+    for collection in collections:
+        if handler not in _subscribers[collection]:
+            _subscribers[collection].append(handler)
+
+
+def subscribed_collections() -> Set[str]:
+    return {collection for collection, handlers in _subscribers.items() if handlers}
+
+
+async def publish(event: ChangeEvent) -> None:
+    """Deliver an event to its collection's subscribers; handler errors are logged, not raised"""
+    for handler in list(_subscribers.get(event.collection, ())):
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"Change handler failed for {event.collection} {event.operation}: {e}")
+
+
+async def publish_change(
+    collection: str,
+    operation: str = "update",
+    document_id: Optional[str] = None,
+    source: str = "app",
+) -> None:
+    await publish(ChangeEvent(collection, operation, document_id, source))
+
+
+class ChangeEventsMixin:
+    """Beanie document mixin publishing a ChangeEvent after each write"""
+
+    async def _publish_change(self, operation: str) -> None:
+        await publish_change(
+            type(self).get_collection_name(),
+            operation,
+            str(self.id) if self.id is not None else None,
+        )
+
+    @after_event(Insert)
+    async def _publish_insert(self) -> None:
+        await self._publish_change("insert")
+
+    @after_event(Replace, Save, SaveChanges, Update)
+    async def _publish_update(self) -> None:
+        await self._publish_change("update")
+
+    @after_event(Delete)
+    async def _publish_delete(self) -> None:
+        await self._publish_change("delete")
@@ -0,0 +1,75 @@
+"""
+Change Streams - republish MongoDB change events on the in-process event bus
+
+Hooks only see writes made by this process. With CHANGE_STREAMS_ENABLED (and a
+replica set or sharded cluster), one database-level change stream watches every
+collection that has subscribers and publishes its changes, so caches are also
+invalidated by writes from other workers, scripts and the shell.
+"""
+import asyncio
+from typing import Any, Dict, List
+import logging
+from fastapi import FastAPI
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.core.events import ChangeEvent, publish, subscribed_collections
+from app.db.mongo import get_client
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = {"insert": "insert", "update": "update", "replace": "update", "delete": "delete"}
+RETRY_SECONDS = 5
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def _watch_pipeline() -> List[Dict[str, Any]]:
+    return [
+        {"$match": {
+            "ns.coll": {"$in": sorted(subscribed_collections())},
+            "operationType": {"$in": list(OPERATIONS)},
+        }},
+        {"$project": {"ns": 1, "operationType": 1, "documentKey": 1}},
+    ]
+
+
+async def _watch_loop(app: FastAPI) -> None:
+    db = get_client()[settings.MONGODB_DB]
+    resume_token = None
+    try:
+        while True:
+            try:
+                async with db.watch(_watch_pipeline(), resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        document_key = change.get("documentKey") or {}
+                        await publish(ChangeEvent(
+                            collection=change["ns"]["coll"],
+                            operation=OPERATIONS[change["operationType"]],
+                            document_id=str(document_key["_id"]) if "_id" in document_key else None,
+                            source="change_stream",
+                        ))
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning("Change streams need a replica set; relying on in-process change events")
+                    return
+                logger.error(f"Change stream failed: {e}")
+                resume_token = None
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted: {e}")
+            await asyncio.sleep(RETRY_SECONDS)
+    except asyncio.CancelledError:
+        return
+
+
+def start_change_streams(app: FastAPI) -> None:
+    if not settings.CHANGE_STREAMS_ENABLED:
+        return
+    app.state.change_streams = asyncio.create_task(_watch_loop(app))
+
+
+def stop_change_streams(app: FastAPI) -> None:
+    task = getattr(app.state, "change_streams", None)
+    if task:
+        task.cancel()
@@ -0,0 +1,70 @@
+"""
+Migrations - one-off schema fixes applied at startup, before init_beanie
+
+The GitHub sync upserts each document by a natural key (see the BulkUpserter
+calls in app.services.github_insights). Those keys used to be indexed without
+``unique``, so concurrent syncs could insert the same item twice. Before
+Beanie creates the unique indexes, duplicates are removed (the oldest document,
+which upserts kept updating, is kept) and the old non-unique index is dropped,
+since MongoDB will not replace an index of the same name with different options.
+Collections that already have the unique index are skipped, so this costs one
+listIndexes per collection once it has run.
+"""
+from typing import Sequence, Tuple, Type
+import logging
+from beanie import Document
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+from app.models import Branch, Commit, Issue, PullRequest, Contributor, Release, Milestone
+
+logger = logging.getLogger(__name__)
+
+SYNC_KEYS: Sequence[Tuple[Type[Document], Tuple[str, ...]]] = (
+    (Branch, ("repo_id", "name")),
+    (Commit, ("repo_id", "sha")),
+    (Issue, ("repo_id", "number")),
+    (PullRequest, ("repo_id", "number")),
+    (Contributor, ("repo_id", "login")),
+    (Release, ("repo_id", "github_id")),
+    (Milestone, ("repo_id", "number")),
+)
+
+
+async def _dedupe_collection(db: AsyncIOMotorDatabase, name: str, fields: Tuple[str, ...]) -> None:
+    collection = db[name]
+    key = [(field, 1) for field in fields]
+    existing = [
+        (index_name, info) for index_name, info in (await collection.index_information()).items()
+        if list(info["key"]) == key
+    ]
+    if any(info.get("unique") for _, info in existing):
+        return
+
+    removed = 0
+    duplicates = collection.aggregate(
+        [
+            {"$sort": {"_id": 1}},
+            {"$group": {"_id": {field: f"${field}" for field in fields}, "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}},
+        ],
+        allowDiskUse=True,
+    )
+    async for group in duplicates:
+        result = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    if removed:
+        logger.info(f"Removed {removed} duplicate {name} documents")
+
+    for index_name, _ in existing:
+        try:
+            await collection.drop_index(index_name)
+        except OperationFailure as e:
+            # Another worker dropped it first
+            logger.debug(f"Could not drop index {name}.{index_name}: {e}")
+
+
+async def dedupe_sync_keys(db: AsyncIOMotorDatabase) -> None:
+    """Make the GitHub sync upsert keys unique-indexable"""
+    for model, fields in SYNC_KEYS:
+        await _dedupe_collection(db, model.Settings.name, fields)
@@ -3,6 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 
 from app.core.config import settings
+from app.db.migrations import dedupe_sync_keys
 from app.models import (
     User,
     Candidate,
@@ -19,6 +20,9 @@ from app.models import (
     Task,
     XPEvent,
     XPConfiguration,
+    XPUserTotals,
+    XPPeriodTotals,
+    XPRankBucket,
     AppSettings,
     RepositoryMetadata,
     Branch,
@@ -31,6 +35,7 @@ from app.models import (
     ProjectBoard,
     Activity,
     XPLeaderboard,
+    GitHubSyncCursor,
     Message,
     Channel,
     Announcement,
@@ -52,6 +57,7 @@ async def init_mongo() -> None:
     global _client
     _client = AsyncIOMotorClient(settings.MONGODB_URI)
     db = _client[settings.MONGODB_DB]
+    await dedupe_sync_keys(db)
     await init_beanie(
         database=db,
         document_models=[
@@ -70,6 +76,9 @@ async def init_mongo() -> None:
             Task,
             XPEvent,
             XPConfiguration,
+            XPUserTotals,
+            XPPeriodTotals,
+            XPRankBucket,
             AppSettings,
             RepositoryMetadata,
             Branch,
@@ -82,6 +91,7 @@ async def init_mongo() -> None:
             ProjectBoard,
             Activity,
             XPLeaderboard,
+            GitHubSyncCursor,
             Message,
             Channel,
             Announcement,
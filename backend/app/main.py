@@ -3,11 +3,18 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.cache import close_cache
+from app.services.github_client import close_http_client
 from app.api.router import api_router
 from app.db.mongo import init_mongo
+from app.db.change_streams import start_change_streams, stop_change_streams
 from app.models import User
 from app.core.security import get_password_hash
 from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.leaderboard_scheduler import start_leaderboard_scheduler, stop_leaderboard_scheduler
+from app.services.report_scheduler import start_report_scheduler, stop_report_scheduler
+from app.services.metrics_collector import start_metrics_collector, stop_metrics_collector
+from app.services.xp_rollup import ensure_rank_buckets
 import os
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
@@ -26,6 +33,7 @@ app.add_middleware(
 async def on_startup():
     # Initialize Mongo + Beanie
     await init_mongo()
+    await ensure_rank_buckets()
     # Seed admin if not exists
     admin_email = "admin@cogniwork.dev"
     existing = await User.find_one(User.email == admin_email)
@@ -42,11 +50,21 @@ async def on_startup():
         pass
     # Start background scheduler
     start_scheduler(app)
+    start_leaderboard_scheduler(app)
+    start_report_scheduler(app)
+    start_metrics_collector(app)
+    start_change_streams(app)
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
     stop_scheduler(app)
+    stop_leaderboard_scheduler(app)
+    stop_report_scheduler(app)
+    stop_metrics_collector(app)
+    stop_change_streams(app)
+    await close_cache()
+    await close_http_client()
 
 
 @app.get("/")
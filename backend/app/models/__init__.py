@@ -7,7 +7,7 @@ from app.models.repo import Repo
 from app.models.project import Project
 from app.models.task import Task
 from app.models.form import Form, FormResponse
-from app.models.xp import XPEvent, XPSource, XPConfiguration
+from app.models.xp import XPEvent, XPSource, XPConfiguration, XPUserTotals, XPPeriodTotals, XPRankBucket
 from app.models.settings import AppSettings
 from app.models.github_data import (
     RepositoryMetadata,
@@ -21,6 +21,7 @@ from app.models.github_data import (
     ProjectBoard,
     Activity,
     XPLeaderboard,
+    GitHubSyncCursor,
     IssueState,
     PRState
 )
@@ -46,10 +47,10 @@ __all__ = [
     "User", "Candidate", "InterviewNote", "HiringStage", "JobRole", "Repo", "Project", "Task", "Form", "FormResponse",
     "HiringTask", "TaskSubmission", "OnboardingTask", "TaskType", "TaskStatus",
     "JobPosting", "JobStatus", "JobType",
-    "XPEvent", "XPSource", "XPConfiguration", "AppSettings",
+    "XPEvent", "XPSource", "XPConfiguration", "XPUserTotals", "XPPeriodTotals", "XPRankBucket", "AppSettings",
     "RepositoryMetadata", "Branch", "Commit", "Issue", "PullRequest", 
     "Contributor", "Release", "Milestone", "ProjectBoard", "Activity",
-    "XPLeaderboard", "IssueState", "PRState",
+    "XPLeaderboard", "GitHubSyncCursor", "IssueState", "PRState",
     "Message", "Attachment", "Channel", "Announcement", "Notification",
     "NotificationPreference", "EmailTemplate",
     "PerformanceReview", "Goal", "OneOnOneMeeting", "PerformanceImprovementPlan",
@@ -49,6 +49,7 @@ class Report(BaseModel):
     schedule_frequency: Optional[str] = None
     schedule_time: Optional[str] = None
     recipients: List[str] = Field(default_factory=list)
+    max_age_seconds: Optional[int] = None  # Serve last_data while younger than this
     last_generated: Optional[datetime] = None
     last_data: Optional[Dict[str, Any]] = None
     
@@ -73,6 +74,17 @@ class PredictiveModel(BaseModel):
     recommendations: List[str] = Field(default_factory=list)
     action_items: List[Dict[str, Any]] = Field(default_factory=list)
     
+    # Background job state (runs submitted via /predictive/jobs)
+    status: str = "completed"  # queued, running, completed, failed, interrupted
+    progress: Dict[str, Any] = Field(default_factory=dict)
+    request: Optional[Dict[str, Any]] = None  # Submitted PredictiveAnalyticsRequest, for re-runs
+    payload: Optional[Dict[str, Any]] = None  # Full PredictiveAnalyticsResponse body
+    error: Optional[str] = None
+    requested_by: Optional[str] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None  # Refreshed while the job's process is alive
+    finished_at: Optional[datetime] = None
+    
     model_config = {
         "populate_by_name": True,
         "arbitrary_types_allowed": True,
@@ -4,6 +4,8 @@ from beanie import Document, PydanticObjectId
 from pydantic import EmailStr, Field
 from enum import Enum
 
+from app.core.events import ChangeEventsMixin
+
 
 class HiringStage(str, Enum):
     """Hiring pipeline stages"""
@@ -36,7 +38,7 @@ class InterviewNote(Document):
         name = "interview_notes"
 
 
-class Candidate(Document):
+class Candidate(ChangeEventsMixin, Document):
     """Candidate/Applicant in the hiring pipeline"""
     # Basic Information
     full_name: str
@@ -5,8 +5,11 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from beanie import Document, PydanticObjectId
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from enum import Enum
 
+from app.core.events import ChangeEventsMixin
+
 
 class IssueState(str, Enum):
     OPEN = "open"
@@ -19,7 +22,7 @@ class PRState(str, Enum):
     MERGED = "merged"
 
 
-class RepositoryMetadata(Document):
+class RepositoryMetadata(ChangeEventsMixin, Document):
     """Extended repository metadata from GitHub"""
     repo_id: PydanticObjectId  # Reference to our Repo model
     github_id: int
@@ -67,7 +70,7 @@ class RepositoryMetadata(Document):
         ]
 
 
-class Branch(Document):
+class Branch(ChangeEventsMixin, Document):
     """Branch information"""
     repo_id: PydanticObjectId
     name: str
@@ -90,6 +93,7 @@ class Branch(Document):
     class Settings:
         name = "branches"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("name", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "name",
             "is_default",
@@ -97,7 +101,7 @@ class Branch(Document):
         ]
 
 
-class Commit(Document):
+class Commit(ChangeEventsMixin, Document):
     """Commit information"""
     repo_id: PydanticObjectId
     sha: str
@@ -126,6 +130,7 @@ class Commit(Document):
     class Settings:
         name = "commits"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("sha", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "sha",
             "author_login",
@@ -134,7 +139,7 @@ class Commit(Document):
         ]
 
 
-class Issue(Document):
+class Issue(ChangeEventsMixin, Document):
     """Issue tracking"""
     repo_id: PydanticObjectId
     github_id: int
@@ -174,6 +179,7 @@ class Issue(Document):
     class Settings:
         name = "issues"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("number", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "github_id",
             "number",
@@ -183,7 +189,7 @@ class Issue(Document):
         ]
 
 
-class PullRequest(Document):
+class PullRequest(ChangeEventsMixin, Document):
     """Pull Request tracking"""
     repo_id: PydanticObjectId
     github_id: int
@@ -248,6 +254,7 @@ class PullRequest(Document):
     class Settings:
         name = "pull_requests"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("number", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "github_id",
             "number",
@@ -258,7 +265,7 @@ class PullRequest(Document):
         ]
 
 
-class Contributor(Document):
+class Contributor(ChangeEventsMixin, Document):
     """Contributor analytics"""
     repo_id: PydanticObjectId
     login: str
@@ -308,6 +315,7 @@ class Contributor(Document):
     class Settings:
         name = "contributors"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("login", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "login",
             "github_id",
@@ -316,7 +324,7 @@ class Contributor(Document):
         ]
 
 
-class Release(Document):
+class Release(ChangeEventsMixin, Document):
     """Release and tag tracking"""
     repo_id: PydanticObjectId
     github_id: int
@@ -345,6 +353,7 @@ class Release(Document):
     class Settings:
         name = "releases"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("github_id", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "github_id",
             "tag_name",
@@ -352,7 +361,7 @@ class Release(Document):
         ]
 
 
-class Milestone(Document):
+class Milestone(ChangeEventsMixin, Document):
     """Milestone tracking for roadmap"""
     repo_id: PydanticObjectId
     github_id: int
@@ -379,6 +388,7 @@ class Milestone(Document):
     class Settings:
         name = "milestones"
         indexes = [
+            IndexModel([("repo_id", ASCENDING), ("number", ASCENDING)], unique=True),  # Sync upsert key
             "repo_id",
             "github_id",
             "number",
@@ -387,7 +397,7 @@ class Milestone(Document):
         ]
 
 
-class ProjectBoard(Document):
+class ProjectBoard(ChangeEventsMixin, Document):
     """GitHub Projects v2 board tracking"""
     repo_id: PydanticObjectId
     github_id: int
@@ -421,7 +431,7 @@ class ProjectBoard(Document):
         ]
 
 
-class Activity(Document):
+class Activity(ChangeEventsMixin, Document):
     """Activity feed events"""
     repo_id: PydanticObjectId
     event_type: str  # commit, pr_opened, pr_merged, issue_opened, issue_closed, review, release, etc.
@@ -454,7 +464,7 @@ class Activity(Document):
         ]
 
 
-class XPLeaderboard(Document):
+class XPLeaderboard(ChangeEventsMixin, Document):
     """XP leaderboard snapshot"""
     period: str  # daily, weekly, monthly, all-time
     period_start: datetime
@@ -467,6 +477,7 @@ class XPLeaderboard(Document):
     # Stats
     total_participants: int = 0
     total_xp_awarded: int = 0
+    entry_limit: Optional[int] = None  # Row limit the snapshot was generated with
     
     # Generated at
     generated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -476,5 +487,31 @@ class XPLeaderboard(Document):
         indexes = [
             "period",
             "period_start",
-            "generated_at"
+            "generated_at",
+            IndexModel([("period", ASCENDING), ("generated_at", DESCENDING)])
+        ]
+
+
+class GitHubSyncCursor(Document):
+    """Where the last sync of one entity of a repository left off"""
+    repo_id: PydanticObjectId
+    entity: str  # branches, commits, issues:<state>, pull_requests:<state>, contributors, releases, milestones:<state>
+    
+    # Progress markers
+    last_updated_at: Optional[datetime] = None  # Newest updated_at (or commit date) seen
+    last_sha: Optional[str] = None  # Newest commit seen
+    
+    # Validators of the list's first page for conditional requests
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Validators and item count of every page, for lists whose changes can land on
+    # any page (branches, contributors, releases, milestones)
+    pages: List[Dict[str, Any]] = Field(default_factory=list)
+    
+    synced_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "github_sync_cursors"
+        indexes = [
+            IndexModel([("repo_id", ASCENDING), ("entity", ASCENDING)], unique=True)
         ]
@@ -3,6 +3,8 @@ from typing import Optional, List
 from beanie import Document, PydanticObjectId
 from pydantic import Field, BaseModel
 
+from app.core.events import ChangeEventsMixin
+
 
 class ProjectMember(BaseModel):
     user_id: PydanticObjectId
@@ -16,7 +18,7 @@ class ProjectNotifications(BaseModel):
     discord_webhook_url: Optional[str] = None
 
 
-class Project(Document):
+class Project(ChangeEventsMixin, Document):
     name: str
     status: str = "active"
     description: Optional[str] = None
@@ -4,8 +4,10 @@ from beanie import Document, PydanticObjectId
 from pydantic import EmailStr, Field
 from bson import ObjectId
 
+from app.core.events import ChangeEventsMixin
 
-class User(Document):
+
+class User(ChangeEventsMixin, Document):
     email: EmailStr
     full_name: Optional[str] = None
     hashed_password: str
@@ -2,8 +2,11 @@ from datetime import datetime
 from typing import Optional, Dict
 from beanie import Document, PydanticObjectId
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from enum import Enum
 
+from app.core.events import ChangeEventsMixin
+
 
 class XPSource(str, Enum):
     """XP event sources with defined values"""
@@ -27,7 +30,7 @@ class XPSource(str, Enum):
     DOCUMENTATION = "documentation"  # +2 XP
 
 
-class XPEvent(Document):
+class XPEvent(ChangeEventsMixin, Document):
     person_id: PydanticObjectId
     source: str  # pr_merged, issue_closed, review, etc.
     amount: int = 0
@@ -57,7 +60,74 @@ class XPEvent(Document):
             "source",
             "repo_id",
             "github_username",
-            "created_at"
+            "created_at",
+            # Per-person activity by source over a time window
+            IndexModel([("person_id", ASCENDING), ("source", ASCENDING), ("created_at", DESCENDING)])
+        ]
+
+
+class XPUserTotals(Document):
+    """Per-user XP rollup, kept current with $inc on every XPEvent insert"""
+    user_id: PydanticObjectId
+    total_xp: int = 0
+    event_count: int = 0
+    
+    # Breakdowns (skill keys are encoded, see app.services.xp_rollup)
+    skill_xp: Dict[str, float] = Field(default_factory=dict)
+    source_counts: Dict[str, int] = Field(default_factory=dict)
+    
+    # Time buckets: {"2024-05-01": 12}, {"2024-W18": 40}, {"2024-05": 120}
+    daily_xp: Dict[str, int] = Field(default_factory=dict)
+    weekly_xp: Dict[str, int] = Field(default_factory=dict)
+    monthly_xp: Dict[str, int] = Field(default_factory=dict)
+    
+    # Streak state, advanced incrementally as events arrive
+    streak_last_day: Optional[str] = None  # "2024-05-01"
+    streak_days: int = 0  # Consecutive active days ending on streak_last_day
+    
+    last_event_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "xp_user_totals"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+            IndexModel([("total_xp", DESCENDING)]),
+        ]
+
+
+class XPPeriodTotals(Document):
+    """Per-user XP within one calendar leaderboard window, indexed for rank lookups"""
+    window: str  # daily, weekly, monthly
+    period_key: str  # same keys as the XPUserTotals time buckets
+    user_id: PydanticObjectId
+    total_xp: int = 0
+    expires_at: datetime  # TTL: old periods are dropped by MongoDB
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "xp_period_totals"
+        indexes = [
+            IndexModel([("window", ASCENDING), ("period_key", ASCENDING), ("user_id", ASCENDING)], unique=True),
+            IndexModel([("window", ASCENDING), ("period_key", ASCENDING), ("total_xp", DESCENDING)]),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+class XPRankBucket(Document):
+    """Number of users whose XP in one leaderboard window falls in one fixed-width bucket"""
+    window: str  # all-time, daily, weekly, monthly
+    period_key: str = ""  # same keys as XPPeriodTotals; "" for all-time
+    bucket: int  # total_xp // RANK_BUCKET_WIDTH (app.services.xp_rollup)
+    users: int = 0
+    expires_at: Optional[datetime] = None  # TTL for calendar windows, as on XPPeriodTotals
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "xp_rank_buckets"
+        indexes = [
+            IndexModel([("window", ASCENDING), ("period_key", ASCENDING), ("bucket", DESCENDING)], unique=True),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
         ]
 
 
@@ -65,6 +65,7 @@ class ReportCreate(BaseModel):
     schedule_frequency: Optional[str] = None
     schedule_time: Optional[str] = None
     recipients: List[str] = Field(default_factory=list)
+    max_age_seconds: Optional[int] = Field(None, ge=0)
 
 
 class ReportUpdate(BaseModel):
@@ -77,6 +78,7 @@ class ReportUpdate(BaseModel):
     schedule_frequency: Optional[str] = None
     schedule_time: Optional[str] = None
     recipients: Optional[List[str]] = None
+    max_age_seconds: Optional[int] = Field(None, ge=0)
 
 
 class ReportResponse(BaseModel):
@@ -94,6 +96,7 @@ class ReportResponse(BaseModel):
     schedule_frequency: Optional[str]
     schedule_time: Optional[str]
     recipients: List[str]
+    max_age_seconds: Optional[int] = None
     last_generated: Optional[datetime]
 
 
@@ -109,6 +112,7 @@ class PredictiveAnalyticsRequest(BaseModel):
     model_type: str
     time_horizon_days: int = 90
     include_recommendations: bool = True
+    include_github_signals: bool = False  # Fold synced commits/PRs into project risk
 
 
 class AttritionPrediction(BaseModel):
@@ -0,0 +1,281 @@
+"""
+Predictive Analytics Jobs - background runs of the predictive models
+
+A job is a predictive_models document that moves from queued to running to
+completed (or failed). The models of a run execute concurrently and share
+intermediate results (hiring demand reuses the resource shortage output), and
+progress is written to the job document as each model finishes. The finished
+response body is stored on the job as ``payload``.
+
+Jobs run in the process that accepted them and refresh ``heartbeat_at`` while
+it is alive. A queued or running job whose heartbeat stops (its process
+restarted or died) is marked interrupted when read, and failed or interrupted
+jobs can be re-run from the request stored on them.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from bson import ObjectId
+import logging
+
+from app.models.analytics import PredictiveModel
+from app.schemas.analytics import PredictiveAnalyticsRequest
+from app.services.analytics_service import AnalyticsService
+
+logger = logging.getLogger(__name__)
+
+MODEL_STEPS = {
+    "attrition": ["attrition"],
+    "project_risk": ["project_risk"],
+    "resource_shortage": ["resource_shortage"],
+    "hiring_demand": ["hiring_demand"],
+    "all": ["attrition", "project_risk", "resource_shortage", "hiring_demand"],
+}
+
+HEARTBEAT_SECONDS = 30
+# A queued or running job without a heartbeat for this long lost its process
+STALE_AFTER = timedelta(seconds=4 * HEARTBEAT_SECONDS)
+RETRYABLE_STATUSES = ("failed", "interrupted")
+
+# Keeps running jobs referenced until they finish
+_running_jobs: Set[asyncio.Task] = set()
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+
+async def run_predictive_models(
+    request: PredictiveAnalyticsRequest,
+    on_step_done: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """Run the requested models concurrently and build the PredictiveAnalyticsResponse body"""
+    analytics_service = AnalyticsService()
+    steps = MODEL_STEPS.get(request.model_type, [])
+
+    async def _step(name: str, coro: Awaitable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        result = await coro
+        if on_step_done:
+            await on_step_done(name)
+        return result
+
+    tasks: Dict[str, asyncio.Task] = {}
+    shortages: Optional[asyncio.Future] = None
+    if "attrition" in steps:
+        tasks["attrition"] = asyncio.ensure_future(
+            _step("attrition", analytics_service.predict_employee_attrition())
+        )
+    if "project_risk" in steps:
+        tasks["project_risk"] = asyncio.ensure_future(
+            _step("project_risk", analytics_service.predict_project_risks(request.include_github_signals))
+        )
+    if "resource_shortage" in steps or "hiring_demand" in steps:
+        shortages = asyncio.ensure_future(analytics_service.predict_resource_shortages())
+        if "resource_shortage" in steps:
+            tasks["resource_shortage"] = asyncio.ensure_future(_step("resource_shortage", shortages))
+        if "hiring_demand" in steps:
+            async def _hiring_demand() -> List[Dict[str, Any]]:
+                return await analytics_service.predict_hiring_demand(skill_gaps=await asyncio.shield(shortages))
+            tasks["hiring_demand"] = asyncio.ensure_future(_step("hiring_demand", _hiring_demand()))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except Exception:
+        for task in [*tasks.values(), shortages]:
+            if task:
+                task.cancel()
+        raise
+
+    response_data = {
+        "model_type": request.model_type,
+        "prediction_date": datetime.utcnow(),
+        "overall_summary": {},
+        "recommendations": []
+    }
+
+    if "attrition" in tasks:
+        attrition_predictions = tasks["attrition"].result()
+        response_data["attrition_predictions"] = attrition_predictions
+        response_data["overall_summary"]["high_risk_employees"] = sum(
+            1 for p in attrition_predictions if p["attrition_risk"] == "High"
+        )
+
+        if attrition_predictions:
+            response_data["recommendations"].extend([
+                "Schedule retention conversations with high-risk employees",
+                "Review compensation and career growth opportunities",
+                "Implement employee engagement initiatives"
+            ])
+
+    if "project_risk" in tasks:
+        project_risks = tasks["project_risk"].result()
+        response_data["project_risks"] = project_risks
+        response_data["overall_summary"]["at_risk_projects"] = sum(
+            1 for p in project_risks if p["risk_level"] in ["High", "Critical"]
+        )
+
+        if project_risks:
+            response_data["recommendations"].extend([
+                "Conduct immediate review of high-risk projects",
+                "Reallocate resources to critical projects",
+                "Consider scope reduction or timeline adjustments"
+            ])
+
+    if "resource_shortage" in tasks:
+        resource_shortages = tasks["resource_shortage"].result()
+        response_data["resource_shortages"] = resource_shortages
+        response_data["overall_summary"]["skill_gaps"] = len(resource_shortages)
+
+        if resource_shortages:
+            response_data["recommendations"].extend([
+                "Initiate hiring for critical skill gaps",
+                "Plan cross-training programs",
+                "Consider contractor support for immediate needs"
+            ])
+
+    if "hiring_demand" in tasks:
+        hiring_demands = tasks["hiring_demand"].result()
+        response_data["hiring_demands"] = hiring_demands
+        response_data["overall_summary"]["predicted_hires"] = sum(
+            h["predicted_openings"] for h in hiring_demands
+        )
+
+        if hiring_demands:
+            response_data["recommendations"].extend([
+                "Begin recruitment planning for predicted roles",
+                "Update job descriptions and requirements",
+                "Allocate budget for upcoming hiring needs"
+            ])
+
+    return response_data
+
+
+def prediction_fields(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The predictive_models fields recorded for a finished run"""
+    return {
+        "prediction_date": response_data["prediction_date"],
+        "predictions": response_data.get("attrition_predictions", []) +
+                       response_data.get("project_risks", []) +
+                       response_data.get("resource_shortages", []) +
+                       response_data.get("hiring_demands", []),
+        "recommendations": response_data["recommendations"],
+        "data_points_used": response_data["overall_summary"].get("data_points", 0),
+        "payload": response_data,
+    }
+
+
+async def submit_predictive_job(db, request: PredictiveAnalyticsRequest, requested_by: str) -> str:
+    """Queue a predictive run and start it in the background; returns the job id"""
+    steps = MODEL_STEPS.get(request.model_type, [])
+    job = PredictiveModel(
+        model_type=request.model_type,
+        status="queued",
+        progress={"completed": 0, "total": len(steps), "steps": {step: "pending" for step in steps}},
+        request=request.dict(),
+        requested_by=requested_by,
+        heartbeat_at=datetime.utcnow()
+    )
+    job_dict = job.dict(by_alias=True, exclude_none=True)
+    await db.predictive_models.insert_one(job_dict)
+
+    task = asyncio.create_task(_run_job(db, job_dict["_id"], request))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    return str(job_dict["_id"])
+
+
+async def _heartbeat(db, job_id: ObjectId) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        await db.predictive_models.update_one(
+            {"_id": job_id},
+            {"$set": {"heartbeat_at": datetime.utcnow()}}
+        )
+
+
+async def _run_job(db, job_id: ObjectId, request: PredictiveAnalyticsRequest) -> None:
+    heartbeat = asyncio.create_task(_heartbeat(db, job_id))
+    try:
+        await _execute_job(db, job_id, request)
+    finally:
+        heartbeat.cancel()
+
+
+async def _execute_job(db, job_id: ObjectId, request: PredictiveAnalyticsRequest) -> None:
+    now = datetime.utcnow()
+    await db.predictive_models.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "running", "started_at": now, "heartbeat_at": now}}
+    )
+
+    async def _step_done(step: str) -> None:
+        await db.predictive_models.update_one(
+            {"_id": job_id},
+            {"$set": {f"progress.steps.{step}": "done"}, "$inc": {"progress.completed": 1}}
+        )
+
+    try:
+        response_data = await run_predictive_models(request, on_step_done=_step_done)
+    except Exception as e:
+        logger.exception(f"Predictive job {job_id} failed")
+        await db.predictive_models.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+        )
+        return
+
+    await db.predictive_models.update_one(
+        {"_id": job_id},
+        {"$set": {
+            **prediction_fields(response_data),
+            "status": "completed",
+            "finished_at": datetime.utcnow()
+        }}
+    )
+
+
+async def mark_interrupted_jobs(db, query: Optional[Dict[str, Any]] = None) -> int:
+    """Mark queued/running jobs whose heartbeat stopped as interrupted; returns how many"""
+    now = datetime.utcnow()
+    result = await db.predictive_models.update_many(
+        {
+            **(query or {}),
+            "status": {"$in": ["queued", "running"]},
+            "heartbeat_at": {"$lt": now - STALE_AFTER}
+        },
+        {"$set": {"status": "interrupted", "error": "Job stopped before finishing", "finished_at": now}}
+    )
+    return result.modified_count
+
+
+async def get_predictive_job(db, job_id: str) -> Optional[Dict[str, Any]]:
+    if not ObjectId.is_valid(job_id):
+        return None
+    await mark_interrupted_jobs(db, {"_id": ObjectId(job_id)})
+    job = await db.predictive_models.find_one({"_id": ObjectId(job_id)})
+    if not job:
+        return None
+    return {
+        "id": str(job["_id"]),
+        "model_type": job["model_type"],
+        "status": job.get("status", "completed"),
+        "progress": job.get("progress", {}),
+        "error": job.get("error"),
+        "prediction_date": job.get("prediction_date"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "can_retry": job.get("status") in RETRYABLE_STATUSES and bool(job.get("request")),
+        "result": job.get("payload") if job.get("status", "completed") == "completed" else None
+    }
+
+
+async def retry_predictive_job(db, job_id: str, requested_by: str) -> Optional[str]:
+    """Re-run a failed or interrupted job as a new job; None if it cannot be re-run"""
+    if not ObjectId.is_valid(job_id):
+        return None
+    await mark_interrupted_jobs(db, {"_id": ObjectId(job_id)})
+    job = await db.predictive_models.find_one(
+        {"_id": ObjectId(job_id), "status": {"$in": list(RETRYABLE_STATUSES)}, "request": {"$ne": None}},
+        {"request": 1}
+    )
+    if not job:
+        return None
+    return await submit_predictive_job(db, PredictiveAnalyticsRequest(**job["request"]), requested_by)
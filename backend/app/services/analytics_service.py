@@ -1,7 +1,20 @@
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from app.models import User, Project, XPEvent, Candidate
-import statistics
+from app.models import User, Project, XPEvent, XPSource, Candidate
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.core.cache import cached
+from app.core.config import settings
+from app.services.hiring_pipeline import PIPELINE_STAGES, MS_PER_DAY, STAGE_LABELS, get_pipeline_health, stage_values
+
+
+def _facet_value(facets: Dict[str, Any], key: str) -> Any:
+    """Read the ``n`` value of a single-row facet, defaulting to 0 when the facet matched nothing"""
+    rows = facets.get(key) or []
+    return rows[0]["n"] if rows else 0
 
 
 class AnalyticsService:
@@ -9,78 +22,145 @@ class AnalyticsService:
         # Using Beanie ODM instead of raw Motor
         pass
         
+    @cached(
+        "analytics:executive",
+        ttl=settings.ANALYTICS_CACHE_SECONDS,
+        depends_on=("users", "projects", "candidates", "xp_events"),
+    )
     async def get_executive_dashboard(self) -> Dict[str, Any]:
-        """Calculate all executive dashboard KPIs"""
+        """Calculate all executive dashboard KPIs.
+
+        Each collection is summarised by a single ``$facet`` aggregation, so the
+        dashboard costs one round trip per collection regardless of data volume.
+        """
         now = datetime.utcnow()
         week_ago = now - timedelta(days=7)
         month_ago = now - timedelta(days=30)
-        
+        two_months_ago = now - timedelta(days=60)
+
+        user_facets, project_facets, candidate_facets, xp_facets = await asyncio.gather(
+            self._run_facets(User, {
+                "total": [{"$count": "n"}],
+                "active": [{"$match": {"is_active": True}}, {"$count": "n"}],
+                "joined_last_month": [
+                    {"$match": {"created_at": {"$gte": two_months_ago, "$lt": month_ago}}},
+                    {"$count": "n"},
+                ],
+                "joined_this_month": [
+                    {"$match": {"created_at": {"$gte": month_ago}}},
+                    {"$count": "n"},
+                ],
+            }),
+            self._run_facets(Project, {
+                "total": [{"$count": "n"}],
+                "active": [
+                    {"$match": {"status": {"$in": ["active", "in_progress"]}}},
+                    {"$count": "n"},
+                ],
+                "on_track": [
+                    {"$match": {"status": "active", "health": {"$in": ["good", "excellent"]}}},
+                    {"$count": "n"},
+                ],
+                "at_risk": [
+                    {"$match": {"health": {"$in": ["at_risk", "critical"]}}},
+                    {"$count": "n"},
+                ],
+                "completed": [
+                    {"$match": {"status": "completed", "end_date": {"$gte": month_ago}}},
+                    {"$count": "n"},
+                ],
+                "started": [
+                    {"$match": {"start_date": {"$gte": month_ago}}},
+                    {"$count": "n"},
+                ],
+            }),
+            self._run_facets(Candidate, {
+                "total": [{"$count": "n"}],
+                "by_stage": [
+                    {"$match": {"current_stage": {"$in": stage_values(*PIPELINE_STAGES)}}},
+                    {"$group": {"_id": "$current_stage", "n": {"$sum": 1}}},
+                ],
+                "time_to_hire": [
+                    {"$match": {
+                        "current_stage": {"$in": stage_values("Hired")},
+                        "created_at": {"$ne": None},
+                        "updated_at": {"$ne": None},
+                    }},
+                    {"$group": {
+                        "_id": None,
+                        "n": {"$avg": {"$floor": {"$divide": [
+                            {"$subtract": ["$updated_at", "$created_at"]},
+                            MS_PER_DAY,
+                        ]}}},
+                    }},
+                ],
+                "offered": [
+                    {"$match": {"stage_history.stage": {"$in": stage_values("Offer")}}},
+                    {"$count": "n"},
+                ],
+                "moved_this_week": [
+                    # History entries carry an ISO "timestamp" string; older ones a changed_at date
+                    {"$match": {"stage_history": {"$elemMatch": {"$or": [
+                        {"timestamp": {"$gte": week_ago.isoformat()}},
+                        {"changed_at": {"$gte": week_ago}},
+                    ]}}}},
+                    {"$count": "n"},
+                ],
+            }),
+            self._run_facets(XPEvent, {
+                "total_xp": [{"$group": {"_id": None, "n": {"$sum": "$amount"}}}],
+                "commits_this_week": [
+                    {"$match": {"source": XPSource.COMMIT.value, "created_at": {"$gte": week_ago}}},
+                    {"$count": "n"},
+                ],
+                "prs_this_week": [
+                    {"$match": {"source": XPSource.PR_MERGED.value, "created_at": {"$gte": week_ago}}},
+                    {"$count": "n"},
+                ],
+            }),
+        )
+
         # Employee metrics
-        total_employees = await User.find_all().count()
-        active_employees = await User.find({"is_active": True}).count()
-        
+        total_employees = _facet_value(user_facets, "total")
+        active_employees = _facet_value(user_facets, "active")
+
         # Project metrics
-        total_projects = await Project.find_all().count()
-        active_projects = await Project.find({"status": {"$in": ["active", "in_progress"]}}).count()
-        projects_on_track = await Project.find({"status": "active", "health": {"$in": ["good", "excellent"]}}).count()
-        projects_at_risk = await Project.find({"health": {"$in": ["at_risk", "critical"]}}).count()
-        
+        total_projects = _facet_value(project_facets, "total")
+        active_projects = _facet_value(project_facets, "active")
+        projects_on_track = _facet_value(project_facets, "on_track")
+        projects_at_risk = _facet_value(project_facets, "at_risk")
+
         # XP and productivity metrics
-        xp_events = await XPEvent.find_all().to_list()
-        total_org_xp = sum(event.amount for event in xp_events)
+        total_org_xp = _facet_value(xp_facets, "total_xp")
         avg_xp_per_employee = total_org_xp / active_employees if active_employees > 0 else 0
-        
-        # GitHub activity this week
-        commits_this_week = await XPEvent.find({
-            "source": "commit",
-            "earned_at": {"$gte": week_ago}
-        }).count()
-        prs_merged_this_week = await XPEvent.find({
-            "source": "pull_request",
-            "earned_at": {"$gte": week_ago}
-        }).count()
-        
+        commits_this_week = _facet_value(xp_facets, "commits_this_week")
+        prs_merged_this_week = _facet_value(xp_facets, "prs_this_week")
+
         # Hiring pipeline metrics
-        total_candidates = await Candidate.find_all().count()
-        candidates_by_stage = {}
-        stages = ["Applied", "Screening", "Interview", "Technical Assessment", "Offer", "Hired", "Rejected"]
-        for stage in stages:
-            count = await Candidate.find({"current_stage": stage}).count()
-            candidates_by_stage[stage] = count
-        
-        # Time to hire calculation
-        hired_candidates = await Candidate.find({"current_stage": "Hired"}).to_list()
-        avg_time_to_hire_days = 0
-        if hired_candidates:
-            time_diffs = []
-            for candidate in hired_candidates:
-                if candidate.created_at and candidate.updated_at:
-                    days = (candidate.updated_at - candidate.created_at).days
-                    time_diffs.append(days)
-            avg_time_to_hire_days = statistics.mean(time_diffs) if time_diffs else 0
-        
+        total_candidates = _facet_value(candidate_facets, "total")
+        candidates_by_stage = {stage: 0 for stage in PIPELINE_STAGES}
+        for row in candidate_facets.get("by_stage", []):
+            candidates_by_stage[STAGE_LABELS[row["_id"]]] += row["n"]
+        avg_time_to_hire_days = _facet_value(candidate_facets, "time_to_hire") or 0
+
         # Offer acceptance rate
-        offered_count = await Candidate.find({"stage_history": {"$elemMatch": {"stage": "Offer"}}}).count()
+        offered_count = _facet_value(candidate_facets, "offered")
         hired_count = candidates_by_stage.get("Hired", 0)
         offer_acceptance_rate = (hired_count / offered_count * 100) if offered_count > 0 else 0
-        
+
         # Growth rates (compare last month to previous month)
-        two_months_ago = now - timedelta(days=60)
-        employees_last_month = await User.find({"created_at": {"$gte": two_months_ago, "$lt": month_ago}}).count()
-        employees_this_month = await User.find({"created_at": {"$gte": month_ago}}).count()
+        employees_last_month = _facet_value(user_facets, "joined_last_month")
+        employees_this_month = _facet_value(user_facets, "joined_this_month")
         employee_growth_rate = ((employees_this_month - employees_last_month) / employees_last_month * 100) if employees_last_month > 0 else 0
-        
+
         # Project completion rate
-        completed_projects = await Project.find({"status": "completed", "end_date": {"$gte": month_ago}}).count()
-        started_projects = await Project.find({"start_date": {"$gte": month_ago}}).count()
+        completed_projects = _facet_value(project_facets, "completed")
+        started_projects = _facet_value(project_facets, "started")
         project_completion_rate = (completed_projects / started_projects * 100) if started_projects > 0 else 0
-        
+
         # Hiring velocity (candidates progressing per week)
-        stage_changes_this_week = await Candidate.find({
-            "stage_history": {"$elemMatch": {"changed_at": {"$gte": week_ago}}}
-        }).count()
-        hiring_velocity = stage_changes_this_week / 7
-        
+        hiring_velocity = _facet_value(candidate_facets, "moved_this_week") / 7
+
         return {
             "snapshot_date": now,
             "total_employees": total_employees,
@@ -106,212 +186,294 @@ class AnalyticsService:
             "project_completion_rate": round(project_completion_rate, 2),
             "hiring_velocity": round(hiring_velocity, 2)
         }
+
+    async def _run_facets(self, model, facets: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run a ``$facet`` stage over a whole collection and return its single result document"""
+        results = await model.aggregate([{"$facet": facets}]).to_list()
+        return results[0] if results else {}
     
-    async def get_team_productivity_metrics(self) -> List[Dict[str, Any]]:
-        """Calculate team-level productivity metrics"""
-        projects = await Project.find_all().to_list()
-        team_metrics = []
-        
-        for project in projects:
-            member_ids = [m.user_id for m in project.members] if project.members else []
-            if not member_ids:
-                continue
-            
-            # Get XP for team members in this project context
-            xp_events = await XPEvent.find({"person_id": {"$in": member_ids}}).to_list()
-            total_xp = sum(event.amount for event in xp_events)
-            commits_count = sum(1 for event in xp_events if event.source == "commit")
-            prs_count = sum(1 for event in xp_events if event.source == "pull_request")
-            issues_count = sum(1 for event in xp_events if event.source == "issue")
-            
-            team_metrics.append({
-                "team_name": project.name or "Unknown",
-                "total_members": len(member_ids),
-                "active_members": len(member_ids),
-                "total_xp": total_xp,
-                "avg_xp_per_member": total_xp / len(member_ids) if member_ids else 0,
-                "commits_count": commits_count,
-                "prs_count": prs_count,
-                "issues_closed": issues_count
-            })
-        
-        return team_metrics
+    def team_productivity_pipeline(self, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Projects with their members' XP grouped by source and week, one row per project.
+
+        Each member is joined to xp_events on the indexed person_id, so the whole
+        report is one aggregation; ``since`` limits the events to a time window.
+        """
+        event_match: Dict[str, Any] = {"created_at": {"$gte": since}} if since else {}
+        return [
+            {"$match": {"members.0": {"$exists": True}}},
+            {"$set": {"total_members": {"$size": "$members"}}},
+            {"$unwind": "$members"},
+            {"$lookup": {
+                "from": "xp_events",
+                "localField": "members.user_id",
+                "foreignField": "person_id",
+                "pipeline": [
+                    {"$match": event_match},
+                    {"$group": {
+                        "_id": {
+                            "source": "$source",
+                            "week": {"$dateTrunc": {"date": "$created_at", "unit": "week"}}
+                        },
+                        "xp": {"$sum": "$amount"},
+                        "count": {"$sum": 1}
+                    }}
+                ],
+                "as": "buckets"
+            }},
+            {"$group": {
+                "_id": "$_id",
+                "team_name": {"$first": "$name"},
+                "total_members": {"$first": "$total_members"},
+                "members": {"$push": {"user_id": "$members.user_id", "buckets": "$buckets"}}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
     
-    async def get_hiring_pipeline_health(self) -> Dict[str, Any]:
-        """Detailed hiring pipeline analytics"""
-        now = datetime.utcnow()
-        
-        candidates = await Candidate.find_all().to_list()
-        total_candidates = len(candidates)
-        
-        # Candidates by stage
-        candidates_by_stage = {}
-        stages = ["Applied", "Screening", "Interview", "Technical Assessment", "Offer", "Hired", "Rejected"]
-        for stage in stages:
-            candidates_by_stage[stage] = await Candidate.find({"current_stage": stage}).count()
-        
-        # Stage conversion rates
-        stage_conversion_rates = {}
-        for i in range(len(stages) - 1):
-            current_stage = stages[i]
-            next_stage = stages[i + 1]
-            current_count = candidates_by_stage[current_stage]
-            progressed = await Candidate.find({
-                "stage_history": {"$elemMatch": {"stage": next_stage}}
-            }).count()
-            stage_conversion_rates[f"{current_stage}_to_{next_stage}"] = (
-                (progressed / current_count * 100) if current_count > 0 else 0
-            )
-        
-        # Average time per stage
-        avg_time_per_stage_days = {}
-        for stage in stages:
-            stage_times = []
-            for candidate in candidates:
-                stage_history = getattr(candidate, 'stage_history', [])
-                stage_entries = [h for h in stage_history if getattr(h, 'stage', None) == stage]
-                if stage_entries:
-                    entry_time = getattr(stage_entries[0], 'changed_at', None)
-                    exit_time = getattr(stage_entries[-1], 'changed_at', None) if len(stage_entries) > 1 else datetime.utcnow()
-                    if entry_time:
-                        stage_times.append((exit_time - entry_time).days)
-            avg_time_per_stage_days[stage] = statistics.mean(stage_times) if stage_times else 0
-        
-        # Monthly trends (last 6 months)
-        monthly_trends = []
-        for i in range(6):
-            month_start = now - timedelta(days=30 * (i + 1))
-            month_end = now - timedelta(days=30 * i)
-            month_candidates = await Candidate.find({
-                "created_at": {"$gte": month_start, "$lt": month_end}
-            }).count()
-            monthly_trends.insert(0, {
-                "month": month_start.strftime("%b %Y"),
-                "candidates": month_candidates
-            })
+    @cached("analytics:teams", ttl=settings.ANALYTICS_CACHE_SECONDS, depends_on=("projects", "xp_events"))
+    async def get_team_productivity_metrics(self, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Calculate team-level productivity metrics, optionally over the last ``days`` days"""
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        rows = await Project.aggregate(self.team_productivity_pipeline(since)).to_list()
+        return [self._team_metrics(row) for row in rows]
+    
+    def _team_metrics(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold one project's per-member (source, week) buckets into its team metrics"""
+        total_members = row["total_members"]
+        member_xp: Dict[str, float] = {}
+        source_counts: Dict[str, int] = {}
+        weekly: Dict[datetime, Dict[str, float]] = {}
+        
+        seen = set()
+        for member in row["members"]:
+            user_id = str(member["user_id"])
+            # A user listed twice on a project is only counted once
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            for bucket in member["buckets"]:
+                source, week = bucket["_id"]["source"], bucket["_id"]["week"]
+                member_xp[user_id] = member_xp.get(user_id, 0) + bucket["xp"]
+                source_counts[source] = source_counts.get(source, 0) + bucket["count"]
+                trend = weekly.setdefault(week, {"xp": 0, "events": 0})
+                trend["xp"] += bucket["xp"]
+                trend["events"] += bucket["count"]
+        
+        total_xp = sum(member_xp.values())
+        top_performers = sorted(member_xp.items(), key=lambda item: item[1], reverse=True)[:3]
         
         return {
-            "total_candidates": total_candidates,
-            "candidates_by_stage": candidates_by_stage,
-            "stage_conversion_rates": stage_conversion_rates,
-            "avg_time_to_hire_days": sum(avg_time_per_stage_days.values()),
-            "avg_time_per_stage_days": avg_time_per_stage_days,
-            "offer_acceptance_rate": (candidates_by_stage.get("Hired", 0) / 
-                                     candidates_by_stage.get("Offer", 1) * 100),
-            "rejection_reasons": {},
-            "top_sources": [],
-            "monthly_trends": monthly_trends
+            "team_name": row.get("team_name") or "Unknown",
+            "total_members": total_members,
+            "active_members": len(member_xp),
+            "total_xp": total_xp,
+            "avg_xp_per_member": total_xp / total_members if total_members else 0,
+            "commits_count": source_counts.get(XPSource.COMMIT.value, 0),
+            "prs_count": source_counts.get(XPSource.PR_MERGED.value, 0),
+            "issues_closed": source_counts.get(XPSource.ISSUE_CLOSED.value, 0),
+            "top_performers": [{"user_id": user_id, "total_xp": xp} for user_id, xp in top_performers],
+            "productivity_trend": [
+                {"week": week.isoformat() if week else None, "xp": trend["xp"], "events": trend["events"]}
+                for week, trend in sorted(weekly.items(), key=lambda item: item[0] or datetime.min)
+            ]
         }
     
+    @cached("analytics:hiring", ttl=settings.ANALYTICS_CACHE_SECONDS, depends_on=("candidates",))
+    async def get_hiring_pipeline_health(self, job_posting_id: Optional[str] = None) -> Dict[str, Any]:
+        """Detailed hiring pipeline analytics, optionally for a single job posting"""
+        return await get_pipeline_health(job_posting_id)
+    
     async def predict_employee_attrition(self) -> List[Dict[str, Any]]:
         """Predict employee attrition risk"""
-        users = await User.find({"is_active": True}).to_list()
-        predictions = []
+        now = datetime.utcnow()
+        features = await self._attrition_features(now)
+        if features.empty:
+            return []
         
-        for user in users:
-            user_id = str(user.id)
-            
-            # Calculate risk factors
+        # Calculate risk factors (added in the same order as the factor list)
+        low_activity = features["recent_xp"].to_numpy() < 10
+        no_projects = features["project_count"].to_numpy() == 0
+        long_tenure = (features["tenure_days"] > 730).to_numpy()  # 2 years
+        
+        risk_scores = np.zeros(len(features))
+        risk_scores += np.where(low_activity, 0.3, 0.0)
+        risk_scores += np.where(no_projects, 0.4, 0.0)
+        risk_scores += np.where(long_tenure, 0.2, 0.0)
+        risk_levels = np.select([risk_scores >= 0.7, risk_scores >= 0.4], ["High", "Medium"], default="Low")
+        
+        predictions = []
+        for i in np.flatnonzero(risk_scores >= 0.4):  # Only include medium and high risk
             risk_factors = []
-            risk_score = 0.0
-            
-            # Factor 1: XP activity decline
-            now = datetime.utcnow()
-            recent_xp = await XPEvent.find({
-                "person_id": user_id,
-                "earned_at": {"$gte": now - timedelta(days=30)}
-            }).count()
-            
-            if recent_xp < 10:
+            if low_activity[i]:
                 risk_factors.append("Low recent activity")
-                risk_score += 0.3
-            
-            # Factor 2: No project involvement
-            project_count = await Project.find({
-                "members.user_id": user_id
-            }).count()
-            
-            if project_count == 0:
+            if no_projects[i]:
                 risk_factors.append("Not assigned to any projects")
-                risk_score += 0.4
-            
-            # Factor 3: Long tenure (placeholder)
-            created_at = getattr(user, 'created_at', None)
-            if created_at:
-                tenure_days = (now - created_at).days
-                if tenure_days > 730:  # 2 years
-                    risk_factors.append("Long tenure (potential growth plateau)")
-                    risk_score += 0.2
-            
-            # Determine risk level
-            if risk_score >= 0.7:
-                risk_level = "High"
-            elif risk_score >= 0.4:
-                risk_level = "Medium"
-            else:
-                risk_level = "Low"
+            if long_tenure[i]:
+                risk_factors.append("Long tenure (potential growth plateau)")
             
-            if risk_score >= 0.4:  # Only include medium and high risk
-                predictions.append({
-                    "employee_id": user_id,
-                    "employee_name": getattr(user, 'full_name', None) or 'Unknown',
-                    "position": getattr(user, 'position', None) or 'Unknown',
-                    "attrition_risk": risk_level,
-                    "risk_score": round(risk_score, 2),
-                    "risk_factors": risk_factors,
-                    "recommendations": self._get_attrition_recommendations(risk_factors)
-                })
+            predictions.append({
+                "employee_id": features["employee_id"].iat[i],
+                "employee_name": features["employee_name"].iat[i],
+                "position": features["position"].iat[i],
+                "attrition_risk": str(risk_levels[i]),
+                "risk_score": round(float(risk_scores[i]), 2),
+                "risk_factors": risk_factors,
+                "recommendations": self._get_attrition_recommendations(risk_factors)
+            })
         
         return sorted(predictions, key=lambda x: x["risk_score"], reverse=True)
     
-    async def predict_project_risks(self) -> List[Dict[str, Any]]:
+    async def _attrition_features(self, now: datetime) -> pd.DataFrame:
+        """Per-user 30-day XP activity, project count and tenure for every active user.
+
+        Two grouped aggregations replace the two count queries per user; both
+        group on the stored ObjectIds, which are matched to users by string.
+        """
+        users, xp_rows, project_rows = await asyncio.gather(
+            User.get_motor_collection().find(
+                {"is_active": True}, {"full_name": 1, "position": 1, "created_at": 1}
+            ).to_list(None),
+            XPEvent.aggregate([
+                {"$match": {"created_at": {"$gte": now - timedelta(days=30)}}},
+                {"$group": {"_id": "$person_id", "n": {"$sum": 1}}}
+            ]).to_list(),
+            Project.aggregate([
+                {"$unwind": "$members"},
+                {"$group": {"_id": {"project": "$_id", "user_id": "$members.user_id"}}},
+                {"$group": {"_id": "$_id.user_id", "n": {"$sum": 1}}}
+            ]).to_list()
+        )
+        
+        features = pd.DataFrame({
+            "employee_id": [str(user["_id"]) for user in users],
+            "employee_name": [user.get("full_name") or "Unknown" for user in users],
+            "position": [user.get("position") or "Unknown" for user in users],
+            "created_at": pd.to_datetime([user.get("created_at") for user in users]),
+        })
+        features["recent_xp"] = features["employee_id"].map({str(row["_id"]): row["n"] for row in xp_rows}).fillna(0)
+        features["project_count"] = features["employee_id"].map({str(row["_id"]): row["n"] for row in project_rows}).fillna(0)
+        features["tenure_days"] = (now - features["created_at"]).dt.days
+        return features
+    
+    def project_risk_pipeline(self, now: datetime, include_github_signals: bool = False) -> List[Dict[str, Any]]:
+        """Active projects with their recent activity counts, one row per project.
+
+        Members are joined to recent commit XP events in the same pass; with
+        ``include_github_signals`` the synced commits and pull requests of the
+        project's ``repo_ids`` are joined as well.
+        """
+        week_ago = now - timedelta(days=7)
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"status": {"$in": ["active", "in_progress"]}}},
+            # Members join on the indexed person_id; source/created_at narrow each member's events
+            {"$lookup": {
+                "from": "xp_events",
+                "localField": "members.user_id",
+                "foreignField": "person_id",
+                "pipeline": [
+                    {"$match": {"source": XPSource.COMMIT.value, "created_at": {"$gte": week_ago}}},
+                    {"$count": "n"}
+                ],
+                "as": "recent_commit_xp"
+            }}
+        ]
+        
+        if include_github_signals:
+            pipeline += [
+                {"$set": {"repo_oids": {"$map": {
+                    "input": {"$ifNull": ["$repo_ids", []]},
+                    "as": "repo_id",
+                    "in": {"$convert": {"input": "$$repo_id", "to": "objectId", "onError": None, "onNull": None}}
+                }}}},
+                {"$lookup": {
+                    "from": "commits",
+                    "let": {"repo_oids": "$repo_oids"},
+                    "pipeline": [
+                        {"$match": {
+                            "commit_date": {"$gte": week_ago},
+                            "$expr": {"$in": ["$repo_id", "$$repo_oids"]}
+                        }},
+                        {"$count": "n"}
+                    ],
+                    "as": "recent_github_commits"
+                }},
+                {"$lookup": {
+                    "from": "pull_requests",
+                    "let": {"repo_oids": "$repo_oids"},
+                    "pipeline": [
+                        {"$match": {"state": "open", "$expr": {"$in": ["$repo_id", "$$repo_oids"]}}},
+                        {"$group": {
+                            "_id": None,
+                            "open": {"$sum": 1},
+                            "stale": {"$sum": {"$cond": [{"$lt": ["$updated_at", now - timedelta(days=14)]}, 1, 0]}}
+                        }}
+                    ],
+                    "as": "open_pull_requests"
+                }}
+            ]
+        
+        pipeline.append({"$project": {
+            "name": 1,
+            "health": 1,
+            "end_date": 1,
+            "team_size": {"$size": {"$ifNull": ["$members", []]}},
+            "recent_commits": {"$ifNull": [{"$first": "$recent_commit_xp.n"}, 0]},
+            "has_repos": {"$gt": [{"$size": {"$ifNull": ["$repo_ids", []]}}, 0]},
+            "recent_github_commits": {"$ifNull": [{"$first": "$recent_github_commits.n"}, 0]},
+            "stale_pull_requests": {"$ifNull": [{"$first": "$open_pull_requests.stale"}, 0]}
+        }})
+        return pipeline
+    
+    async def predict_project_risks(self, include_github_signals: bool = False) -> List[Dict[str, Any]]:
         """Predict project delivery risks"""
-        projects = await Project.find({"status": {"$in": ["active", "in_progress"]}}).to_list()
+        now = datetime.utcnow()
+        projects = await Project.aggregate(self.project_risk_pipeline(now, include_github_signals)).to_list()
         predictions = []
         
         for project in projects:
-            project_id = str(project.id)
+            project_id = str(project["_id"])
             risk_factors = []
             risk_score = 0.0
             estimated_delay = 0
             
             # Factor 1: Team size
-            members = getattr(project, 'members', [])
-            team_size = len(members) if members else 0
+            team_size = project["team_size"]
             if team_size < 2:
                 risk_factors.append("Understaffed team")
                 risk_score += 0.3
                 estimated_delay += 15
             
             # Factor 2: Project health
-            health = getattr(project, 'health', 'unknown')
+            health = project.get("health", "unknown")
             if health in ["at_risk", "critical"]:
                 risk_factors.append(f"Poor health status: {health}")
                 risk_score += 0.4
                 estimated_delay += 30
             
             # Factor 3: Deadline proximity
-            end_date = getattr(project, 'end_date', None)
+            end_date = project.get("end_date")
             if end_date:
-                days_remaining = (end_date - datetime.utcnow()).days
+                days_remaining = (end_date - now).days
                 if days_remaining < 14:
                     risk_factors.append("Approaching deadline")
                     risk_score += 0.2
             
-            # Factor 4: Recent activity
-            member_ids = [m.user_id for m in members if hasattr(m, 'user_id')]
-            if member_ids:
-                recent_commits = await XPEvent.find({
-                    "person_id": {"$in": member_ids},
-                    "source": "commit",
-                    "earned_at": {"$gte": datetime.utcnow() - timedelta(days=7)}
-                }).count()
+            # Factor 4: Recent activity (synced GitHub commits count too when requested)
+            if team_size:
+                recent_commits = project["recent_commits"]
+                if include_github_signals and project["has_repos"]:
+                    recent_commits = max(recent_commits, project["recent_github_commits"])
                 
                 if recent_commits < 5:
                     risk_factors.append("Low development activity")
                     risk_score += 0.25
                     estimated_delay += 10
             
+            # Factor 5: Pull requests left open without updates
+            if include_github_signals and project["stale_pull_requests"] >= 3:
+                risk_factors.append("Stale pull requests")
+                risk_score += 0.15
+                estimated_delay += 5
+            
             if risk_score >= 0.6:
                 risk_level = "High"
             elif risk_score >= 0.3:
@@ -322,7 +484,7 @@ class AnalyticsService:
             if risk_score >= 0.3:
                 predictions.append({
                     "project_id": project_id,
-                    "project_name": getattr(project, 'name', 'Unknown'),
+                    "project_name": project.get("name", "Unknown"),
                     "risk_level": risk_level,
                     "risk_score": round(risk_score, 2),
                     "risk_factors": risk_factors,
@@ -334,54 +496,51 @@ class AnalyticsService:
     
     async def predict_resource_shortages(self) -> List[Dict[str, Any]]:
         """Predict resource/skill shortages"""
-        # Get all XP events to analyze skill distribution
-        xp_events = await XPEvent.find_all().to_list()
-        
-        # Aggregate skills across all XP events
-        skill_data = {}
-        for event in xp_events:
-            if event.skill_distribution:
-                for skill, xp in event.skill_distribution.items():
-                    if skill not in skill_data:
-                        skill_data[skill] = {"total_xp": 0, "user_ids": set()}
-                    skill_data[skill]["total_xp"] += xp
-                    skill_data[skill]["user_ids"].add(event.person_id)
-        
-        predictions = []
-        
-        # Analyze each skill area
-        for skill_name, data in skill_data.items():
-            current_capacity = len(data["user_ids"])
-            
-            # Simple heuristic: if few people have this skill, it's a shortage risk
-            shortage_severity = "Low"
-            shortage_gap = 0
-            
-            if current_capacity < 2:
-                shortage_severity = "Critical"
-                shortage_gap = 3 - current_capacity
-            elif current_capacity < 3:
-                shortage_severity = "High"
-                shortage_gap = 5 - current_capacity
-            elif current_capacity < 5:
-                shortage_severity = "Medium"
-                shortage_gap = 2
-            
-            if shortage_severity != "Low":
-                predictions.append({
-                    "skill_area": skill_name,
-                    "shortage_severity": shortage_severity,
-                    "current_capacity": current_capacity,
-                    "projected_demand": current_capacity + shortage_gap,
-                    "shortage_gap": shortage_gap,
-                    "timeline_weeks": 12,
-                    "recommendations": self._get_resource_shortage_recommendations(skill_name, shortage_gap)
-                })
+        # Skill capacity (distinct users per skill) computed server-side, so only
+        # one row per skill comes back regardless of the number of XP events
+        skill_rows = await XPEvent.aggregate([
+            {"$match": {"skill_distribution": {"$type": "object"}}},
+            {"$project": {"person_id": 1, "skills": {"$objectToArray": "$skill_distribution"}}},
+            {"$unwind": "$skills"},
+            {"$group": {"_id": {"skill": "$skills.k", "person_id": "$person_id"}}},
+            {"$group": {"_id": "$_id.skill", "current_capacity": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]).to_list()
+        if not skill_rows:
+            return []
+        
+        skills = pd.DataFrame(skill_rows).rename(columns={"_id": "skill_area"})
+        capacity = skills["current_capacity"].to_numpy()
+        
+        # Simple heuristic: if few people have this skill, it's a shortage risk
+        conditions = [capacity < 2, capacity < 3, capacity < 5]
+        skills["shortage_severity"] = np.select(conditions, ["Critical", "High", "Medium"], default="Low")
+        skills["shortage_gap"] = np.select(conditions, [3 - capacity, 5 - capacity, 2], default=0)
+        skills["projected_demand"] = capacity + skills["shortage_gap"]
+        
+        shortages = skills[skills["shortage_severity"] != "Low"].sort_values(
+            "shortage_gap", ascending=False, kind="stable"
+        )
         
-        return sorted(predictions, key=lambda x: x["shortage_gap"], reverse=True)
+        return [
+            {
+                "skill_area": row.skill_area,
+                "shortage_severity": row.shortage_severity,
+                "current_capacity": int(row.current_capacity),
+                "projected_demand": int(row.projected_demand),
+                "shortage_gap": int(row.shortage_gap),
+                "timeline_weeks": 12,
+                "recommendations": self._get_resource_shortage_recommendations(row.skill_area, int(row.shortage_gap))
+            }
+            for row in shortages.itertuples(index=False)
+        ]
     
-    async def predict_hiring_demand(self) -> List[Dict[str, Any]]:
-        """Predict future hiring needs"""
+    async def predict_hiring_demand(self, skill_gaps: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Predict future hiring needs
+
+        ``skill_gaps`` takes an already computed predict_resource_shortages()
+        result so a combined run does not compute it twice.
+        """
         # Analyze project pipeline and team capacity
         active_projects = await Project.find({"status": {"$in": ["active", "in_progress"]}}).count()
         total_employees = await User.find({"is_active": True}).count()
@@ -407,7 +566,8 @@ class AnalyticsService:
             })
         
         # Check for specific skill gaps
-        skill_gaps = await self.predict_resource_shortages()
+        if skill_gaps is None:
+            skill_gaps = await self.predict_resource_shortages()
         for gap in skill_gaps[:2]:  # Top 2 gaps
             predictions.append({
                 "position": f"{gap['skill_area']} Specialist",
@@ -453,6 +613,8 @@ class AnalyticsService:
         if "Low development activity" in risk_factors:
             recommendations.append("Investigate team blockers or bottlenecks")
             recommendations.append("Increase standup frequency to daily")
+        if "Stale pull requests" in risk_factors:
+            recommendations.append("Triage open pull requests and assign reviewers")
         return recommendations
     
     def _get_resource_shortage_recommendations(self, skill: str, gap: int) -> List[str]:
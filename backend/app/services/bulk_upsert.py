@@ -0,0 +1,113 @@
+"""
+Bulk Upsert - buffered upserts of synced documents keyed by their natural key
+
+Instead of a find_one plus insert()/save() per document, documents are buffered
+and written as unordered bulk_write batches of UpdateOne(upsert=True): fields
+that track GitHub go in ``$set``, everything else only in ``$setOnInsert``.
+Each flush counts inserted, updated and unchanged documents and publishes one
+change event for the collection.
+"""
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence, Type
+import logging
+from beanie import Document
+from beanie.odm.utils.encoder import Encoder
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.events import publish_change
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class UpsertStats:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class BulkUpserter:
+    """Buffers upserts for one model and flushes them in unordered batches.
+
+    Use as an async context manager so the last partial batch is flushed::
+
+        async with BulkUpserter(Issue, ("repo_id", "number")) as writer:
+            await writer.add(key, fields, insert_only)
+        writer.stats
+    """
+
+    def __init__(self, model: Type[Document], key_fields: Sequence[str], batch_size: int = BATCH_SIZE):
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.batch_size = batch_size
+        self.stats = UpsertStats()
+        self._encoder = Encoder(to_db=True, custom_encoders=model.get_settings().bson_encoders)
+        self._ops: List[UpdateOne] = []
+
+    async def __aenter__(self) -> "BulkUpserter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.flush()
+
+    async def add(
+        self,
+        key: Dict[str, Any],
+        fields: Dict[str, Any],
+        insert_only: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Queue an upsert; ``fields`` are always written, ``insert_only`` only for new documents
+
+        The merged document is validated against the model, so model defaults
+        fill in anything not given and invalid data fails here, not in MongoDB.
+        """
+        if set(key) != set(self.key_fields):
+            raise ValueError(f"Expected key fields {self.key_fields}, got {tuple(key)}")
+        document = self.model(**{**(insert_only or {}), **fields, **key})
+        encoded = self._encoder.encode(document)
+        encoded.pop("_id", None)
+        encoded.pop("revision_id", None)
+
+        to_set = {name: encoded[name] for name in fields}
+        on_insert = {
+            name: value for name, value in encoded.items()
+            if name not in to_set and name not in key
+        }
+        update: Dict[str, Any] = {"$setOnInsert": on_insert}
+        if to_set:
+            update["$set"] = to_set
+        self._ops.append(UpdateOne({name: encoded[name] for name in self.key_fields}, update, upsert=True))
+
+        if len(self._ops) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._ops:
+            return
+        ops, self._ops = self._ops, []
+        try:
+            result = await self.model.get_motor_collection().bulk_write(ops, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            self.stats.failed += len(details.get("writeErrors", []))
+            logger.warning(
+                f"{len(details.get('writeErrors', []))} of {len(ops)} upserts failed for "
+                f"{self.model.get_collection_name()}: {details.get('writeErrors', [])[:1]}"
+            )
+
+        inserted = details.get("nUpserted", 0)
+        updated = details.get("nModified", 0)
+        self.stats.inserted += inserted
+        self.stats.updated += updated
+        self.stats.unchanged += details.get("nMatched", 0) - updated
+        if inserted or updated:
+            await publish_change(self.model.get_collection_name(), "update", source="bulk")
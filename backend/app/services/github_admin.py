@@ -1,13 +1,7 @@
-import httpx
 from typing import List, Optional
 
 from app.core.config import settings
-
-GITHUB_API = "https://api.github.com"
-
-
-class GitHubAPIError(Exception):
-    pass
+from app.services.github_client import GitHubAPIError, GitHubRESTClient
 
 
 async def create_repo_webhook(
@@ -19,10 +13,6 @@ async def create_repo_webhook(
     events: Optional[List[str]] = None,
 ) -> int:
     events = events or ["pull_request", "pull_request_review", "issues"]
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
     payload = {
         "name": "web",
         "active": True,
@@ -34,25 +24,23 @@ async def create_repo_webhook(
             "insecure_ssl": "0",
         },
     }
-    url = f"{GITHUB_API}/repos/{owner}/{repo}/hooks"
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(url, headers=headers, json=payload)
-        if r.status_code not in (201,):
-            raise GitHubAPIError(f"Failed to create webhook: {r.status_code} {r.text}")
-        data = r.json()
-        return int(data.get("id"))
+    try:
+        r = await GitHubRESTClient(token).request(
+            "POST", f"/repos/{owner}/{repo}/hooks", json=payload, expected=(201,)
+        )
+    except GitHubAPIError as e:
+        raise GitHubAPIError(f"Failed to create webhook: {e}", e.status_code) from e
+    data = r.json()
+    return int(data.get("id"))
 
 
 async def delete_repo_webhook(owner: str, repo: str, hook_id: int, token: str) -> None:
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
-    url = f"{GITHUB_API}/repos/{owner}/{repo}/hooks/{hook_id}"
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.delete(url, headers=headers)
-        if r.status_code not in (204,):
-            raise GitHubAPIError(f"Failed to delete webhook: {r.status_code} {r.text}")
+    try:
+        await GitHubRESTClient(token).request(
+            "DELETE", f"/repos/{owner}/{repo}/hooks/{hook_id}", expected=(204,)
+        )
+    except GitHubAPIError as e:
+        raise GitHubAPIError(f"Failed to delete webhook: {e}", e.status_code) from e
 
 
 async def list_accessible_repos(
@@ -68,10 +56,6 @@ async def list_accessible_repos(
     This calls GET /user/repos which returns repos the authenticated user can access,
     including private repos in orgs when scopes allow it.
     """
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
     params = {
         "per_page": per_page,
         "page": page,
@@ -79,9 +63,7 @@ async def list_accessible_repos(
         "visibility": visibility,
         # sorted by updated desc implicitly
     }
-    url = f"{GITHUB_API}/user/repos"
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, headers=headers, params=params)
-        if r.status_code != 200:
-            raise GitHubAPIError(f"Failed to list repos: {r.status_code} {r.text}")
-        return r.json()
+    try:
+        return await GitHubRESTClient(token).get("/user/repos", params)
+    except GitHubAPIError as e:
+        raise GitHubAPIError(f"Failed to list repos: {e}", e.status_code) from e
@@ -0,0 +1,222 @@
+"""
+GitHub REST Client - async GitHub REST API access over a shared connection pool
+
+Every caller shares one httpx.AsyncClient (keep-alive connections to
+api.github.com, bounded by GITHUB_MAX_CONNECTIONS); the token is sent per
+request, so one pool serves every PAT. Requests are scheduled by the token's
+rate limiter (app.services.github_rate_limit) and retried after rate limits. List endpoints are paginated by following
+the ``Link: rel="next"`` header. Passing ``Validators`` makes the first page a
+conditional request (``If-None-Match``/``If-Modified-Since``); a ``304 Not
+Modified`` ends the listing and does not count against the rate limit. Lists
+whose changes can land on any page are read with ``paginate_pages``, which
+keeps validators for every page.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import logging
+import httpx
+
+from app.core.config import settings
+from app.services.github_rate_limit import Priority, RateLimitExceeded, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API = "https://api.github.com"
+API_VERSION = "2022-11-28"
+PER_PAGE = 100
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class Validators:
+    """ETag / Last-Modified of a page of a list, updated after each listing"""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    count: int = 0  # Items on the page (paginate_pages only)
+    not_modified: bool = False  # Set when the last listing got a 304
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"etag": self.etag, "last_modified": self.last_modified, "count": self.count}
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The process-wide connection pool, created on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=GITHUB_API,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.GITHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GITHUB_MAX_CONNECTIONS,
+            ),
+            headers={"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": API_VERSION},
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """GitHub ISO-8601 timestamp as a naive UTC datetime"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def format_datetime(value: datetime) -> str:
+    """Naive UTC datetime as the ISO-8601 timestamp GitHub expects in ``since=``"""
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class GitHubRESTClient:
+    """Async GitHub REST calls authenticated with one token"""
+
+    def __init__(self, token: str, priority: Priority = Priority.INTERACTIVE):
+        self.token = token
+        self.priority = priority
+        self.rate_limiter = get_rate_limiter(token)
+
+    def _headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if extra:
+            headers.update(extra)
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        expected: Iterable[int] = (200,),
+    ) -> httpx.Response:
+        """Send a request; ``path`` may be relative to the API root or a full URL"""
+        resource = "search" if urlparse(path).path.lstrip("/").startswith("search/") else "core"
+        attempt = 0
+        while True:
+            try:
+                await self.rate_limiter.acquire(resource, self.priority)
+            except RateLimitExceeded as e:
+                raise GitHubAPIError(str(e), status_code=429) from e
+            response = await get_http_client().request(
+                method, path, params=params, json=json, headers=self._headers(headers)
+            )
+            if not await self.rate_limiter.record_response(response) or attempt >= settings.GITHUB_RATE_LIMIT_RETRIES:
+                break
+            attempt += 1
+            logger.info(f"Retrying GitHub {method} {path} after rate limit ({attempt}/{settings.GITHUB_RATE_LIMIT_RETRIES})")
+        if response.status_code not in expected:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise GitHubAPIError(
+                f"GitHub {method} {path} failed: {response.status_code} {message}",
+                status_code=response.status_code,
+            )
+        return response
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        response = await self.request("GET", path, params=params)
+        return response.json()
+
+    async def paginate(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        validators: Optional[Validators] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Items of a list endpoint, one page of up to 100 at a time, stopping after ``limit``
+
+        With ``validators`` the first page is requested conditionally: on a 304
+        nothing is yielded and ``validators.not_modified`` is set, otherwise the
+        validators are replaced by the ones of the new first page.
+        """
+        count = 0
+        response = await self.request(
+            "GET", path,
+            params={"per_page": PER_PAGE, **(params or {})},
+            headers=validators.conditional_headers() if validators is not None else None,
+            expected=(200,) if validators is None else (200, 304),
+        )
+        if validators is not None:
+            validators.not_modified = response.status_code == 304
+            if validators.not_modified:
+                return
+            validators.etag = response.headers.get("ETag")
+            validators.last_modified = response.headers.get("Last-Modified")
+        while True:
+            for item in response.json():
+                yield item
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            # The next link already carries every query parameter
+            url = response.links.get("next", {}).get("url")
+            if not url:
+                return
+            response = await self.request("GET", url)
+
+    async def paginate_pages(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]],
+        pages: List[Validators],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Items of the pages of a list that changed, requesting every page conditionally
+
+        ``pages`` holds the validators of each page from the previous listing and
+        is updated in place. An unchanged page is a 304 and yields nothing. The
+        listing continues while pages are full, so items pushed past the old
+        last page are still found.
+        """
+        number = 0
+        while True:
+            if number == len(pages):
+                pages.append(Validators())
+            page = pages[number]
+            number += 1
+            response = await self.request(
+                "GET", path,
+                params={"per_page": PER_PAGE, **(params or {}), "page": number},
+                headers=page.conditional_headers(),
+                expected=(200, 304),
+            )
+            page.not_modified = response.status_code == 304
+            if not page.not_modified:
+                items = response.json()
+                page.etag = response.headers.get("ETag")
+                page.last_modified = response.headers.get("Last-Modified")
+                page.count = len(items)
+                for item in items:
+                    yield item
+            if page.count < PER_PAGE:
+                del pages[number:]
+                return
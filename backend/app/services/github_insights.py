@@ -3,32 +3,48 @@ GitHub Insights Service - Comprehensive GitHub data fetching using GraphQL and R
 """
 import asyncio
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import httpx
-from github import Github
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Sequence
 from gql import gql, Client
 from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import TransportQueryError, TransportServerError
+from graphql import DocumentNode
 from beanie import PydanticObjectId
 import logging
-from cachetools import TTLCache
 import json
 
 from app.models import (
     Repo, RepositoryMetadata, Branch, Commit, Issue, PullRequest,
     Contributor, Release, Milestone, ProjectBoard, Activity,
-    IssueState, PRState
+    GitHubSyncCursor, IssueState, PRState
 )
 from app.core.config import settings
+from app.core.events import publish_change
+from app.services.github_client import GitHubRESTClient, Validators, format_datetime, parse_datetime
+from app.services.github_rate_limit import Priority
+from app.services.bulk_upsert import BulkUpserter, UpsertStats
 
 logger = logging.getLogger(__name__)
 
+# Nodes per GraphQL page (GitHub's maximum for a connection)
+GRAPHQL_PAGE_SIZE = 100
+
+# REST ``state`` filter -> GraphQL PullRequestState values (None: no filter)
+PR_GRAPHQL_STATES = {"open": ["OPEN"], "closed": ["CLOSED", "MERGED"], "all": None}
+
+
+def _present(**values: Any) -> Dict[str, Any]:
+    """Only the values GitHub actually provided (non-empty), so stored data is not blanked"""
+    return {name: value for name, value in values.items() if value}
+
 
 class GitHubInsightsService:
     """Service for fetching comprehensive GitHub repository data"""
     
-    def __init__(self, token: str):
+    def __init__(self, token: str, priority: Priority = Priority.INTERACTIVE):
         self.token = token
-        self.rest_client = Github(token)
+        self.priority = priority
+        self.rest_client = GitHubRESTClient(token, priority)
+        self.rate_limiter = self.rest_client.rate_limiter
         
         # Setup GraphQL client
         transport = AIOHTTPTransport(
@@ -36,17 +52,9 @@ class GitHubInsightsService:
             headers={"Authorization": f"Bearer {token}"}
         )
         self.graphql_client = Client(transport=transport, fetch_schema_from_transport=True)
-        
-        # Cache for expensive operations (TTL: 5 minutes)
-        self.cache = TTLCache(maxsize=100, ttl=300)
     
     async def sync_repository_metadata(self, repo: Repo) -> RepositoryMetadata:
         """Sync repository metadata from GitHub"""
-        cache_key = f"metadata:{repo.owner}/{repo.repo_name}"
-        
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
         # Ensure repository link is properly configured
         if not repo.owner or not repo.repo_name:
             raise ValueError("Repository owner/repo_name not configured. Please set 'owner' and 'repo_name' for this repo in Projects.")
@@ -54,6 +62,7 @@ class GitHubInsightsService:
         # GraphQL query for repository metadata
         query = gql("""
             query getRepository($owner: String!, $name: String!) {
+                rateLimit { cost limit remaining resetAt }
                 repository(owner: $owner, name: $name) {
                     id
                     databaseId
@@ -105,10 +114,10 @@ class GitHubInsightsService:
         """)
         
         try:
-            result = await self.graphql_client.execute_async(
-                query, 
-                variable_values={"owner": repo.owner, "name": repo.repo_name}
-            )
+            async with self.graphql_client as session:
+                result = await self._execute_graphql(
+                    session, query, {"owner": repo.owner, "name": repo.repo_name}
+                )
             
             repo_data = result["repository"]
             if not repo_data:
@@ -216,7 +225,6 @@ class GitHubInsightsService:
                 metadata.last_synced = last_synced
                 await metadata.save()
             
-            self.cache[cache_key] = metadata
             return metadata
             
         except Exception as e:
@@ -226,436 +234,668 @@ class GitHubInsightsService:
     # -----------------
     # Helper utilities
     # -----------------
-    def _to_naive(self, dt: Optional[datetime]) -> Optional[datetime]:
-        if not dt:
-            return dt
-        try:
-            return dt.replace(tzinfo=None) if getattr(dt, "tzinfo", None) else dt
-        except Exception:
-            return dt
-
-    def _get_gh_repo(self, repo: Repo):
+    def _repo_path(self, repo: Repo) -> str:
         if not repo.owner or not repo.repo_name:
             raise ValueError("Repository owner/repo_name not configured. Set these on the Projects page.")
-        return self.rest_client.get_repo(f"{repo.owner}/{repo.repo_name}")
+        return f"/repos/{repo.owner}/{repo.repo_name}"
+
+    async def _get_cursor(self, repo: Repo, entity: str, full: bool = False) -> GitHubSyncCursor:
+        """Sync cursor for one entity; ``full`` forgets its progress so everything is fetched again"""
+        cursor = await GitHubSyncCursor.find_one(
+            GitHubSyncCursor.repo_id == repo.id, GitHubSyncCursor.entity == entity
+        )
+        if cursor is None:
+            return GitHubSyncCursor(repo_id=repo.id, entity=entity)
+        if full:
+            cursor.last_updated_at = cursor.last_sha = cursor.etag = cursor.last_modified = None
+            cursor.pages = []
+        return cursor
+
+    async def _save_cursor(
+        self,
+        cursor: GitHubSyncCursor,
+        validators: Optional[Validators],
+        stats: UpsertStats,
+        last_updated_at: Optional[datetime] = None,
+        last_sha: Optional[str] = None,
+        pages: Optional[List[Validators]] = None,
+    ) -> None:
+        """Advance a cursor after a sync; kept as-is when items failed so they are fetched again"""
+        if stats.failed:
+            return
+        if validators is not None:
+            cursor.etag = validators.etag
+            cursor.last_modified = validators.last_modified
+        if pages is not None:
+            cursor.pages = [page.as_dict() for page in pages]
+        if last_updated_at and (cursor.last_updated_at is None or last_updated_at > cursor.last_updated_at):
+            cursor.last_updated_at = last_updated_at
+        if last_sha:
+            cursor.last_sha = last_sha
+        cursor.synced_at = datetime.utcnow()
+        await cursor.save()
+
+    async def _list_changed(self, path: str, params: Optional[Dict[str, Any]], validators: Validators) -> bool:
+        """Conditionally request a REST list's first page; False on 304, which is free"""
+        async for _ in self.rest_client.paginate(path, params, limit=1, validators=validators):
+            break
+        return not validators.not_modified
+
+    async def _pages_changed(self, path: str, params: Optional[Dict[str, Any]], pages: List[Validators]) -> bool:
+        """Conditionally request every page of a REST list; False when all were 304s"""
+        async for _ in self.rest_client.paginate_pages(path, params, pages):
+            pass
+        return not all(page.not_modified for page in pages)
+
+    # -----------------
+    # GraphQL batch fetchers
+    # -----------------
+    # One GraphQL page returns up to 100 items with the nested data (reviews,
+    # commit stats, head commits) that REST needs one extra request per item for.
+    async def _execute_graphql(self, session: Any, query: DocumentNode, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a query through the token's rate limiter, retrying after rate limits
+
+        Queries should select ``rateLimit { cost limit remaining resetAt }`` so the
+        limiter learns the remaining GraphQL budget.
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire("graphql", self.priority)
+            try:
+                result = await session.execute(query, variable_values=variables)
+            except TransportQueryError as e:
+                exhausted = any((err or {}).get("type") == "RATE_LIMITED" for err in e.errors or [])
+                if not exhausted or attempt >= settings.GITHUB_RATE_LIMIT_RETRIES:
+                    raise
+                await self.rate_limiter.rate_limited("graphql", exhausted=True)
+            except TransportServerError as e:
+                # Secondary limits come back as HTTP 403/429
+                if e.code not in (403, 429) or attempt >= settings.GITHUB_RATE_LIMIT_RETRIES:
+                    raise
+                await self.rate_limiter.rate_limited("graphql")
+            else:
+                await self.rate_limiter.record_graphql(result.get("rateLimit"))
+                return result
+            attempt += 1
+            logger.info(f"Retrying GitHub GraphQL query after rate limit ({attempt}/{settings.GITHUB_RATE_LIMIT_RETRIES})")
+
+    async def _graphql_nodes(
+        self,
+        query: DocumentNode,
+        variables: Dict[str, Any],
+        connection_path: Sequence[str],
+        limit: Optional[int] = None,
+        stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Nodes of a paginated connection, fetched a page at a time over one session
+
+        ``connection_path`` leads from the query result to the connection, whose
+        query must take ``$first`` and ``$after`` and select ``pageInfo``. Paging
+        ends after ``limit`` nodes, or before the first node ``stop`` returns True for.
+        """
+        count = 0
+        after = None
+        async with self.graphql_client as session:
+            while True:
+                first = GRAPHQL_PAGE_SIZE if limit is None else min(GRAPHQL_PAGE_SIZE, limit - count)
+                connection = await self._execute_graphql(
+                    session, query, {**variables, "first": first, "after": after}
+                )
+                for key in connection_path:
+                    connection = (connection or {}).get(key)
+                if not connection:
+                    return
+                for node in connection["nodes"]:
+                    if node is None:
+                        continue
+                    if stop is not None and stop(node):
+                        return
+                    yield node
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+                if not connection["pageInfo"]["hasNextPage"]:
+                    return
+                after = connection["pageInfo"]["endCursor"]
+
+    def fetch_branches(self, repo: Repo) -> AsyncIterator[Dict[str, Any]]:
+        """Branches with their head commit"""
+        query = gql("""
+            query getBranches($owner: String!, $name: String!, $first: Int!, $after: String) {
+                rateLimit { cost limit remaining resetAt }
+                repository(owner: $owner, name: $name) {
+                    refs(refPrefix: "refs/heads/", first: $first, after: $after) {
+                        pageInfo { hasNextPage endCursor }
+                        nodes {
+                            name
+                            branchProtectionRule { id }
+                            repository { defaultBranchRef { name } }
+                            target {
+                                ... on Commit {
+                                    oid
+                                    message
+                                    author { date user { login } }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        """)
+        return self._graphql_nodes(
+            query, {"owner": repo.owner, "name": repo.repo_name}, ("repository", "refs")
+        )
+
+    def fetch_commit_history(
+        self,
+        repo: Repo,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Commits of the default branch, newest first, with additions and deletions"""
+        query = gql("""
+            query getCommitHistory($owner: String!, $name: String!, $since: GitTimestamp, $first: Int!, $after: String) {
+                rateLimit { cost limit remaining resetAt }
+                repository(owner: $owner, name: $name) {
+                    defaultBranchRef {
+                        target {
+                            ... on Commit {
+                                history(first: $first, after: $after, since: $since) {
+                                    pageInfo { hasNextPage endCursor }
+                                    nodes {
+                                        oid
+                                        message
+                                        additions
+                                        deletions
+                                        changedFilesIfAvailable
+                                        author { email date user { login } }
+                                        committer { email date user { login } }
+                                        signature { isValid state }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        """)
+        return self._graphql_nodes(
+            query,
+            {"owner": repo.owner, "name": repo.repo_name, "since": format_datetime(since) if since else None},
+            ("repository", "defaultBranchRef", "target", "history"),
+            limit=limit,
+            stop=stop,
+        )
+
+    def fetch_pull_requests(
+        self,
+        repo: Repo,
+        state: str = "all",
+        stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Pull requests, most recently updated first, with their reviews"""
+        query = gql("""
+            query getPullRequests($owner: String!, $name: String!, $states: [PullRequestState!], $first: Int!, $after: String) {
+                rateLimit { cost limit remaining resetAt }
+                repository(owner: $owner, name: $name) {
+                    pullRequests(states: $states, first: $first, after: $after, orderBy: {field: UPDATED_AT, direction: DESC}) {
+                        pageInfo { hasNextPage endCursor }
+                        nodes {
+                            databaseId
+                            number
+                            title
+                            body
+                            state
+                            merged
+                            mergedAt
+                            mergedBy { login }
+                            mergeCommit { oid }
+                            createdAt
+                            updatedAt
+                            closedAt
+                            author { login avatarUrl }
+                            headRefName
+                            baseRefName
+                            headRefOid
+                            baseRefOid
+                            additions
+                            deletions
+                            changedFiles
+                            commits { totalCount }
+                            comments { totalCount }
+                            milestone { number title }
+                            assignees(first: 20) { nodes { login } }
+                            labels(first: 20) { nodes { name } }
+                            reviewRequests(first: 20) {
+                                nodes { requestedReviewer { ... on User { login } } }
+                            }
+                            reviews(first: 100) {
+                                nodes { author { login } state submittedAt }
+                            }
+                        }
+                    }
+                }
+            }
+        """)
+        return self._graphql_nodes(
+            query,
+            {"owner": repo.owner, "name": repo.repo_name, "states": PR_GRAPHQL_STATES.get(state)},
+            ("repository", "pullRequests"),
+            stop=stop,
+        )
 
     # -----------------
     # Sync operations
     # -----------------
-    async def sync_branches(self, repo: Repo) -> None:
+    # Each sync buffers its documents in a BulkUpserter keyed by the natural key
+    # (see the compound indexes on the models) and returns the upsert counts.
+    # Fields GitHub may omit are only overwritten when it sends a value.
+    #
+    # Syncs are incremental: a GitHubSyncCursor per repository and entity keeps
+    # the list's ETag/Last-Modified and the newest item seen. Lists are fetched
+    # conditionally (an unchanged list is a free 304), with ``since=`` where
+    # GitHub supports it, and stop at the first item already synced. Lists
+    # without an order that puts changes first (branches, contributors, releases,
+    # milestones) keep validators for every page instead, and only unchanged
+    # pages are skipped. Branches, commits and pull requests only probe the REST
+    # list that way and read the items through the GraphQL fetchers above. Pass
+    # ``full=True`` to ignore the cursor.
+    async def sync_branches(self, repo: Repo, full: bool = False) -> UpsertStats:
         """Sync repository branches"""
-        gh_repo = self._get_gh_repo(repo)
-        default_branch = gh_repo.default_branch
-        # PyGithub is sync; run in thread if needed, but small lists are OK
-        branches = list(gh_repo.get_branches())
-        for b in branches:
-            try:
-                commit = gh_repo.get_commit(b.commit.sha)
-                last_commit_date = self._to_naive(getattr(commit.commit.author, "date", None))
-                last_commit_author = getattr(getattr(commit.author, "login", None), "__str__", lambda: None)()
-                # Upsert by (repo_id, name)
-                existing = await Branch.find_one(Branch.repo_id == repo.id, Branch.name == b.name)
-                if not existing:
-                    existing = Branch(
-                        repo_id=repo.id,
-                        name=b.name,
-                        is_default=(b.name == default_branch),
-                        is_protected=bool(getattr(b, "protected", False)),
-                        last_commit_sha=commit.sha,
-                        last_commit_message=commit.commit.message or None,
-                        last_commit_author=last_commit_author,
-                        last_commit_date=last_commit_date,
-                        is_stale=False,
-                        ahead_by=0,
-                        behind_by=0,
-                    )
-                    await existing.insert()
-                else:
-                    existing.is_default = (b.name == default_branch)
-                    existing.is_protected = bool(getattr(b, "protected", False))
-                    existing.last_commit_sha = commit.sha
-                    existing.last_commit_message = commit.commit.message or None
-                    existing.last_commit_author = last_commit_author
-                    existing.last_commit_date = last_commit_date
-                    # Mark stale if >30 days without commits
-                    if last_commit_date:
-                        existing.is_stale = (datetime.utcnow() - last_commit_date) > timedelta(days=30)
-                    await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync branch {b.name}: {e}")
+        repo_path = self._repo_path(repo)
+        cursor = await self._get_cursor(repo, "branches", full)
+        pages = [Validators(**page) for page in cursor.pages]
+        changed = await self._pages_changed(f"{repo_path}/branches", None, pages)
+        async with BulkUpserter(Branch, ("repo_id", "name")) as writer:
+            if changed:
+                async for ref in self.fetch_branches(repo):
+                    try:
+                        commit = ref.get("target") or {}
+                        author = commit.get("author") or {}
+                        last_commit_date = parse_datetime(author.get("date"))
+                        default_branch = ((ref.get("repository") or {}).get("defaultBranchRef") or {}).get("name")
+                        fields = {
+                            "is_default": ref["name"] == default_branch,
+                            "is_protected": ref.get("branchProtectionRule") is not None,
+                            "last_commit_sha": commit.get("oid"),
+                            "last_commit_message": commit.get("message") or None,
+                            "last_commit_author": (author.get("user") or {}).get("login"),
+                            "last_commit_date": last_commit_date,
+                        }
+                        # Mark stale if >30 days without commits
+                        if last_commit_date:
+                            fields["is_stale"] = (datetime.utcnow() - last_commit_date) > timedelta(days=30)
+                        await writer.add(
+                            {"repo_id": repo.id, "name": ref["name"]},
+                            fields,
+                            {"is_stale": False, "ahead_by": 0, "behind_by": 0},
+                        )
+                    except Exception as e:
+                        writer.stats.failed += 1
+                        logger.warning(f"Failed to sync branch {ref.get('name')}: {e}")
+        if not changed:
+            await self._refresh_branch_staleness(repo)
+        await self._save_cursor(cursor, None, writer.stats, pages=pages)
+        return writer.stats
 
-    async def sync_recent_commits(self, repo: Repo, limit: int = 100) -> None:
+    async def _refresh_branch_staleness(self, repo: Repo) -> None:
+        """Mark branches stale once their last commit ages past 30 days, without refetching them"""
+        result = await Branch.get_motor_collection().update_many(
+            {
+                "repo_id": repo.id,
+                "is_stale": False,
+                "last_commit_date": {"$lt": datetime.utcnow() - timedelta(days=30)},
+            },
+            {"$set": {"is_stale": True}},
+        )
+        if result.modified_count:
+            await publish_change(Branch.get_collection_name(), "update", source="bulk")
+
+    async def sync_recent_commits(self, repo: Repo, limit: int = 100, full: bool = False) -> UpsertStats:
         """Sync recent commits (default branch)"""
-        gh_repo = self._get_gh_repo(repo)
-        commits = gh_repo.get_commits()  # default branch
-        count = 0
-        for c in commits:
-            if count >= limit:
-                break
-            try:
-                # Stats trigger an extra API call; PyGithub caches per object
-                additions = getattr(c.stats, "additions", 0)
-                deletions = getattr(c.stats, "deletions", 0)
-                total_changes = additions + deletions
-                author_login = getattr(getattr(c.author, "login", None), "__str__", lambda: None)()
-                committer_login = getattr(getattr(c.committer, "login", None), "__str__", lambda: None)()
-                author_date = self._to_naive(getattr(c.commit.author, "date", None))
-                commit_date = self._to_naive(getattr(c.commit.committer, "date", None))
-                # Safely handle verification (some commits may not have this attribute)
-                verification = getattr(c.commit, "verification", None)
-                verified = bool(getattr(verification, "verified", False)) if verification else False
-                verification_reason = getattr(verification, "reason", None) if verification else None
-                existing = await Commit.find_one(Commit.repo_id == repo.id, Commit.sha == c.sha)
-                if not existing:
-                    existing = Commit(
-                        repo_id=repo.id,
-                        sha=c.sha,
-                        message=c.commit.message or "",
-                        author_login=author_login,
-                        author_email=getattr(c.commit.author, "email", None),
-                        author_date=author_date or datetime.utcnow(),
-                        committer_login=committer_login,
-                        committer_email=getattr(c.commit.committer, "email", None),
-                        commit_date=commit_date or author_date or datetime.utcnow(),
-                        additions=additions or 0,
-                        deletions=deletions or 0,
-                        total_changes=total_changes or 0,
-                        files_changed=0,
-                        pr_number=None,
-                        branch=None,
-                        verified=verified,
-                        verification_reason=verification_reason,
-                    )
-                    await existing.insert()
-                else:
-                    existing.message = c.commit.message or existing.message
-                    existing.author_login = author_login
-                    existing.author_email = getattr(c.commit.author, "email", None)
-                    existing.author_date = author_date or existing.author_date
-                    existing.committer_login = committer_login
-                    existing.committer_email = getattr(c.commit.committer, "email", None)
-                    existing.commit_date = commit_date or existing.commit_date
-                    existing.additions = additions or existing.additions
-                    existing.deletions = deletions or existing.deletions
-                    existing.total_changes = total_changes or existing.total_changes
-                    existing.verified = verified
-                    existing.verification_reason = verification_reason
-                    await existing.save()
-                count += 1
-            except Exception as e:
-                logger.warning(f"Failed to sync commit {getattr(c, 'sha', 'unknown')}: {e}")
+        repo_path = self._repo_path(repo)
+        cursor = await self._get_cursor(repo, "commits", full)
+        validators = Validators(cursor.etag, cursor.last_modified)
+        params = {"since": format_datetime(cursor.last_updated_at)} if cursor.last_updated_at else None
+        newest_sha = None
+        newest_date = None
+        async with BulkUpserter(Commit, ("repo_id", "sha")) as writer:
+            if await self._list_changed(f"{repo_path}/commits", params, validators):
+                # Newest first: everything from the last synced commit on was synced before
+                history = self.fetch_commit_history(
+                    repo, cursor.last_updated_at, limit, stop=lambda c: c["oid"] == cursor.last_sha
+                )
+                async for c in history:
+                    git_author = c.get("author") or {}
+                    git_committer = c.get("committer") or {}
+                    author_date = parse_datetime(git_author.get("date"))
+                    commit_date = parse_datetime(git_committer.get("date"))
+                    if newest_sha is None:
+                        newest_sha, newest_date = c["oid"], commit_date
+                    try:
+                        additions = c.get("additions") or 0
+                        deletions = c.get("deletions") or 0
+                        signature = c.get("signature")
+                        fields = {
+                            "author_login": (git_author.get("user") or {}).get("login"),
+                            "author_email": git_author.get("email"),
+                            "committer_login": (git_committer.get("user") or {}).get("login"),
+                            "committer_email": git_committer.get("email"),
+                            "verified": bool(signature and signature.get("isValid")),
+                            "verification_reason": signature["state"].lower() if signature else "unsigned",
+                            **_present(
+                                message=c.get("message"),
+                                author_date=author_date,
+                                commit_date=commit_date,
+                                additions=additions,
+                                deletions=deletions,
+                                total_changes=additions + deletions,
+                                files_changed=c.get("changedFilesIfAvailable"),
+                            ),
+                        }
+                        await writer.add(
+                            {"repo_id": repo.id, "sha": c["oid"]},
+                            fields,
+                            {
+                                "message": "",
+                                "author_date": author_date or datetime.utcnow(),
+                                "commit_date": commit_date or author_date or datetime.utcnow(),
+                                "files_changed": 0,
+                            },
+                        )
+                    except Exception as e:
+                        writer.stats.failed += 1
+                        logger.warning(f"Failed to sync commit {c.get('oid', 'unknown')}: {e}")
+        await self._save_cursor(cursor, validators, writer.stats, newest_date, newest_sha)
+        return writer.stats
 
-    async def sync_issues(self, repo: Repo, state: Optional[str] = None) -> None:
+    async def sync_issues(self, repo: Repo, state: Optional[str] = None, full: bool = False) -> UpsertStats:
         """Sync issues (optionally filter by state: open/closed/all)"""
-        gh_repo = self._get_gh_repo(repo)
+        repo_path = self._repo_path(repo)
         state = state or "all"
-        issues = gh_repo.get_issues(state=state)
         now = datetime.utcnow()
-        for i in issues:
-            try:
-                # PyGithub returns PRs in issues iterator when pull requests are included; skip PRs here
-                if getattr(i, "pull_request", None):
-                    continue
-                labels = [lbl.name for lbl in (i.labels or [])]
-                assignees = [a.login for a in (i.assignees or [])]
-                milestone = i.milestone
-                updated_at = self._to_naive(getattr(i, "updated_at", None))
-                existing = await Issue.find_one(Issue.repo_id == repo.id, Issue.number == i.number)
-                if not existing:
-                    existing = Issue(
-                        repo_id=repo.id,
-                        github_id=i.id,
-                        number=i.number,
-                        title=i.title or "",
-                        body=i.body or None,
-                        state=IssueState.OPEN if (i.state or "open").lower() == "open" else IssueState.CLOSED,
-                        author_login=getattr(i.user, "login", "unknown"),
-                        author_avatar=getattr(i.user, "avatar_url", None),
-                        assignees=assignees,
-                        labels=labels,
-                        milestone_id=(milestone.number if milestone else None),
-                        milestone_title=(milestone.title if milestone else None),
-                        comments_count=getattr(i, "comments", 0) or 0,
-                        reactions_count=0,
-                        last_comment_date=None,
-                        created_at=self._to_naive(getattr(i, "created_at", None)) or now,
-                        updated_at=updated_at or now,
-                        closed_at=self._to_naive(getattr(i, "closed_at", None)),
-                        ai_summary=None,
-                        ai_summary_date=None,
-                        days_since_activity=int(((now - (updated_at or now)).total_seconds()) // 86400),
-                        is_stale=((now - (updated_at or now)) > timedelta(days=14)),
+        cursor = await self._get_cursor(repo, f"issues:{state}", full)
+        validators = Validators(cursor.etag, cursor.last_modified)
+        params = {"state": state, "sort": "updated", "direction": "desc"}
+        if cursor.last_updated_at:
+            params["since"] = format_datetime(cursor.last_updated_at)
+        newest = None
+        async with BulkUpserter(Issue, ("repo_id", "number")) as writer:
+            async for i in self.rest_client.paginate(f"{repo_path}/issues", params, validators=validators):
+                try:
+                    # The issues endpoint also lists pull requests; skip PRs here
+                    if "pull_request" in i:
+                        continue
+                    milestone = i.get("milestone")
+                    user = i.get("user") or {}
+                    updated_at = parse_datetime(i.get("updated_at"))
+                    if updated_at and (newest is None or updated_at > newest):
+                        newest = updated_at
+                    fields = {
+                        "state": IssueState.OPEN if (i.get("state") or "open").lower() == "open" else IssueState.CLOSED,
+                        "assignees": [a["login"] for a in (i.get("assignees") or [])],
+                        "labels": [lbl["name"] for lbl in (i.get("labels") or [])],
+                        "milestone_id": milestone["number"] if milestone else None,
+                        "milestone_title": milestone["title"] if milestone else None,
+                        "closed_at": parse_datetime(i.get("closed_at")),
+                        **_present(
+                            title=i.get("title"),
+                            body=i.get("body"),
+                            comments_count=i.get("comments"),
+                            updated_at=updated_at,
+                        ),
+                    }
+                    await writer.add(
+                        {"repo_id": repo.id, "number": i["number"]},
+                        fields,
+                        {
+                            "github_id": i["id"],
+                            "title": "",
+                            "author_login": user.get("login", "unknown"),
+                            "author_avatar": user.get("avatar_url"),
+                            "created_at": parse_datetime(i.get("created_at")) or now,
+                            "updated_at": now,
+                            # Kept current by _refresh_issue_activity
+                            "days_since_activity": 0,
+                            "is_stale": False,
+                        },
                     )
-                    await existing.insert()
-                else:
-                    existing.title = i.title or existing.title
-                    existing.body = i.body or existing.body
-                    existing.state = IssueState.OPEN if (i.state or "open").lower() == "open" else IssueState.CLOSED
-                    existing.assignees = assignees
-                    existing.labels = labels
-                    existing.milestone_id = milestone.number if milestone else None
-                    existing.milestone_title = milestone.title if milestone else None
-                    existing.comments_count = getattr(i, "comments", existing.comments_count)
-                    existing.updated_at = updated_at or existing.updated_at
-                    existing.closed_at = self._to_naive(getattr(i, "closed_at", None))
-                    existing.days_since_activity = int(((now - (updated_at or now)).total_seconds()) // 86400)
-                    existing.is_stale = ((now - (updated_at or now)) > timedelta(days=14))
-                    await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync issue #{getattr(i, 'number', 'unknown')}: {e}")
+                except Exception as e:
+                    writer.stats.failed += 1
+                    logger.warning(f"Failed to sync issue #{i.get('number', 'unknown')}: {e}")
+        await self._refresh_issue_activity(repo)
+        await self._save_cursor(cursor, validators, writer.stats, newest)
+        return writer.stats
 
-    async def sync_pull_requests(self, repo: Repo, state: Optional[str] = None) -> None:
+    async def _refresh_issue_activity(self, repo: Repo) -> None:
+        """Recompute days_since_activity/is_stale of every issue, including the ones not refetched"""
+        now = datetime.utcnow()
+        idle_ms = {"$subtract": [now, "$updated_at"]}
+        result = await Issue.get_motor_collection().update_many(
+            {"repo_id": repo.id},
+            [{"$set": {
+                "days_since_activity": {"$toInt": {"$floor": {"$divide": [idle_ms, 86400000]}}},
+                "is_stale": {"$gt": [idle_ms, 14 * 86400000]},
+            }}],
+        )
+        if result.modified_count:
+            await publish_change(Issue.get_collection_name(), "update", source="bulk")
+
+    async def sync_pull_requests(self, repo: Repo, state: Optional[str] = None, full: bool = False) -> UpsertStats:
         """Sync pull requests (open/closed/merged/all)"""
-        gh_repo = self._get_gh_repo(repo)
+        repo_path = self._repo_path(repo)
         state = state or "all"
-        prs = gh_repo.get_pulls(state=state)
-        for pr in prs:
-            try:
-                merged = bool(getattr(pr, "merged", False))
-                # Reviews
-                reviews = []
-                approved_count = 0
-                changes_requested_count = 0
-                try:
-                    for rv in pr.get_reviews():
-                        r_state = (rv.state or "").lower()
-                        if r_state == "approved":
-                            approved_count += 1
-                        elif r_state == "changes_requested":
-                            changes_requested_count += 1
-                        reviews.append({
-                            "user": getattr(getattr(rv.user, "login", None), "__str__", lambda: None)(),
-                            "state": rv.state,
-                            "created_at": self._to_naive(getattr(rv, "submitted_at", None)) or self._to_naive(getattr(rv, "created_at", None)),
-                        })
-                except Exception:
-                    # Reviews endpoint may be restricted for some tokens
-                    reviews = []
-                # Time metrics
-                created_at = self._to_naive(getattr(pr, "created_at", None))
-                merged_at = self._to_naive(getattr(pr, "merged_at", None))
-                first_review_time = None
-                if reviews:
-                    first_review_time = min([r.get("created_at") for r in reviews if r.get("created_at")])
-                time_to_first_review = None
-                if created_at and first_review_time:
-                    time_to_first_review = int((first_review_time - created_at).total_seconds() // 60)
-                time_to_merge = None
-                if created_at and merged_at:
-                    time_to_merge = int((merged_at - created_at).total_seconds() // 60)
-                # Upsert by (repo_id, number)
-                existing = await PullRequest.find_one(PullRequest.repo_id == repo.id, PullRequest.number == pr.number)
-                state_value = PRState.MERGED if merged else (PRState.OPEN if (pr.state or "open").lower() == "open" else PRState.CLOSED)
-                if not existing:
-                    existing = PullRequest(
-                        repo_id=repo.id,
-                        github_id=pr.id,
-                        number=pr.number,
-                        title=pr.title or "",
-                        body=pr.body or None,
-                        state=state_value,
-                        author_login=getattr(pr.user, "login", None) or "unknown",
-                        author_avatar=getattr(pr.user, "avatar_url", None),
-                        assignees=[a.login for a in (pr.assignees or [])],
-                        requested_reviewers=[a.login for a in (pr.requested_reviewers or [])],
-                        labels=[l.name for l in (pr.labels or [])],
-                        milestone_id=(pr.milestone.number if pr.milestone else None),
-                        milestone_title=(pr.milestone.title if pr.milestone else None),
-                        head_branch=getattr(getattr(pr, "head", None), "ref", None) or "",
-                        base_branch=getattr(getattr(pr, "base", None), "ref", None) or "",
-                        head_sha=getattr(getattr(pr, "head", None), "sha", None) or "",
-                        base_sha=getattr(getattr(pr, "base", None), "sha", None) or "",
-                        mergeable=None,
-                        merged=merged,
-                        merged_by=(getattr(getattr(pr, "merged_by", None), "login", None) if merged else None),
-                        merge_commit_sha=getattr(pr, "merge_commit_sha", None),
-                        additions=getattr(pr, "additions", 0) or 0,
-                        deletions=getattr(pr, "deletions", 0) or 0,
-                        changed_files=getattr(pr, "changed_files", 0) or 0,
-                        commits_count=getattr(pr, "commits", 0) or 0,
-                        comments_count=getattr(pr, "comments", 0) or 0,
-                        review_comments_count=getattr(pr, "review_comments", 0) or 0,
-                        reviews=reviews,
-                        approved_count=approved_count,
-                        changes_requested_count=changes_requested_count,
-                        linked_issues=[],
-                        created_at=created_at or datetime.utcnow(),
-                        updated_at=self._to_naive(getattr(pr, "updated_at", None)) or created_at or datetime.utcnow(),
-                        closed_at=self._to_naive(getattr(pr, "closed_at", None)),
-                        merged_at=merged_at,
-                        time_to_first_review=time_to_first_review,
-                        time_to_merge=time_to_merge,
-                        ai_summary=None,
-                        ai_commit_summary=None,
-                    )
-                    await existing.insert()
-                else:
-                    existing.title = pr.title or existing.title
-                    existing.body = pr.body or existing.body
-                    existing.state = state_value
-                    existing.assignees = [a.login for a in (pr.assignees or [])]
-                    existing.requested_reviewers = [a.login for a in (pr.requested_reviewers or [])]
-                    existing.labels = [l.name for l in (pr.labels or [])]
-                    existing.milestone_id = (pr.milestone.number if pr.milestone else None)
-                    existing.milestone_title = (pr.milestone.title if pr.milestone else None)
-                    existing.merged = merged
-                    existing.merged_by = getattr(getattr(pr, "merged_by", None), "login", None) if merged else None
-                    existing.merge_commit_sha = getattr(pr, "merge_commit_sha", None)
-                    existing.additions = getattr(pr, "additions", existing.additions)
-                    existing.deletions = getattr(pr, "deletions", existing.deletions)
-                    existing.changed_files = getattr(pr, "changed_files", existing.changed_files)
-                    existing.commits_count = getattr(pr, "commits", existing.commits_count)
-                    existing.comments_count = getattr(pr, "comments", existing.comments_count)
-                    existing.review_comments_count = getattr(pr, "review_comments", existing.review_comments_count)
-                    existing.reviews = reviews
-                    existing.approved_count = approved_count
-                    existing.changes_requested_count = changes_requested_count
-                    existing.updated_at = self._to_naive(getattr(pr, "updated_at", None)) or existing.updated_at
-                    existing.closed_at = self._to_naive(getattr(pr, "closed_at", None))
-                    existing.merged_at = merged_at
-                    existing.time_to_first_review = time_to_first_review
-                    existing.time_to_merge = time_to_merge
-                    await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync PR #{getattr(pr, 'number', 'unknown')}: {e}")
+        cursor = await self._get_cursor(repo, f"pull_requests:{state}", full)
+        validators = Validators(cursor.etag, cursor.last_modified)
+        params = {"state": state, "sort": "updated", "direction": "desc"}
+        newest = None
 
-    async def sync_contributors(self, repo: Repo) -> None:
+        def synced_before(pr: Dict[str, Any]) -> bool:
+            # Most recently updated come first, so the rest were synced before
+            updated_at = parse_datetime(pr.get("updatedAt"))
+            return bool(cursor.last_updated_at and updated_at and updated_at <= cursor.last_updated_at)
+
+        async with BulkUpserter(PullRequest, ("repo_id", "number")) as writer:
+            if await self._list_changed(f"{repo_path}/pulls", params, validators):
+                async for pr in self.fetch_pull_requests(repo, state, stop=synced_before):
+                    if newest is None:
+                        newest = parse_datetime(pr.get("updatedAt"))
+                    try:
+                        merged = bool(pr.get("merged", False))
+                        # Reviews
+                        reviews = []
+                        approved_count = 0
+                        changes_requested_count = 0
+                        for rv in (pr.get("reviews") or {}).get("nodes") or []:
+                            r_state = (rv.get("state") or "").lower()
+                            if r_state == "approved":
+                                approved_count += 1
+                            elif r_state == "changes_requested":
+                                changes_requested_count += 1
+                            reviews.append({
+                                "user": (rv.get("author") or {}).get("login"),
+                                "state": rv.get("state"),
+                                "created_at": parse_datetime(rv.get("submittedAt")),
+                            })
+                        # Time metrics
+                        created_at = parse_datetime(pr.get("createdAt"))
+                        merged_at = parse_datetime(pr.get("mergedAt"))
+                        first_review_time = min([r["created_at"] for r in reviews if r.get("created_at")], default=None)
+                        time_to_first_review = None
+                        if created_at and first_review_time:
+                            time_to_first_review = int((first_review_time - created_at).total_seconds() // 60)
+                        time_to_merge = None
+                        if created_at and merged_at:
+                            time_to_merge = int((merged_at - created_at).total_seconds() // 60)
+                        milestone = pr.get("milestone")
+                        author = pr.get("author") or {}
+                        fields = {
+                            "state": PRState.MERGED if merged else (
+                                PRState.OPEN if (pr.get("state") or "OPEN").upper() == "OPEN" else PRState.CLOSED
+                            ),
+                            "assignees": [a["login"] for a in (pr.get("assignees") or {}).get("nodes") or []],
+                            "requested_reviewers": [
+                                rr["requestedReviewer"]["login"]
+                                for rr in (pr.get("reviewRequests") or {}).get("nodes") or []
+                                if (rr.get("requestedReviewer") or {}).get("login")
+                            ],
+                            "labels": [l["name"] for l in (pr.get("labels") or {}).get("nodes") or []],
+                            "milestone_id": milestone["number"] if milestone else None,
+                            "milestone_title": milestone["title"] if milestone else None,
+                            "merged": merged,
+                            "merged_by": (pr.get("mergedBy") or {}).get("login") if merged else None,
+                            "merge_commit_sha": (pr.get("mergeCommit") or {}).get("oid"),
+                            "reviews": reviews,
+                            "approved_count": approved_count,
+                            "changes_requested_count": changes_requested_count,
+                            "closed_at": parse_datetime(pr.get("closedAt")),
+                            "merged_at": merged_at,
+                            "time_to_first_review": time_to_first_review,
+                            "time_to_merge": time_to_merge,
+                            "additions": pr.get("additions") or 0,
+                            "deletions": pr.get("deletions") or 0,
+                            "changed_files": pr.get("changedFiles") or 0,
+                            "commits_count": (pr.get("commits") or {}).get("totalCount", 0),
+                            "comments_count": (pr.get("comments") or {}).get("totalCount", 0),
+                            **_present(
+                                title=pr.get("title"),
+                                body=pr.get("body"),
+                                updated_at=parse_datetime(pr.get("updatedAt")),
+                            ),
+                        }
+                        await writer.add(
+                            {"repo_id": repo.id, "number": pr["number"]},
+                            fields,
+                            {
+                                "github_id": pr.get("databaseId") or 0,
+                                "title": "",
+                                "author_login": author.get("login") or "unknown",
+                                "author_avatar": author.get("avatarUrl"),
+                                "head_branch": pr.get("headRefName") or "",
+                                "base_branch": pr.get("baseRefName") or "",
+                                "head_sha": pr.get("headRefOid") or "",
+                                "base_sha": pr.get("baseRefOid") or "",
+                                "created_at": created_at or datetime.utcnow(),
+                                "updated_at": created_at or datetime.utcnow(),
+                            },
+                        )
+                    except Exception as e:
+                        writer.stats.failed += 1
+                        logger.warning(f"Failed to sync PR #{pr.get('number', 'unknown')}: {e}")
+        await self._save_cursor(cursor, validators, writer.stats, newest)
+        return writer.stats
+
+    async def sync_contributors(self, repo: Repo, full: bool = False) -> UpsertStats:
         """Sync contributors and basic analytics"""
-        gh_repo = self._get_gh_repo(repo)
-        for c in gh_repo.get_contributors():
-            try:
-                user_login = getattr(c, "login", None) or getattr(getattr(c, "author", None), "login", None)
-                if not user_login:
-                    continue
-                existing = await Contributor.find_one(Contributor.repo_id == repo.id, Contributor.login == user_login)
-                if not existing:
-                    existing = Contributor(
-                        repo_id=repo.id,
-                        login=user_login,
-                        github_id=getattr(c, "id", 0) or 0,
-                        avatar_url=getattr(c, "avatar_url", None),
-                        name=None,
-                        email=None,
-                        bio=None,
-                        company=None,
-                        location=None,
-                        commits_count=getattr(c, "contributions", 0) or 0,
-                        prs_created=0,
-                        prs_merged=0,
-                        issues_created=0,
-                        issues_closed=0,
-                        reviews_given=0,
-                        comments_made=0,
-                        lines_added=0,
-                        lines_deleted=0,
-                        last_commit_date=None,
-                        last_pr_date=None,
-                        last_issue_date=None,
-                        last_activity_date=None,
-                        primary_languages=[],
-                        skill_tags=[],
-                        avg_pr_merge_time=None,
-                        pr_approval_rate=0.0,
-                        is_active=True,
-                        days_inactive=0,
-                        user_id=None,
-                        total_xp_earned=0,
+        repo_path = self._repo_path(repo)
+        cursor = await self._get_cursor(repo, "contributors", full)
+        pages = [Validators(**page) for page in cursor.pages]
+        async with BulkUpserter(Contributor, ("repo_id", "login")) as writer:
+            async for c in self.rest_client.paginate_pages(f"{repo_path}/contributors", None, pages):
+                try:
+                    user_login = c.get("login")
+                    if not user_login:
+                        continue
+                    fields = {}
+                    if "contributions" in c:
+                        fields["commits_count"] = c["contributions"] or 0
+                    await writer.add(
+                        {"repo_id": repo.id, "login": user_login},
+                        fields,
+                        {
+                            "github_id": c.get("id", 0) or 0,
+                            "avatar_url": c.get("avatar_url"),
+                            "is_active": True,
+                        },
                     )
-                    await existing.insert()
-                else:
-                    existing.commits_count = getattr(c, "contributions", existing.commits_count)
-                    await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync contributor: {e}")
+                except Exception as e:
+                    writer.stats.failed += 1
+                    logger.warning(f"Failed to sync contributor: {e}")
+        await self._save_cursor(cursor, None, writer.stats, pages=pages)
+        return writer.stats
 
-    async def sync_releases(self, repo: Repo) -> None:
+    async def sync_releases(self, repo: Repo, full: bool = False) -> UpsertStats:
         """Sync releases and tags"""
-        gh_repo = self._get_gh_repo(repo)
-        for rel in gh_repo.get_releases():
-            try:
-                assets = []
-                total_downloads = 0
-                for a in rel.get_assets():
-                    assets.append({
-                        "name": getattr(a, "name", None),
-                        "size": getattr(a, "size", 0),
-                        "download_count": getattr(a, "download_count", 0),
-                        "content_type": getattr(a, "content_type", None),
-                        "created_at": self._to_naive(getattr(a, "created_at", None)),
-                    })
-                    total_downloads += getattr(a, "download_count", 0) or 0
-                existing = await Release.find_one(Release.repo_id == repo.id, Release.github_id == rel.id)
-                if not existing:
-                    existing = Release(
-                        repo_id=repo.id,
-                        github_id=rel.id,
-                        tag_name=getattr(rel, "tag_name", ""),
-                        name=getattr(rel, "title", None),
-                        body=getattr(rel, "body", None),
-                        is_prerelease=bool(getattr(rel, "prerelease", False)),
-                        is_draft=bool(getattr(rel, "draft", False)),
-                        author_login=getattr(getattr(rel, "author", None), "login", None) or "unknown",
-                        assets=assets,
-                        assets_count=len(assets),
-                        created_at=self._to_naive(getattr(rel, "created_at", None)) or datetime.utcnow(),
-                        published_at=self._to_naive(getattr(rel, "published_at", None)),
-                        download_count=total_downloads,
+        repo_path = self._repo_path(repo)
+        cursor = await self._get_cursor(repo, "releases", full)
+        pages = [Validators(**page) for page in cursor.pages]
+        async with BulkUpserter(Release, ("repo_id", "github_id")) as writer:
+            async for rel in self.rest_client.paginate_pages(f"{repo_path}/releases", None, pages):
+                try:
+                    assets = [
+                        {
+                            "name": a.get("name"),
+                            "size": a.get("size", 0),
+                            "download_count": a.get("download_count", 0),
+                            "content_type": a.get("content_type"),
+                            "created_at": parse_datetime(a.get("created_at")),
+                        }
+                        for a in rel.get("assets") or []
+                    ]
+                    await writer.add(
+                        {"repo_id": repo.id, "github_id": rel["id"]},
+                        {
+                            "name": rel.get("name"),
+                            "body": rel.get("body"),
+                            "is_prerelease": bool(rel.get("prerelease", False)),
+                            "is_draft": bool(rel.get("draft", False)),
+                            "assets": assets,
+                            "assets_count": len(assets),
+                            "published_at": parse_datetime(rel.get("published_at")),
+                            "download_count": sum(a["download_count"] or 0 for a in assets),
+                        },
+                        {
+                            "tag_name": rel.get("tag_name", ""),
+                            "author_login": (rel.get("author") or {}).get("login") or "unknown",
+                            "created_at": parse_datetime(rel.get("created_at")) or datetime.utcnow(),
+                        },
                     )
-                    await existing.insert()
-                else:
-                    existing.name = getattr(rel, "title", existing.name)
-                    existing.body = getattr(rel, "body", existing.body)
-                    existing.is_prerelease = bool(getattr(rel, "prerelease", existing.is_prerelease))
-                    existing.is_draft = bool(getattr(rel, "draft", existing.is_draft))
-                    existing.assets = assets
-                    existing.assets_count = len(assets)
-                    existing.published_at = self._to_naive(getattr(rel, "published_at", None))
-                    existing.download_count = total_downloads
-                    await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync release {getattr(rel, 'tag_name', 'unknown')}: {e}")
+                except Exception as e:
+                    writer.stats.failed += 1
+                    logger.warning(f"Failed to sync release {rel.get('tag_name', 'unknown')}: {e}")
+        await self._save_cursor(cursor, None, writer.stats, pages=pages)
+        return writer.stats
 
-    async def sync_milestones(self, repo: Repo) -> None:
+    async def sync_milestones(self, repo: Repo, full: bool = False) -> UpsertStats:
         """Sync milestones with progress"""
-        gh_repo = self._get_gh_repo(repo)
-        # GitHub API supports open/closed; fetch both
-        for state in ("open", "closed"):
-            try:
-                for m in gh_repo.get_milestones(state=state):
-                    open_issues = getattr(m, "open_issues", 0) or 0
-                    closed_issues = getattr(m, "closed_issues", 0) or 0
-                    total = open_issues + closed_issues
-                    progress = round((closed_issues / total) * 100, 2) if total > 0 else 0.0
-                    existing = await Milestone.find_one(Milestone.repo_id == repo.id, Milestone.number == m.number)
-                    if not existing:
-                        existing = Milestone(
-                            repo_id=repo.id,
-                            github_id=m.id,
-                            number=m.number,
-                            title=m.title or "",
-                            description=getattr(m, "description", None),
-                            state=m.state or state,
-                            open_issues=open_issues,
-                            closed_issues=closed_issues,
-                            progress_percentage=progress,
-                            created_at=self._to_naive(getattr(m, "created_at", None)) or datetime.utcnow(),
-                            updated_at=self._to_naive(getattr(m, "updated_at", None)) or datetime.utcnow(),
-                            due_on=self._to_naive(getattr(m, "due_on", None)),
-                            closed_at=self._to_naive(getattr(m, "closed_at", None)),
-                            estimated_completion=None,
-                            velocity=None,
+        repo_path = self._repo_path(repo)
+        cursors = {}
+        async with BulkUpserter(Milestone, ("repo_id", "number")) as writer:
+            # GitHub API supports open/closed; fetch both
+            for state in ("open", "closed"):
+                cursor = await self._get_cursor(repo, f"milestones:{state}", full)
+                pages = [Validators(**page) for page in cursor.pages]
+                cursors[state] = (cursor, pages)
+                try:
+                    async for m in self.rest_client.paginate_pages(
+                        f"{repo_path}/milestones", {"state": state}, pages
+                    ):
+                        open_issues = m.get("open_issues", 0) or 0
+                        closed_issues = m.get("closed_issues", 0) or 0
+                        total = open_issues + closed_issues
+                        await writer.add(
+                            {"repo_id": repo.id, "number": m["number"]},
+                            {
+                                "description": m.get("description"),
+                                "state": m.get("state") or state,
+                                "open_issues": open_issues,
+                                "closed_issues": closed_issues,
+                                "progress_percentage": round((closed_issues / total) * 100, 2) if total > 0 else 0.0,
+                                "due_on": parse_datetime(m.get("due_on")),
+                                "closed_at": parse_datetime(m.get("closed_at")),
+                                **_present(title=m.get("title"), updated_at=parse_datetime(m.get("updated_at"))),
+                            },
+                            {
+                                "github_id": m["id"],
+                                "title": "",
+                                "created_at": parse_datetime(m.get("created_at")) or datetime.utcnow(),
+                                "updated_at": datetime.utcnow(),
+                            },
                         )
-                        await existing.insert()
-                    else:
-                        existing.title = m.title or existing.title
-                        existing.description = getattr(m, "description", existing.description)
-                        existing.state = m.state or existing.state
-                        existing.open_issues = open_issues
-                        existing.closed_issues = closed_issues
-                        existing.progress_percentage = progress
-                        existing.updated_at = self._to_naive(getattr(m, "updated_at", None)) or existing.updated_at
-                        existing.due_on = self._to_naive(getattr(m, "due_on", None))
-                        existing.closed_at = self._to_naive(getattr(m, "closed_at", None))
-                        await existing.save()
-            except Exception as e:
-                logger.warning(f"Failed to sync milestones (state={state}): {e}")
+                except Exception as e:
+                    writer.stats.failed += 1
+                    logger.warning(f"Failed to sync milestones (state={state}): {e}")
+        for cursor, pages in cursors.values():
+            await self._save_cursor(cursor, None, writer.stats, pages=pages)
+        return writer.stats
@@ -0,0 +1,212 @@
+"""
+GitHub Rate Limits - per-token scheduling of GitHub API requests
+
+GitHub budgets each token separately (REST requests and GraphQL points per
+hour, plus secondary limits on bursts), so every request made with a token goes
+through that token's GitHubRateLimiter, shared by all callers in the process:
+
+- requests are paced by a token bucket (GITHUB_REQUESTS_PER_SECOND with bursts
+  of GITHUB_REQUEST_BURST);
+- the remaining REST budget (``X-RateLimit-*`` headers) and GraphQL budget
+  (``rateLimit`` in query results) are tracked, and once a budget is spent
+  requests wait for its reset;
+- after a secondary rate limit the token is paused for ``Retry-After``, or with
+  exponential backoff when GitHub sends none;
+- interactive requests are served before background ones, and background
+  requests leave GITHUB_RATE_LIMIT_RESERVE of each budget to interactive ones.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pause after a secondary limit without Retry-After, doubled while they continue
+SECONDARY_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 15 * 60
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # A user is waiting for the result
+    BACKGROUND = 1  # Full syncs and other batch work
+
+
+class RateLimitExceeded(Exception):
+    """An interactive request would have to wait longer than GITHUB_INTERACTIVE_MAX_WAIT_SECONDS"""
+
+    def __init__(self, resource: str, wait_seconds: float):
+        super().__init__(f"GitHub {resource} rate limit exhausted; retry in {int(wait_seconds) + 1}s")
+        self.resource = resource
+        self.wait_seconds = wait_seconds
+
+
+@dataclass
+class RateBudget:
+    limit: int
+    remaining: int
+    reset_at: float  # Epoch seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_at": datetime.utcfromtimestamp(self.reset_at),
+        }
+
+
+class GitHubRateLimiter:
+    """Schedules the requests made with one token"""
+
+    def __init__(self, rate: float, burst: int, reserve: int):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        # Rate limit resource (core, search, graphql, ...) -> what GitHub last reported
+        self.budgets: Dict[str, RateBudget] = {}
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = SECONDARY_BACKOFF_SECONDS
+        # Waiting requests per resource as (priority, arrival) heaps
+        self._queues: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._arrivals = itertools.count()
+        self._condition = asyncio.Condition()
+
+    def _delay(self, resource: str, priority: Priority) -> float:
+        """Seconds until a request for ``resource`` may be sent"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        delay = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.0)
+
+        budget = self.budgets.get(resource)
+        if budget is not None:
+            if time.time() >= budget.reset_at:
+                budget.remaining = budget.limit
+            floor = 0 if priority == Priority.INTERACTIVE else min(self.reserve, budget.limit // 2)
+            if budget.remaining <= floor:
+                delay = max(delay, budget.reset_at - time.time())
+        return delay
+
+    async def acquire(self, resource: str, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Wait until a request may be sent, taking turns by priority, then arrival"""
+        queue = self._queues[resource]
+        ticket = (int(priority), next(self._arrivals))
+        max_wait = settings.GITHUB_INTERACTIVE_MAX_WAIT_SECONDS if priority == Priority.INTERACTIVE else None
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        async with self._condition:
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if queue[0] == ticket:
+                        timeout = self._delay(resource, priority)
+                        if timeout <= 0:
+                            heapq.heappop(queue)
+                            self._tokens -= 1
+                            if resource in self.budgets:
+                                self.budgets[resource].remaining -= 1
+                            return
+                    if deadline is not None:
+                        left = deadline - time.monotonic()
+                        if left <= 0 or (timeout is not None and timeout > left):
+                            # Requests behind the head give up at their deadline too
+                            wait = timeout if timeout is not None else self._delay(resource, priority)
+                            raise RateLimitExceeded(resource, max(wait, 0.0))
+                        timeout = left if timeout is None else timeout
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                # The next request in line re-checks its turn
+                self._condition.notify_all()
+
+    def _set_budget(self, resource: str, limit: Any, remaining: Any, reset_at: float) -> None:
+        self.budgets[resource] = RateBudget(int(limit), int(remaining), reset_at)
+
+    def _pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _notify(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def record_response(self, response: httpx.Response) -> bool:
+        """Update the budget from a REST response; True if it hit a rate limit and may be retried"""
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None and headers.get("X-RateLimit-Reset"):
+            self._set_budget(
+                headers.get("X-RateLimit-Resource", "core"),
+                headers.get("X-RateLimit-Limit", remaining),
+                remaining,
+                float(headers["X-RateLimit-Reset"]),
+            )
+
+        limited = response.status_code == 429 or (
+            response.status_code == 403
+            and ("Retry-After" in headers or remaining == "0" or "rate limit" in response.text.lower())
+        )
+        if not limited:
+            self._backoff = SECONDARY_BACKOFF_SECONDS
+        elif "Retry-After" in headers:
+            self._pause(float(headers["Retry-After"]))
+        elif remaining != "0":
+            # Secondary limit without Retry-After; a spent primary budget waits for its reset instead
+            self._pause(self._backoff)
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF_SECONDS)
+        if limited:
+            logger.warning(f"GitHub rate limit hit (status {response.status_code}, remaining {remaining})")
+        await self._notify()
+        return limited
+
+    async def record_graphql(self, rate_limit: Optional[Dict[str, Any]]) -> None:
+        """Update the GraphQL budget from a query's ``rateLimit { limit remaining resetAt }``"""
+        if not rate_limit:
+            return
+        reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00")).timestamp()
+        self._set_budget("graphql", rate_limit.get("limit") or rate_limit["remaining"], rate_limit["remaining"], reset_at)
+        self._backoff = SECONDARY_BACKOFF_SECONDS
+        await self._notify()
+
+    async def rate_limited(self, resource: str, exhausted: bool = False) -> None:
+        """Record a rate limit reported without headers (GraphQL errors)"""
+        budget = self.budgets.get(resource)
+        if exhausted and budget is not None and budget.reset_at > time.time():
+            budget.remaining = 0
+        else:
+            self._pause(self._backoff)
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF_SECONDS)
+        logger.warning(f"GitHub {resource} rate limit hit")
+        await self._notify()
+
+
+_limiters: Dict[str, GitHubRateLimiter] = {}
+
+
+def get_rate_limiter(token: str) -> GitHubRateLimiter:
+    """The limiter shared by every request made with ``token`` in this process"""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = GitHubRateLimiter(
+            rate=settings.GITHUB_REQUESTS_PER_SECOND,
+            burst=settings.GITHUB_REQUEST_BURST,
+            reserve=settings.GITHUB_RATE_LIMIT_RESERVE,
+        )
+    return limiter
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 from beanie import PydanticObjectId
 from app.models import Repo, User, XPEvent
+from app.services.xp_rollup import record_xp_event
 
 
 DEFAULT_XP = {
@@ -36,6 +37,7 @@ async def _award_xp(repo: Repo, gh_username: Optional[str], source: str, amount:
         skill_distribution=skill_distribution,
     )
     await xp.insert()
+    await record_xp_event(xp)
 
 
 async def award_xp_for_pr_merged(repo: Repo, gh_username: Optional[str]):
@@ -0,0 +1,172 @@
+"""
+Hiring Pipeline Analytics - candidate funnel metrics from one aggregation
+
+Stage counts, conversions, time-in-stage (from stage_history timestamps) and
+monthly intake are computed by a single $facet over candidates, optionally
+scoped to one job posting.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+import logging
+
+from app.models import Candidate, HiringStage
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STAGES = ["Applied", "Screening", "Interview", "Technical Assessment", "Offer", "Hired", "Rejected"]
+MS_PER_DAY = 1000 * 60 * 60 * 24
+TREND_MONTHS = 6
+
+# Stages are stored as HiringStage values ("technical_assessment"); older data and
+# reports use the display labels ("Technical Assessment"). Both map to the label.
+STAGE_LABELS: Dict[str, str] = {}
+for _label in PIPELINE_STAGES:
+    STAGE_LABELS[_label] = _label
+    STAGE_LABELS[_label.lower().replace(" ", "_")] = _label
+
+
+def stage_values(*labels: str) -> List[str]:
+    """Every stored spelling of the given display labels, for $in matches"""
+    return [value for value, label in STAGE_LABELS.items() if label in labels]
+
+
+# Time spent in a final stage is not a wait, so it is only counted once the candidate moves on
+TERMINAL_STAGES = [HiringStage.HIRED.value, HiringStage.REJECTED.value, HiringStage.WITHDRAWN.value, "Hired", "Rejected"]
+
+
+def _history_timestamp(field: str) -> Dict[str, Any]:
+    """stage_history timestamps are ISO strings; older entries used a changed_at date"""
+    return {"$convert": {
+        "input": {"$ifNull": [f"{field}.timestamp", f"{field}.changed_at"]},
+        "to": "date",
+        "onError": None,
+        "onNull": None
+    }}
+
+
+def _stage_time_facet(now: datetime) -> List[Dict[str, Any]]:
+    """Per-stage day totals: each history entry lasts until the next one (or now)"""
+    return [
+        {"$project": {"history": {"$map": {
+            "input": {"$ifNull": ["$stage_history", []]},
+            "as": "h",
+            "in": {"stage": "$$h.stage", "at": _history_timestamp("$$h")}
+        }}}},
+        {"$project": {"spans": {"$map": {
+            "input": {"$range": [0, {"$size": "$history"}]},
+            "as": "i",
+            "in": {
+                "stage": {"$arrayElemAt": ["$history.stage", "$$i"]},
+                "entered": {"$arrayElemAt": ["$history.at", "$$i"]},
+                "left": {"$arrayElemAt": ["$history.at", {"$add": ["$$i", 1]}]}
+            }
+        }}}},
+        {"$unwind": "$spans"},
+        {"$project": {
+            "stage": "$spans.stage",
+            "entered": "$spans.entered",
+            "left": {"$ifNull": [
+                "$spans.left",
+                {"$cond": [{"$in": ["$spans.stage", TERMINAL_STAGES]}, None, now]}
+            ]}
+        }},
+        {"$match": {"entered": {"$ne": None}, "left": {"$ne": None}}},
+        {"$group": {
+            "_id": "$stage",
+            "days": {"$sum": {"$floor": {"$divide": [{"$subtract": ["$left", "$entered"]}, MS_PER_DAY]}}},
+            "n": {"$sum": 1}
+        }}
+    ]
+
+
+def _pipeline(now: datetime, job_posting_id: Optional[str]) -> List[Dict[str, Any]]:
+    month_bounds = [now - timedelta(days=30 * i) for i in range(TREND_MONTHS, -1, -1)]
+    pipeline: List[Dict[str, Any]] = []
+    if job_posting_id:
+        pipeline.append({"$match": {"job_posting_id": {"$in": [ObjectId(job_posting_id), job_posting_id]}}})
+    pipeline.append({"$facet": {
+        "total": [{"$count": "n"}],
+        "by_stage": [{"$group": {"_id": "$current_stage", "n": {"$sum": 1}}}],
+        # Distinct candidates that ever reached each stage
+        "reached": [
+            {"$unwind": "$stage_history"},
+            {"$group": {"_id": {"candidate": "$_id", "stage": "$stage_history.stage"}}},
+            {"$group": {"_id": "$_id.stage", "n": {"$sum": 1}}}
+        ],
+        "stage_time": _stage_time_facet(now),
+        "monthly": [
+            {"$match": {"created_at": {"$gte": month_bounds[0], "$lt": month_bounds[-1]}}},
+            {"$bucket": {"groupBy": "$created_at", "boundaries": month_bounds, "output": {"n": {"$sum": 1}}}}
+        ]
+    }})
+    return pipeline
+
+
+def _by_label(rows: List[Dict[str, Any]], *fields: str) -> Dict[str, Dict[str, float]]:
+    """Sum grouped rows into display labels, dropping stages outside the funnel"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for row in rows:
+        label = STAGE_LABELS.get(row["_id"])
+        if not label:
+            continue
+        bucket = totals.setdefault(label, {field: 0 for field in fields})
+        for field in fields:
+            bucket[field] += row.get(field, 0)
+    return totals
+
+
+async def get_pipeline_health(job_posting_id: Optional[str] = None) -> Dict[str, Any]:
+    """Detailed hiring pipeline analytics, globally or for one job posting"""
+    # Whole seconds: BSON dates keep only milliseconds, and the monthly $bucket
+    # ids must come back equal to the month starts computed from now
+    now = datetime.utcnow().replace(microsecond=0)
+    results = await Candidate.aggregate(_pipeline(now, job_posting_id)).to_list()
+    facets = results[0] if results else {}
+    
+    total_rows = facets.get("total") or []
+    total_candidates = total_rows[0]["n"] if total_rows else 0
+    
+    # Candidates by stage
+    by_stage = _by_label(facets.get("by_stage", []), "n")
+    candidates_by_stage = {stage: int(by_stage.get(stage, {}).get("n", 0)) for stage in PIPELINE_STAGES}
+    
+    # Stage conversion rates
+    reached = _by_label(facets.get("reached", []), "n")
+    stage_conversion_rates = {}
+    for current_stage, next_stage in zip(PIPELINE_STAGES, PIPELINE_STAGES[1:]):
+        current_count = candidates_by_stage[current_stage]
+        progressed = reached.get(next_stage, {}).get("n", 0)
+        stage_conversion_rates[f"{current_stage}_to_{next_stage}"] = (
+            (progressed / current_count * 100) if current_count > 0 else 0
+        )
+    
+    # Average time per stage
+    stage_time = _by_label(facets.get("stage_time", []), "days", "n")
+    avg_time_per_stage_days = {
+        stage: (stage_time[stage]["days"] / stage_time[stage]["n"]) if stage_time.get(stage, {}).get("n") else 0
+        for stage in PIPELINE_STAGES
+    }
+    
+    # Monthly trends (last 6 months); $bucket ids are the window starts
+    monthly = {row["_id"]: row["n"] for row in facets.get("monthly", [])}
+    monthly_trends = []
+    for i in range(TREND_MONTHS, 0, -1):
+        month_start = now - timedelta(days=30 * i)
+        monthly_trends.append({
+            "month": month_start.strftime("%b %Y"),
+            "candidates": monthly.get(month_start, 0)
+        })
+    
+    return {
+        "total_candidates": total_candidates,
+        "candidates_by_stage": candidates_by_stage,
+        "stage_conversion_rates": stage_conversion_rates,
+        "avg_time_to_hire_days": sum(avg_time_per_stage_days.values()),
+        "avg_time_per_stage_days": avg_time_per_stage_days,
+        "offer_acceptance_rate": (candidates_by_stage.get("Hired", 0) /
+                                  (candidates_by_stage.get("Offer") or 1) * 100),
+        "rejection_reasons": {},
+        "top_sources": [],
+        "monthly_trends": monthly_trends
+    }
@@ -0,0 +1,67 @@
+"""
+Leaderboard Scheduler - periodic XP leaderboard snapshots
+
+Rebuilds the daily, weekly, monthly and all-time leaderboards on an interval so
+readers serve the latest stored snapshot (app.services.xp_calculator.get_latest_leaderboard)
+instead of aggregating xp_events per request. Only the newest
+LEADERBOARD_SNAPSHOT_RETENTION snapshots are kept for each period.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.models import XPLeaderboard
+from app.services.xp_calculator import XPCalculator
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_PERIODS = ("daily", "weekly", "monthly", "all-time")
+
+
+async def prune_leaderboards(period: str, keep: int) -> int:
+    """Delete all but the newest ``keep`` snapshots of a period"""
+    collection = XPLeaderboard.get_motor_collection()
+    cutoff = await collection.find(
+        {"period": period}, {"generated_at": 1}
+    ).sort("generated_at", -1).skip(max(keep - 1, 0)).limit(1).to_list(1)
+    if not cutoff:
+        return 0
+    result = await collection.delete_many({
+        "period": period,
+        "generated_at": {"$lt": cutoff[0]["generated_at"]},
+    })
+    return result.deleted_count
+
+
+async def snapshot_leaderboards() -> None:
+    """Generate a fresh snapshot for every period and apply retention"""
+    calculator = XPCalculator()
+    for period in LEADERBOARD_PERIODS:
+        try:
+            await calculator.generate_leaderboard(period, settings.LEADERBOARD_SNAPSHOT_SIZE)
+            await prune_leaderboards(period, settings.LEADERBOARD_SNAPSHOT_RETENTION)
+        except Exception as e:
+            logger.error(f"Error snapshotting {period} leaderboard: {e}")
+
+
+async def _snapshot_loop(app: FastAPI, interval_seconds: int) -> None:
+    try:
+        while True:
+            await snapshot_leaderboards()
+            await asyncio.sleep(interval_seconds)
+    except asyncio.CancelledError:
+        return
+
+
+def start_leaderboard_scheduler(app: FastAPI) -> None:
+    app.state.leaderboard_scheduler = asyncio.create_task(
+        _snapshot_loop(app, settings.LEADERBOARD_SNAPSHOT_INTERVAL_SECONDS)
+    )
+
+
+def stop_leaderboard_scheduler(app: FastAPI) -> None:
+    task = getattr(app.state, "leaderboard_scheduler", None)
+    if task:
+        task.cancel()
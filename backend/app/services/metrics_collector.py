@@ -0,0 +1,192 @@
+"""
+Metrics Collector - periodic snapshots of key dashboard values
+
+Every METRICS_COLLECTION_INTERVAL_SECONDS the collector records headcount,
+active projects, XP awarded in the last day and hiring pipeline size as samples
+in ``metric_samples`` (a MongoDB time-series collection where supported, a plain
+indexed collection otherwise). Each sample is also folded into hourly, daily and
+weekly buckets in ``metric_rollups`` so trend queries read a bounded number of
+pre-aggregated points whatever the range.
+"""
+from __future__ import annotations
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+from fastapi import FastAPI
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from app.core.config import settings
+from app.db.mongo import get_client
+from app.models import User, Project, XPEvent, Candidate
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_COLLECTION = "metric_samples"
+ROLLUPS_COLLECTION = "metric_rollups"
+
+# Resolution -> how long its buckets are kept (None keeps them forever)
+ROLLUP_RETENTION: Dict[str, Optional[timedelta]] = {
+    "hour": timedelta(days=30),
+    "day": timedelta(days=800),
+    "week": None,
+}
+ROLLUP_RESOLUTIONS = tuple(ROLLUP_RETENTION)
+
+
+def _db():
+    return get_client()[settings.MONGODB_DB]
+
+
+def bucket_start(resolution: str, ts: datetime) -> datetime:
+    """Start of the hour, day or ISO week (Monday) containing ``ts``"""
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+async def ensure_metric_collections() -> None:
+    """Create the samples collection (time-series when available) and rollup indexes"""
+    db = _db()
+    retention_seconds = settings.METRICS_SAMPLE_RETENTION_DAYS * 86400
+    try:
+        await db.create_collection(
+            SAMPLES_COLLECTION,
+            timeseries={"timeField": "timestamp", "metaField": "metric", "granularity": "minutes"},
+            expireAfterSeconds=retention_seconds,
+        )
+    except CollectionInvalid:
+        pass  # Already exists
+    except OperationFailure as e:
+        # Time-series collections need MongoDB 5.0+; fall back to a regular collection
+        logger.info(f"Time-series collections unavailable ({e}); using a regular collection for metric samples")
+        await db[SAMPLES_COLLECTION].create_index([("metric.name", ASCENDING), ("timestamp", ASCENDING)])
+        await db[SAMPLES_COLLECTION].create_index("timestamp", expireAfterSeconds=retention_seconds)
+
+    rollups = db[ROLLUPS_COLLECTION]
+    await rollups.create_index(
+        [("metric_name", ASCENDING), ("resolution", ASCENDING), ("bucket_start", ASCENDING)],
+        unique=True,
+    )
+    await rollups.create_index("expires_at", expireAfterSeconds=0)
+
+
+async def collect_metric_values(now: datetime) -> Dict[str, float]:
+    """Current values of the tracked dashboard metrics"""
+    headcount, active_projects, xp_rows, pipeline_size = await asyncio.gather(
+        User.find({"is_active": True}).count(),
+        Project.find({"status": {"$in": ["active", "in_progress"]}}).count(),
+        XPEvent.aggregate([
+            {"$match": {"created_at": {"$gte": now - timedelta(days=1)}}},
+            {"$group": {"_id": None, "xp": {"$sum": "$amount"}}},
+        ]).to_list(),
+        Candidate.find({"status": "active"}).count(),
+    )
+    return {
+        "headcount": headcount,
+        "active_projects": active_projects,
+        "xp_per_day": xp_rows[0]["xp"] if xp_rows else 0,
+        "pipeline_size": pipeline_size,
+    }
+
+
+def _rollup_updates(metric_name: str, value: float, ts: datetime) -> List[UpdateOne]:
+    updates = []
+    for resolution, retention in ROLLUP_RETENTION.items():
+        start = bucket_start(resolution, ts)
+        on_insert: Dict[str, Any] = {}
+        if retention is not None:
+            on_insert["expires_at"] = start + retention
+        update: Dict[str, Any] = {
+            "$inc": {"count": 1, "sum": value},
+            "$min": {"min": value},
+            "$max": {"max": value},
+            "$set": {"last": value, "last_at": ts},
+        }
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        updates.append(UpdateOne(
+            {"metric_name": metric_name, "resolution": resolution, "bucket_start": start},
+            update,
+            upsert=True,
+        ))
+    return updates
+
+
+async def record_metric_samples(values: Dict[str, float], now: Optional[datetime] = None) -> None:
+    """Store one sample per metric and fold it into every rollup resolution"""
+    now = now or datetime.utcnow()
+    db = _db()
+    await db[SAMPLES_COLLECTION].insert_many([
+        {"timestamp": now, "metric": {"name": name, "type": "dashboard"}, "value": value}
+        for name, value in values.items()
+    ])
+    updates = [update for name, value in values.items() for update in _rollup_updates(name, value, now)]
+    await db[ROLLUPS_COLLECTION].bulk_write(updates, ordered=False)
+
+
+async def collect_metrics() -> Dict[str, float]:
+    now = datetime.utcnow()
+    values = await collect_metric_values(now)
+    await record_metric_samples(values, now)
+    return values
+
+
+async def get_metric_rollups(
+    metric_name: str,
+    resolution: str,
+    start: datetime,
+    end: datetime,
+) -> List[Dict[str, Any]]:
+    """Rollup buckets for a metric between ``start`` and ``end``, oldest first"""
+    return await _db()[ROLLUPS_COLLECTION].find(
+        {
+            "metric_name": metric_name,
+            "resolution": resolution,
+            "bucket_start": {"$gte": bucket_start(resolution, start), "$lte": end},
+        },
+        {"_id": 0},
+    ).sort("bucket_start", 1).to_list(None)
+
+
+def resolution_for_range(days: int) -> str:
+    """Coarsest resolution that keeps a trend query to a few hundred points at most"""
+    if days <= 7:
+        return "hour"
+    if days <= 180:
+        return "day"
+    return "week"
+
+
+async def _collector_loop(app: FastAPI, interval_seconds: int) -> None:
+    try:
+        try:
+            await ensure_metric_collections()
+        except Exception as e:
+            logger.error(f"Error preparing metric collections: {e}")
+        while True:
+            try:
+                await collect_metrics()
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {e}")
+            await asyncio.sleep(interval_seconds)
+    except asyncio.CancelledError:
+        return
+
+
+def start_metrics_collector(app: FastAPI) -> None:
+    app.state.metrics_collector = asyncio.create_task(
+        _collector_loop(app, settings.METRICS_COLLECTION_INTERVAL_SECONDS)
+    )
+
+
+def stop_metrics_collector(app: FastAPI) -> None:
+    task = getattr(app.state, "metrics_collector", None)
+    if task:
+        task.cancel()
@@ -0,0 +1,120 @@
+"""
+Organization Leaderboard - every active user ranked by XP in one aggregation
+
+Joins each active user with their XP rollup (xp_user_totals) for totals and the
+skill breakdown, ranks them, and only then joins project membership
+(projects.members.user_id) for the requested page.
+"""
+from typing import Any, Dict, List, Optional
+import logging
+
+from app.core.cache import cached
+from app.core.config import settings
+from app.models import User
+from app.services.xp_rollup import decode_key
+
+logger = logging.getLogger(__name__)
+
+
+def _leaderboard_pipeline(skip: int, limit: Optional[int], top_n: Optional[int]) -> List[Dict[str, Any]]:
+    page: List[Dict[str, Any]] = [{"$skip": skip}]
+    if limit is not None:
+        page.append({"$limit": limit})
+    page += [
+        {"$lookup": {
+            "from": "projects",
+            "localField": "_id",
+            "foreignField": "members.user_id",
+            "pipeline": [{"$project": {"_id": 1}}],
+            "as": "projects"
+        }},
+        {"$set": {"project_count": {"$size": "$projects"}}},
+        {"$project": {"projects": 0}},
+    ]
+    
+    ranked: List[Dict[str, Any]] = [{"$sort": {"total_xp": -1, "_id": 1}}]
+    if top_n is not None:
+        ranked.append({"$limit": top_n})
+    
+    return [
+        {"$match": {"is_active": True}},
+        {"$lookup": {
+            "from": "xp_user_totals",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$project": {"total_xp": 1, "event_count": 1, "skill_xp": 1}}],
+            "as": "xp"
+        }},
+        {"$set": {"xp": {"$first": "$xp"}}},
+        {"$project": {
+            "full_name": 1,
+            "email": 1,
+            "position": 1,
+            "github_username": 1,
+            "role": 1,
+            "total_xp": {"$ifNull": ["$xp.total_xp", 0]},
+            "xp_events_count": {"$ifNull": ["$xp.event_count", 0]},
+            # Highest skill; strict $gt keeps the first of equal values
+            "top_skill": {"$reduce": {
+                "input": {"$objectToArray": {"$ifNull": ["$xp.skill_xp", {}]}},
+                "initialValue": None,
+                "in": {"$cond": [
+                    {"$or": [{"$eq": ["$$value", None]}, {"$gt": ["$$this.v", "$$value.v"]}]},
+                    "$$this",
+                    "$$value"
+                ]}
+            }}
+        }},
+        {"$facet": {
+            "page": ranked + page,
+            "meta": [{"$group": {
+                "_id": None,
+                "total_users": {"$sum": 1},
+                "total_xp": {"$sum": "$total_xp"}
+            }}]
+        }}
+    ]
+
+
+@cached(
+    "leaderboard:organization",
+    ttl=settings.LEADERBOARD_CACHE_SECONDS,
+    depends_on=("users", "projects", "xp_user_totals"),
+)
+async def get_organization_leaderboard(
+    skip: int = 0,
+    limit: Optional[int] = None,
+    top_n: Optional[int] = None
+) -> Dict[str, Any]:
+    """Organization-wide XP leaderboard
+    
+    ``top_n`` caps the ranked list, ``skip``/``limit`` page through it. Totals
+    always cover every active user.
+    """
+    results = await User.aggregate(_leaderboard_pipeline(skip, limit, top_n)).to_list()
+    facets = results[0] if results else {}
+    meta = (facets.get("meta") or [{}])[0]
+    
+    leaderboard_data = []
+    for rank, row in enumerate(facets.get("page", []), start=skip + 1):
+        top_skill = row.get("top_skill")
+        leaderboard_data.append({
+            "user_id": str(row["_id"]),
+            "full_name": row.get("full_name") or "Unknown",
+            "email": row.get("email"),
+            "position": row.get("position") or "Employee",
+            "github_username": row.get("github_username"),
+            "role": row.get("role"),
+            "total_xp": row["total_xp"],
+            "project_count": row.get("project_count", 0),
+            "xp_events_count": row["xp_events_count"],
+            "top_skill": decode_key(top_skill["k"]) if top_skill else None,
+            "top_skill_xp": top_skill["v"] if top_skill else 0,
+            "rank": rank
+        })
+    
+    return {
+        "leaderboard": leaderboard_data,
+        "total_users": meta.get("total_users", 0),
+        "total_xp": meta.get("total_xp", 0)
+    }
@@ -0,0 +1,182 @@
+"""
+Report Export - streams report data as CSV, NDJSON or Parquet
+
+Report sections are flattened into long-format rows (section, item, metric,
+value) and encoded incrementally, so exports start sending bytes immediately
+and memory stays flat. Team reports without fresh cached data are streamed
+straight from the team productivity aggregation cursor.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+import logging
+
+from app.models import Project
+from app.services.analytics_service import AnalyticsService
+from app.services.report_service import generate_report_data, is_fresh
+
+try:  # pyarrow is in requirements.txt; without it only Parquet export is unavailable
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ["section", "item", "metric", "value"]
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+PARQUET_ROW_GROUP_SIZE = 5000
+
+# Keys used to label list entries (teams, months, predictions) instead of their index
+ITEM_LABEL_KEYS = ("team_name", "project_name", "employee_name", "skill_area", "position", "month", "login")
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def _flatten(value: Any, path: str = "") -> Iterator[Tuple[str, Any]]:
+    """(dotted path, scalar) pairs for a nested value"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _flatten(child, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from _flatten(child, f"{path}[{index}]")
+    else:
+        yield path, value
+
+
+def _item_label(entry: Any, index: int) -> str:
+    if isinstance(entry, dict):
+        for key in ITEM_LABEL_KEYS:
+            if entry.get(key) is not None:
+                return str(entry[key])
+    return str(index)
+
+
+def _section_rows(section: str, item: str, value: Any) -> Iterator[Dict[str, Any]]:
+    for metric, leaf in _flatten(value):
+        yield {"section": section, "item": item, "metric": metric, "value": leaf}
+
+
+def flatten_report(report_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Long-format rows for a report: top-level scalars go in a "summary" section"""
+    for key, value in (report_data or {}).items():
+        if isinstance(value, list):
+            for index, entry in enumerate(value):
+                yield from _section_rows(key, _item_label(entry, index), entry)
+        elif isinstance(value, dict):
+            yield from _section_rows(key, "", value)
+        else:
+            yield {"section": "summary", "item": "", "metric": key, "value": value}
+
+
+async def iter_report_rows(db, report: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Rows for a report, from fresh cached data or computed on the fly"""
+    if report["report_type"] == "team" and not is_fresh(report):
+        analytics_service = AnalyticsService()
+        cursor = Project.aggregate(analytics_service.team_productivity_pipeline())
+        index = 0
+        async for row in cursor:
+            team = analytics_service._team_metrics(row)
+            for export_row in _section_rows("teams", _item_label(team, index), team):
+                yield export_row
+            index += 1
+        return
+
+    report_data, _, _ = await generate_report_data(db, report)
+    for export_row in flatten_report(report_data):
+        yield export_row
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def stream_csv(rows: AsyncIterator[Dict[str, Any]], batch_size: int = 500) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    async for row in rows:
+        writer.writerow([_text(row[column]) for column in EXPORT_COLUMNS])
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+async def stream_ndjson(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain.
+
+    tell() keeps counting across drains so the Parquet footer offsets stay valid.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_parquet(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Parquet written one row group at a time; bytes are flushed after each group"""
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    batch: List[Dict[str, str]] = []
+    async for row in rows:
+        batch.append({column: _text(row[column]) for column in EXPORT_COLUMNS})
+        if len(batch) >= PARQUET_ROW_GROUP_SIZE:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+def stream_report(db, report: Dict[str, Any], format: str) -> AsyncIterator:
+    rows = iter_report_rows(db, report)
+    if format == "csv":
+        return stream_csv(rows)
+    if format == "ndjson":
+        return stream_ndjson(rows)
+    return stream_parquet(rows)
@@ -0,0 +1,101 @@
+"""
+Report Scheduler - precomputes scheduled reports
+
+Reports with ``is_scheduled`` are regenerated once per ``schedule_frequency``
+period at ``schedule_time`` (HH:MM, UTC; midnight when unset): daily every day,
+weekly on Mondays, monthly on the 1st. A report is due when it has not been
+generated since its most recent scheduled run.
+"""
+from __future__ import annotations
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import logging
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.db.mongo import get_client
+from app.services.report_service import generate_report_data
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_schedule_time(value: Optional[str]) -> tuple[int, int]:
+    try:
+        hour, minute = (int(part) for part in (value or "00:00").split(":")[:2])
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            return hour, minute
+    except ValueError:
+        pass
+    return 0, 0
+
+
+def last_scheduled_run(frequency: Optional[str], schedule_time: Optional[str], now: datetime) -> Optional[datetime]:
+    """Most recent scheduled run at or before ``now``, or None for unknown frequencies"""
+    hour, minute = _parse_schedule_time(schedule_time)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    
+    if frequency == "daily":
+        if run > now:
+            run -= timedelta(days=1)
+    elif frequency == "weekly":
+        run -= timedelta(days=run.weekday())
+        if run > now:
+            run -= timedelta(weeks=1)
+    elif frequency == "monthly":
+        run = run.replace(day=1)
+        if run > now:
+            run = (run - timedelta(days=1)).replace(day=1)
+    else:
+        return None
+    return run
+
+
+def is_report_due(report: Dict[str, Any], now: datetime) -> bool:
+    run = last_scheduled_run(report.get("schedule_frequency"), report.get("schedule_time"), now)
+    if run is None:
+        return False
+    last_generated = report.get("last_generated")
+    return last_generated is None or last_generated < run
+
+
+async def refresh_scheduled_reports() -> int:
+    """Regenerate every scheduled report that is due; returns how many ran"""
+    db = get_client()[settings.MONGODB_DB]
+    now = datetime.utcnow()
+    reports = await db.reports.find({"is_scheduled": True}, {"last_data": 0}).to_list(None)
+    
+    refreshed = 0
+    for report in reports:
+        if not is_report_due(report, now):
+            continue
+        try:
+            await generate_report_data(db, report, force=True)
+            refreshed += 1
+        except Exception as e:
+            logger.error(f"Error generating scheduled report {report['_id']}: {e}")
+    return refreshed
+
+
+async def _report_scheduler_loop(app: FastAPI, interval_seconds: int) -> None:
+    try:
+        while True:
+            try:
+                await refresh_scheduled_reports()
+            except Exception as e:
+                logger.error(f"Report scheduler error: {e}")
+            await asyncio.sleep(interval_seconds)
+    except asyncio.CancelledError:
+        return
+
+
+def start_report_scheduler(app: FastAPI) -> None:
+    app.state.report_scheduler = asyncio.create_task(
+        _report_scheduler_loop(app, settings.REPORT_SCHEDULER_INTERVAL_SECONDS)
+    )
+
+
+def stop_report_scheduler(app: FastAPI) -> None:
+    task = getattr(app.state, "report_scheduler", None)
+    if task:
+        task.cancel()
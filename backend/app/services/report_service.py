@@ -0,0 +1,97 @@
+"""
+Report Service - report data generation with a staleness policy
+
+Generated data is cached on the report document (``last_data``/``last_generated``)
+and served while it is younger than the report's ``max_age_seconds`` (or
+REPORT_MAX_AGE_SECONDS). Concurrent generate calls for the same report share a
+single computation. A generation is stamped with the time it ran, so it first
+invalidates the cached analytics it reads instead of reusing results up to
+ANALYTICS_CACHE_SECONDS old.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from app.core.cache import invalidate
+from app.core.config import settings
+from app.services.analytics_service import AnalyticsService
+
+logger = logging.getLogger(__name__)
+
+# Report id -> in-flight generation shared by concurrent callers
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Report type -> (custom report metric, custom report key, AnalyticsService method)
+REPORT_SECTIONS = {
+    "executive": ("executive_dashboard", "executive", "get_executive_dashboard"),
+    "team": ("team_productivity", "teams", "get_team_productivity_metrics"),
+    "hiring": ("hiring_pipeline", "hiring", "get_hiring_pipeline_health"),
+}
+
+
+async def build_report_data(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Compute a report's data from scratch based on its type and metrics"""
+    analytics_service = AnalyticsService()
+    report_type = report["report_type"]
+    if report_type in REPORT_SECTIONS:
+        sections = [report_type]
+    else:
+        # Custom report - compile requested metrics
+        metrics = report.get("metrics", [])
+        sections = [section for section, (metric, _, _) in REPORT_SECTIONS.items() if metric in metrics]
+    methods = {section: getattr(analytics_service, REPORT_SECTIONS[section][2]) for section in sections}
+    await invalidate(*(method.cache_namespace for method in methods.values()))
+    
+    if report_type == "team":
+        return {"teams": await methods["team"]()}
+    if report_type in REPORT_SECTIONS:
+        return await methods[report_type]()
+    return {REPORT_SECTIONS[section][1]: await method() for section, method in methods.items()}
+
+
+def is_fresh(report: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """Whether the cached data is younger than the report's max age"""
+    last_generated = report.get("last_generated")
+    if report.get("last_data") is None or not last_generated:
+        return False
+    max_age = report.get("max_age_seconds")
+    if max_age is None:
+        max_age = settings.REPORT_MAX_AGE_SECONDS
+    return (now or datetime.utcnow()) - last_generated < timedelta(seconds=max_age)
+
+
+async def _generate_and_store(db, report: Dict[str, Any]) -> Tuple[Dict[str, Any], datetime]:
+    report_data = await build_report_data(report)
+    generated_at = datetime.utcnow()
+    
+    # Cache the generated data
+    await db.reports.update_one(
+        {"_id": report["_id"]},
+        {"$set": {
+            "last_generated": generated_at,
+            "last_data": report_data
+        }}
+    )
+    return report_data, generated_at
+
+
+async def generate_report_data(
+    db,
+    report: Dict[str, Any],
+    force: bool = False
+) -> Tuple[Dict[str, Any], datetime, bool]:
+    """Report data, when it was generated, and whether it came from the cache"""
+    if not force and is_fresh(report):
+        return report["last_data"], report["last_generated"], True
+    
+    key = str(report["_id"])
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_generate_and_store(db, report))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    
+    # Shielded so one caller disconnecting does not cancel the others' result
+    report_data, generated_at = await asyncio.shield(task)
+    return report_data, generated_at, False
@@ -4,16 +4,46 @@ XP Calculation and Tracking Service
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from beanie import PydanticObjectId
+from pymongo import ReadPreference
 import logging
 
+from app.core.cache import cached
 from app.models import (
     User, XPEvent, XPConfiguration, XPSource, XPLeaderboard,
     Contributor, PullRequest, Issue, Commit, Release, Milestone
 )
+from app.services.xp_rollup import (
+    record_xp_event, get_user_totals, decode_skill_xp, rebuild_streak, current_streak,
+)
+from app.services.xp_rank import XPRankIndex
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+@cached("leaderboard:snapshots", ttl=settings.LEADERBOARD_CACHE_SECONDS, depends_on=("xp_leaderboards",))
+async def get_latest_leaderboard(period: str, limit: int) -> Optional[XPLeaderboard]:
+    """Newest stored snapshot for a period holding at least ``limit`` rows
+    
+    A single find_one on the (period, generated_at) index, preferring a secondary
+    since snapshots are already point-in-time. Entries are trimmed to ``limit``.
+    """
+    query: Dict[str, Any] = {"period": period, "entry_limit": {"$gte": limit}}
+    collection = XPLeaderboard.get_motor_collection().with_options(
+        read_preference=ReadPreference.SECONDARY_PREFERRED
+    )
+    doc = await collection.find_one(query, sort=[("generated_at", -1)])
+    if not doc:
+        return None
+    
+    leaderboard = XPLeaderboard.model_validate(doc)
+    if len(leaderboard.entries) > limit:
+        leaderboard.entries = leaderboard.entries[:limit]
+        leaderboard.total_participants = len(leaderboard.entries)
+        leaderboard.total_xp_awarded = sum(e["total_xp"] for e in leaderboard.entries)
+    return leaderboard
+
+
 class XPCalculator:
     """Service for calculating and awarding XP based on GitHub activity"""
     
@@ -42,33 +72,16 @@ class XPCalculator:
         if not self.config or not self.config.streak_enabled:
             return 0, 0
         
-        # Get user's recent XP events
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_events = await XPEvent.find(
-            XPEvent.person_id == user_id,
-            XPEvent.created_at >= yesterday
-        ).to_list()
+        # Streak state is advanced by record_xp_event; rollups written before it
+        # existed get it rebuilt once from their distinct active days
+        totals = await get_user_totals(user_id)
+        if totals and totals.event_count and totals.streak_last_day is None:
+            totals = await rebuild_streak(user_id)
         
-        if not recent_events:
+        streak_days = current_streak(totals)
+        if not streak_days:
             return 0, 0
         
-        # Check for consecutive days
-        streak_days = 1
-        current_date = datetime.utcnow().date()
-        
-        for i in range(1, 30):  # Check up to 30 days back
-            check_date = current_date - timedelta(days=i)
-            day_events = await XPEvent.find(
-                XPEvent.person_id == user_id,
-                XPEvent.created_at >= datetime.combine(check_date, datetime.min.time()),
-                XPEvent.created_at < datetime.combine(check_date + timedelta(days=1), datetime.min.time())
-            ).to_list()
-            
-            if day_events:
-                streak_days += 1
-            else:
-                break
-        
         # Calculate bonus
         bonus_xp = min(
             streak_days * self.config.streak_bonus_per_day,
@@ -126,6 +139,7 @@ class XPCalculator:
         )
         
         await xp_event.insert()
+        await record_xp_event(xp_event)
         return xp_event
     
     async def award_xp_for_pr_merged(
@@ -186,6 +200,7 @@ class XPCalculator:
         )
         
         await xp_event.insert()
+        await record_xp_event(xp_event)
         return xp_event
     
     async def award_xp_for_issue_closed(
@@ -229,6 +244,7 @@ class XPCalculator:
         )
         
         await xp_event.insert()
+        await record_xp_event(xp_event)
         return xp_event
     
     async def award_xp_for_code_review(
@@ -252,6 +268,7 @@ class XPCalculator:
         )
         
         await xp_event.insert()
+        await record_xp_event(xp_event)
         return xp_event
     
     async def award_xp_for_milestone(
@@ -285,6 +302,7 @@ class XPCalculator:
                 bonus_reason="early completion" if bonus_xp > 0 else None
             )
             await xp_event.insert()
+            await record_xp_event(xp_event)
             xp_events.append(xp_event)
         
         return xp_events
@@ -310,6 +328,7 @@ class XPCalculator:
         )
         
         await xp_event.insert()
+        await record_xp_event(xp_event)
         return xp_event
     
     async def apply_xp_decay(self, user: User) -> Optional[XPEvent]:
@@ -331,8 +350,7 @@ class XPCalculator:
             return None
         
         # Calculate total XP
-        all_events = await XPEvent.find(XPEvent.person_id == user.id).to_list()
-        total_xp = sum(event.amount for event in all_events)
+        total_xp = await self.calculate_user_total_xp(user.id)
         
         # Apply decay
         decay_amount = int(total_xp * self.config.decay_percentage)
@@ -345,31 +363,20 @@ class XPCalculator:
                 bonus_reason=f"Inactive for {days_inactive} days"
             )
             await decay_event.insert()
+            await record_xp_event(decay_event)
             return decay_event
         
         return None
     
     async def calculate_user_total_xp(self, user_id: PydanticObjectId) -> int:
         """Calculate total XP for a user"""
-        events = await XPEvent.find(XPEvent.person_id == user_id).to_list()
-        return sum(event.amount for event in events)
+        totals = await get_user_totals(user_id)
+        return totals.total_xp if totals else 0
     
     async def calculate_user_xp_by_skill(self, user_id: PydanticObjectId) -> Dict[str, float]:
         """Calculate XP breakdown by skill/tag"""
-        events = await XPEvent.find(
-            XPEvent.person_id == user_id,
-            XPEvent.skill_distribution != None
-        ).to_list()
-        
-        skill_xp = {}
-        for event in events:
-            if event.skill_distribution:
-                for skill, weight in event.skill_distribution.items():
-                    if skill not in skill_xp:
-                        skill_xp[skill] = 0
-                    skill_xp[skill] += event.amount * weight
-        
-        return skill_xp
+        totals = await get_user_totals(user_id)
+        return decode_skill_xp(totals.skill_xp) if totals else {}
     
     async def generate_leaderboard(
         self,
@@ -389,45 +396,69 @@ class XPCalculator:
             period_start = datetime(2000, 1, 1)
         
         period_end = now
+        period_match = {"created_at": {"$gte": period_start, "$lte": period_end}}
         
-        # Aggregate XP by user
+        # Aggregate XP by user, then hydrate users and per-skill XP for the top rows only
         pipeline = [
-            {"$match": {
-                "created_at": {"$gte": period_start, "$lte": period_end}
-            }},
+            {"$match": period_match},
             {"$group": {
                 "_id": "$person_id",
                 "total_xp": {"$sum": "$amount"},
                 "event_count": {"$sum": 1},
                 "sources": {"$addToSet": "$source"}
             }},
-            {"$sort": {"total_xp": -1}},
-            {"$limit": limit}
+            {"$sort": {"total_xp": -1, "_id": 1}},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "users",
+                "localField": "_id",
+                "foreignField": "_id",
+                "as": "user"
+            }},
+            {"$unwind": "$user"},
+            {"$lookup": {
+                "from": "xp_events",
+                "let": {"person_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$person_id", "$$person_id"]}, **period_match}},
+                    {"$project": {
+                        "amount": 1,
+                        "skills": {"$objectToArray": {"$ifNull": ["$skill_distribution", {}]}}
+                    }},
+                    {"$unwind": "$skills"},
+                    {"$group": {
+                        "_id": "$skills.k",
+                        "xp": {"$sum": {"$multiply": ["$amount", "$skills.v"]}}
+                    }},
+                    {"$project": {"_id": 0, "k": "$_id", "v": "$xp"}}
+                ],
+                "as": "skills"
+            }},
+            {"$project": {
+                "total_xp": 1,
+                "event_count": 1,
+                "sources": 1,
+                "login": {"$ifNull": ["$user.github_username", "$user.email"]},
+                "skill_breakdown": {"$arrayToObject": "$skills"}
+            }},
+            {"$sort": {"total_xp": -1, "_id": 1}}
         ]
         
         results = await XPEvent.aggregate(pipeline).to_list()
         
         # Build leaderboard entries
-        entries = []
-        rank = 1
-        for result in results:
-            user = await User.get(result["_id"])
-            if user:
-                entry = {
-                    "user_id": str(result["_id"]),
-                    "login": user.github_username or user.email,
-                    "total_xp": result["total_xp"],
-                    "rank": rank,
-                    "event_count": result["event_count"],
-                    "sources": result["sources"]
-                }
-                
-                # Get skill breakdown
-                skill_xp = await self.calculate_user_xp_by_skill(result["_id"])
-                entry["skill_breakdown"] = skill_xp
-                
-                entries.append(entry)
-                rank += 1
+        entries = [
+            {
+                "user_id": str(result["_id"]),
+                "login": result["login"],
+                "total_xp": result["total_xp"],
+                "rank": rank,
+                "event_count": result["event_count"],
+                "sources": result["sources"],
+                "skill_breakdown": result.get("skill_breakdown") or {}
+            }
+            for rank, result in enumerate(results, start=1)
+        ]
         
         # Create leaderboard document
         leaderboard = XPLeaderboard(
@@ -436,7 +467,8 @@ class XPCalculator:
             period_end=period_end,
             entries=entries,
             total_participants=len(entries),
-            total_xp_awarded=sum(e["total_xp"] for e in entries)
+            total_xp_awarded=sum(e["total_xp"] for e in entries),
+            entry_limit=limit
         )
         
         await leaderboard.insert()
@@ -489,13 +521,5 @@ class XPCalculator:
         }
     
     async def _get_user_rank(self, user_id: PydanticObjectId, user_xp: int) -> int:
-        """Get user's rank based on total XP"""
-        higher_xp_users = await XPEvent.aggregate([
-            {"$group": {
-                "_id": "$person_id",
-                "total_xp": {"$sum": "$amount"}
-            }},
-            {"$match": {"total_xp": {"$gt": user_xp}}}
-        ]).to_list()
-        
-        return len(higher_xp_users) + 1
+        """Get user's all-time rank based on total XP"""
+        return await XPRankIndex("all-time").rank_for_xp(user_xp)
@@ -0,0 +1,107 @@
+"""
+XP Rank Index - leaderboard position lookups backed by indexed rollups
+
+All-time ranks read XPUserTotals (indexed on total_xp), calendar windows read
+XPPeriodTotals (indexed on window + period_key + total_xp). Both are maintained
+by app.services.xp_rollup.record_xp_event, so ranks are current as XP is awarded.
+
+A rank is the number of users ahead, read from XPRankBucket: the user counts of
+the buckets above the XP value are summed, and only the users in its own bucket
+(RANK_BUCKET_WIDTH XP wide) are counted one by one. A lookup therefore costs the
+number of occupied buckets plus one bucket's users, however many users are ahead.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+from beanie import PydanticObjectId
+
+from app.models import XPUserTotals, XPPeriodTotals, XPRankBucket
+from app.services.xp_rollup import RANK_BUCKET_WIDTH, period_keys, rank_bucket
+
+RANK_WINDOWS = ("all-time", "monthly", "weekly", "daily")
+
+
+class XPRankIndex:
+    """Rank and neighbour queries for the all-time, monthly, weekly and daily windows"""
+
+    def __init__(self, window: str = "all-time", now: Optional[datetime] = None):
+        if window not in RANK_WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        self.window = window
+        self.period_key = None if window == "all-time" else period_keys(now or datetime.utcnow())[window]
+
+    def _collection(self):
+        if self.window == "all-time":
+            return XPUserTotals.get_motor_collection()
+        return XPPeriodTotals.get_motor_collection()
+
+    def _scope(self, **extra: Any) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if self.period_key:
+            query["window"] = self.window
+            query["period_key"] = self.period_key
+        query.update(extra)
+        return query
+
+    async def get_user_xp(self, user_id: PydanticObjectId) -> int:
+        doc = await self._collection().find_one(self._scope(user_id=user_id), {"total_xp": 1})
+        return doc.get("total_xp", 0) if doc else 0
+
+    async def rank_for_xp(self, total_xp: int) -> int:
+        """Competition rank (1 + number of users strictly ahead) for an XP value"""
+        bucket = rank_bucket(total_xp)
+        above, in_bucket = await asyncio.gather(
+            XPRankBucket.get_motor_collection().aggregate([
+                {"$match": {"window": self.window, "period_key": self.period_key or "", "bucket": {"$gt": bucket}}},
+                {"$group": {"_id": None, "users": {"$sum": "$users"}}},
+            ]).to_list(1),
+            self._collection().count_documents(
+                self._scope(total_xp={"$gt": total_xp, "$lt": (bucket + 1) * RANK_BUCKET_WIDTH})
+            ),
+        )
+        return (above[0]["users"] if above else 0) + in_bucket + 1
+
+    async def get_rank(self, user_id: PydanticObjectId) -> int:
+        return await self.rank_for_xp(await self.get_user_xp(user_id))
+
+    async def get_neighbours(self, user_id: PydanticObjectId, count: int = 3) -> Dict[str, Any]:
+        """The user's rank plus up to ``count`` users directly above and below"""
+        total_xp = await self.get_user_xp(user_id)
+        collection = self._collection()
+        projection = {"user_id": 1, "total_xp": 1}
+
+        above_cursor = collection.find(
+            self._scope(total_xp={"$gt": total_xp}), projection
+        ).sort("total_xp", 1).limit(count)
+        below_cursor = collection.find(
+            self._scope(total_xp={"$lte": total_xp}, user_id={"$ne": user_id}), projection
+        ).sort("total_xp", -1).limit(count)
+        above, below = await asyncio.gather(above_cursor.to_list(count), below_cursor.to_list(count))
+        above.reverse()
+
+        # One indexed count per distinct XP value (at most 2 * count + 1)
+        distinct_xp = sorted({total_xp, *(doc["total_xp"] for doc in above + below)}, reverse=True)
+        ranks = dict(zip(distinct_xp, await asyncio.gather(*(self.rank_for_xp(xp) for xp in distinct_xp))))
+
+        def _entry(doc: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "user_id": str(doc["user_id"]),
+                "total_xp": doc["total_xp"],
+                "rank": ranks[doc["total_xp"]],
+            }
+
+        return {
+            "window": self.window,
+            "period_key": self.period_key,
+            "user_id": str(user_id),
+            "total_xp": total_xp,
+            "rank": ranks[total_xp],
+            "above": [_entry(doc) for doc in above],
+            "below": [_entry(doc) for doc in below],
+        }
+
+
+async def get_user_ranks(user_id: PydanticObjectId) -> Dict[str, int]:
+    """Rank of a user in every window"""
+    ranks = await asyncio.gather(*(XPRankIndex(window).get_rank(user_id) for window in RANK_WINDOWS))
+    return dict(zip(RANK_WINDOWS, ranks))
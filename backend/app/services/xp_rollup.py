@@ -0,0 +1,439 @@
+"""
+XP Rollup Service - maintains the per-user XPUserTotals materialized view
+
+Every XPEvent insert is followed by ``record_xp_event`` which applies the event to
+the user's rollup document with a single atomic ``$inc`` upsert. Readers then get
+totals, skill and source breakdowns and time buckets with one indexed lookup.
+The same call keeps the XPPeriodTotals rank index (daily/weekly/monthly), the
+XPRankBucket counts behind rank lookups and the user's streak state current.
+
+Backfill / repair:
+    python -m app.services.xp_rollup
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
+from beanie import PydanticObjectId
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+import logging
+
+from app.core.events import publish_change
+from app.models import XPEvent, XPUserTotals, XPPeriodTotals, XPRankBucket
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 500
+MAX_STREAK_DAYS = 30
+DAY_FORMAT = "%Y-%m-%d"
+# XP range counted by one XPRankBucket; a rank lookup counts the users of one bucket
+RANK_BUCKET_WIDTH = 100
+
+# How long period totals are kept after the period starts (TTL on XPPeriodTotals)
+PERIOD_RETENTION = {
+    "daily": timedelta(days=8),
+    "weekly": timedelta(weeks=9),
+    "monthly": timedelta(days=400),
+}
+
+# MongoDB treats "." and a leading "$" in update paths as operators, so skill names
+# like "node.js" are stored with look-alike characters and decoded on read.
+_KEY_ENCODING = {".": "．", "$": "＄"}
+
+
+def encode_key(key: str) -> str:
+    for raw, safe in _KEY_ENCODING.items():
+        key = key.replace(raw, safe)
+    return key
+
+
+def decode_key(key: str) -> str:
+    for raw, safe in _KEY_ENCODING.items():
+        key = key.replace(safe, raw)
+    return key
+
+
+def decode_skill_xp(skill_xp: Optional[Dict[str, float]]) -> Dict[str, float]:
+    return {decode_key(skill): xp for skill, xp in (skill_xp or {}).items()}
+
+
+def bucket_keys(ts: datetime) -> Tuple[str, str, str]:
+    """Return the (daily, weekly, monthly) bucket keys for a timestamp"""
+    return ts.strftime(DAY_FORMAT), ts.strftime("%G-W%V"), ts.strftime("%Y-%m")
+
+
+def _previous_day(day: str) -> str:
+    return (datetime.strptime(day, DAY_FORMAT) - timedelta(days=1)).strftime(DAY_FORMAT)
+
+
+def _streak_update(day: str) -> List[Dict[str, Any]]:
+    """Update pipeline advancing the stored streak with activity on ``day``.
+
+    Same day keeps the streak, the day after extends it, a gap restarts it at 1.
+    Events older than the stored last day (late webhooks) leave it untouched.
+    """
+    last_day = "$streak_last_day"
+    return [{"$set": {
+        "streak_days": {"$switch": {
+            "branches": [
+                {"case": {"$gte": [last_day, day]}, "then": "$streak_days"},
+                {"case": {"$eq": [last_day, _previous_day(day)]}, "then": {"$add": ["$streak_days", 1]}},
+            ],
+            "default": 1,
+        }},
+        "streak_last_day": {"$cond": [{"$gt": [last_day, day]}, last_day, day]},
+    }}]
+
+
+def streak_from_days(active_days: Iterable[str]) -> Tuple[Optional[str], int]:
+    """Streak state (last active day, run length) from a set of active day keys"""
+    days = sorted(set(active_days), reverse=True)
+    if not days:
+        return None, 0
+    length = 1
+    for newer, older in zip(days, days[1:]):
+        if older != _previous_day(newer):
+            break
+        length += 1
+    return days[0], length
+
+
+def current_streak(totals: Optional[XPUserTotals], now: Optional[datetime] = None) -> int:
+    """Streak a new event at ``now`` would be part of; 0 when the user has been idle.
+
+    Activity today counts the stored run as-is, activity yesterday means today's
+    event extends it by one.
+    """
+    if not totals or not totals.streak_last_day:
+        return 0
+    today = (now or datetime.utcnow()).strftime(DAY_FORMAT)
+    if totals.streak_last_day == today:
+        streak = totals.streak_days
+    elif totals.streak_last_day == _previous_day(today):
+        streak = totals.streak_days + 1
+    else:
+        return 0
+    return min(streak, MAX_STREAK_DAYS)
+
+
+def period_start(window: str, ts: datetime) -> datetime:
+    """Start of the calendar period (day, ISO week, month) containing ts"""
+    day_start = datetime(ts.year, ts.month, ts.day)
+    if window == "daily":
+        return day_start
+    if window == "weekly":
+        return day_start - timedelta(days=ts.weekday())
+    return datetime(ts.year, ts.month, 1)
+
+
+def period_keys(ts: datetime) -> Dict[str, str]:
+    """Map each rank window to the period key containing ts"""
+    day, week, month = bucket_keys(ts)
+    return {"daily": day, "weekly": week, "monthly": month}
+
+
+def rank_bucket(total_xp: int) -> int:
+    return total_xp // RANK_BUCKET_WIDTH
+
+
+def _bucket_update(window: str, key: str, bucket: int, delta: int, expires_at: Optional[datetime]) -> UpdateOne:
+    return UpdateOne(
+        {"window": window, "period_key": key, "bucket": bucket},
+        {
+            "$inc": {"users": delta},
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"expires_at": expires_at},
+        },
+        upsert=True,
+    )
+
+
+def _bucket_moves(
+    window: str,
+    key: str,
+    before: Optional[Dict[str, Any]],
+    amount: int,
+    expires_at: Optional[datetime] = None,
+) -> List[UpdateOne]:
+    """Bucket count updates for a user whose XP in a window went from ``before`` up by ``amount``"""
+    old_xp = before.get("total_xp", 0) if before else None
+    new_bucket = rank_bucket((old_xp or 0) + amount)
+    if old_xp is None:
+        return [_bucket_update(window, key, new_bucket, 1, expires_at)]
+    if rank_bucket(old_xp) == new_bucket:
+        return []
+    return [
+        _bucket_update(window, key, rank_bucket(old_xp), -1, expires_at),
+        _bucket_update(window, key, new_bucket, 1, expires_at),
+    ]
+
+
+async def _apply_to_period(window: str, key: str, user_id, amount: int, ts: datetime) -> List[UpdateOne]:
+    expires_at = period_start(window, ts) + PERIOD_RETENTION[window]
+    before = await XPPeriodTotals.get_motor_collection().find_one_and_update(
+        {"window": window, "period_key": key, "user_id": user_id},
+        {
+            "$inc": {"total_xp": amount},
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"expires_at": expires_at},
+        },
+        projection={"total_xp": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    return _bucket_moves(window, key, before, amount, expires_at)
+
+
+def _event_increments(event: XPEvent) -> Dict[str, Any]:
+    amount = event.amount or 0
+    day, week, month = bucket_keys(event.created_at)
+    inc: Dict[str, Any] = {
+        "total_xp": amount,
+        "event_count": 1,
+        f"source_counts.{encode_key(str(event.source))}": 1,
+        f"daily_xp.{day}": amount,
+        f"weekly_xp.{week}": amount,
+        f"monthly_xp.{month}": amount,
+    }
+    for skill, weight in (event.skill_distribution or {}).items():
+        inc[f"skill_xp.{encode_key(skill)}"] = amount * weight
+    return inc
+
+
+async def _apply_to_totals(event: XPEvent) -> List[UpdateOne]:
+    totals = XPUserTotals.get_motor_collection()
+    before = await totals.find_one_and_update(
+        {"user_id": event.person_id},
+        {
+            "$inc": _event_increments(event),
+            "$max": {"last_event_at": event.created_at},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        projection={"total_xp": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    # Only earned XP counts as activity (decay events are negative)
+    if (event.amount or 0) > 0:
+        await totals.update_one({"user_id": event.person_id}, _streak_update(bucket_keys(event.created_at)[0]))
+    return _bucket_moves("all-time", "", before, event.amount or 0)
+
+
+async def record_xp_event(event: XPEvent) -> None:
+    """Apply a freshly inserted XPEvent to its user's rollup"""
+    # Each update returns the previous total, so concurrent events move bucket counts consistently
+    moves = await asyncio.gather(
+        _apply_to_totals(event),
+        *(
+            _apply_to_period(window, key, event.person_id, event.amount or 0, event.created_at)
+            for window, key in period_keys(event.created_at).items()
+        ),
+    )
+    ops = [op for window_ops in moves for op in window_ops]
+    if ops:
+        await XPRankBucket.get_motor_collection().bulk_write(ops, ordered=False)
+    await publish_change("xp_user_totals", "update", str(event.person_id), source="bulk")
+
+
+async def get_user_totals(user_id: PydanticObjectId) -> Optional[XPUserTotals]:
+    return await XPUserTotals.find_one(XPUserTotals.user_id == user_id)
+
+
+async def rebuild_streak(user_id: PydanticObjectId) -> Optional[XPUserTotals]:
+    """Recompute one user's streak state from a single aggregation over distinct active days"""
+    rows = await XPEvent.aggregate([
+        {"$match": {"person_id": user_id, "amount": {"$gt": 0}}},
+        {"$group": {"_id": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}}}},
+        {"$sort": {"_id": -1}},
+        {"$limit": MAX_STREAK_DAYS + 1},
+    ]).to_list()
+    last_day, length = streak_from_days(row["_id"] for row in rows)
+    await XPUserTotals.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$set": {"streak_last_day": last_day, "streak_days": length}},
+    )
+    return await get_user_totals(user_id)
+
+
+async def get_totals_for_users(user_ids: Iterable[PydanticObjectId]) -> Dict[str, XPUserTotals]:
+    """Fetch rollups for many users with one ``$in`` query, keyed by str(user_id)"""
+    ids = list(user_ids)
+    if not ids:
+        return {}
+    docs = await XPUserTotals.find({"user_id": {"$in": ids}}).to_list()
+    return {str(doc.user_id): doc for doc in docs}
+
+
+def _empty_rollup() -> Dict[str, Any]:
+    return {
+        "total_xp": 0,
+        "event_count": 0,
+        "skill_xp": defaultdict(float),
+        "source_counts": defaultdict(int),
+        "daily_xp": defaultdict(int),
+        "weekly_xp": defaultdict(int),
+        "monthly_xp": defaultdict(int),
+        "last_event_at": None,
+    }
+
+
+def _rollup_document(user_id, rollup: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    doc = {key: dict(value) if isinstance(value, defaultdict) else value for key, value in rollup.items()}
+    doc["user_id"] = user_id
+    doc["updated_at"] = now
+    return doc
+
+
+def _period_start_from_key(window: str, key: str) -> datetime:
+    if window == "daily":
+        return datetime.strptime(key, "%Y-%m-%d")
+    if window == "weekly":
+        return datetime.strptime(f"{key}-1", "%G-W%V-%u")
+    return datetime.strptime(key, "%Y-%m")
+
+
+def _period_documents(user_id, rollup: Dict[str, Any], now: datetime) -> List[ReplaceOne]:
+    """Rank-index entries for the rollup's time buckets that are still within retention"""
+    ops = []
+    for window, buckets in (("daily", rollup["daily_xp"]), ("weekly", rollup["weekly_xp"]), ("monthly", rollup["monthly_xp"])):
+        for key, amount in buckets.items():
+            expires_at = _period_start_from_key(window, key) + PERIOD_RETENTION[window]
+            if expires_at <= now:
+                continue
+            doc = {
+                "window": window,
+                "period_key": key,
+                "user_id": user_id,
+                "total_xp": amount,
+                "expires_at": expires_at,
+                "updated_at": now,
+            }
+            ops.append(ReplaceOne({"window": window, "period_key": key, "user_id": user_id}, doc, upsert=True))
+    return ops
+
+
+async def rebuild_xp_totals() -> int:
+    """Recompute every rollup and rank-index entry from the raw xp_events collection.
+
+    Events are streamed sorted by person_id, so only one user's rollup is held in
+    memory at a time. Rollups of users that no longer have events are removed.
+    Returns the number of rollups written.
+    """
+    collection = XPUserTotals.get_motor_collection()
+    periods = XPPeriodTotals.get_motor_collection()
+    started_at = datetime.utcnow()
+    cursor = XPEvent.get_motor_collection().find(
+        {},
+        {"person_id": 1, "source": 1, "amount": 1, "skill_distribution": 1, "created_at": 1},
+    ).sort("person_id", 1)
+
+    written = 0
+    batch: List[ReplaceOne] = []
+    period_batch: List[ReplaceOne] = []
+    current_user = None
+    rollup = _empty_rollup()
+    active_days: Set[str] = set()
+
+    async def flush_user():
+        nonlocal written
+        if current_user is None:
+            return
+        now = datetime.utcnow()
+        doc = _rollup_document(current_user, rollup, now)
+        doc["streak_last_day"], doc["streak_days"] = streak_from_days(active_days)
+        batch.append(ReplaceOne({"user_id": current_user}, doc, upsert=True))
+        period_batch.extend(_period_documents(current_user, rollup, now))
+        written += 1
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await collection.bulk_write(batch, ordered=False)
+            batch.clear()
+        if len(period_batch) >= REBUILD_BATCH_SIZE:
+            await periods.bulk_write(period_batch, ordered=False)
+            period_batch.clear()
+
+    async for raw in cursor:
+        if raw.get("person_id") != current_user:
+            await flush_user()
+            current_user = raw.get("person_id")
+            rollup = _empty_rollup()
+            active_days = set()
+        amount = raw.get("amount") or 0
+        created_at = raw.get("created_at") or started_at
+        day, week, month = bucket_keys(created_at)
+        rollup["total_xp"] += amount
+        rollup["event_count"] += 1
+        rollup["source_counts"][encode_key(str(raw.get("source")))] += 1
+        rollup["daily_xp"][day] += amount
+        rollup["weekly_xp"][week] += amount
+        rollup["monthly_xp"][month] += amount
+        if amount > 0:
+            active_days.add(day)
+        for skill, weight in (raw.get("skill_distribution") or {}).items():
+            rollup["skill_xp"][encode_key(skill)] += amount * weight
+        if rollup["last_event_at"] is None or created_at > rollup["last_event_at"]:
+            rollup["last_event_at"] = created_at
+    await flush_user()
+
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+    if period_batch:
+        await periods.bulk_write(period_batch, ordered=False)
+    await collection.delete_many({"updated_at": {"$lt": started_at}})
+    await periods.delete_many({"updated_at": {"$lt": started_at}})
+    await rebuild_rank_buckets()
+    await publish_change("xp_user_totals", "update", source="bulk")
+    logger.info("Rebuilt %d XP rollups", written)
+    return written
+
+
+async def rebuild_rank_buckets() -> int:
+    """Recount every XPRankBucket from the rollups; returns the number of buckets written"""
+    buckets = XPRankBucket.get_motor_collection()
+    started_at = datetime.utcnow()
+    bucket = {"$floor": {"$divide": ["$total_xp", RANK_BUCKET_WIDTH]}}
+    sources = (
+        XPUserTotals.get_motor_collection().aggregate([
+            {"$group": {"_id": {"window": "all-time", "period_key": "", "bucket": bucket}, "users": {"$sum": 1}}},
+        ]),
+        XPPeriodTotals.get_motor_collection().aggregate([
+            {"$group": {
+                "_id": {"window": "$window", "period_key": "$period_key", "bucket": bucket},
+                "users": {"$sum": 1},
+                "expires_at": {"$max": "$expires_at"},
+            }},
+        ]),
+    )
+
+    written = 0
+    batch: List[ReplaceOne] = []
+    for rows in sources:
+        async for row in rows:
+            key = {**row["_id"], "bucket": int(row["_id"]["bucket"])}
+            doc = {**key, "users": row["users"], "expires_at": row.get("expires_at"), "updated_at": started_at}
+            batch.append(ReplaceOne(key, doc, upsert=True))
+            written += 1
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                await buckets.bulk_write(batch, ordered=False)
+                batch.clear()
+    if batch:
+        await buckets.bulk_write(batch, ordered=False)
+    await buckets.delete_many({"updated_at": {"$lt": started_at}})
+    return written
+
+
+async def ensure_rank_buckets() -> None:
+    """Count the rank buckets once for rollups that predate them"""
+    if await XPRankBucket.find_one() is None and await XPUserTotals.find_one() is not None:
+        logger.info("Built %d XP rank buckets", await rebuild_rank_buckets())
+
+
+async def _main() -> None:
+    from app.db.mongo import init_mongo
+
+    await init_mongo()
+    count = await rebuild_xp_totals()
+    print(f"Rebuilt XP totals for {count} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
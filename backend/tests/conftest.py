@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Importing app modules reads settings; tests never connect to MongoDB
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def init_db():
+    """Async helper initialising Beanie models on an in-memory mongomock database"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from beanie import init_beanie
+
+    async def _init(*models):
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await init_beanie(database=db, document_models=list(models))
+        return db
+
+    return _init
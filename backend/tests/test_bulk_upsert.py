@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+from beanie import PydanticObjectId
+
+from app.models import Issue
+from app.services.bulk_upsert import BulkUpserter
+
+REPO_ID = PydanticObjectId()
+CREATED = datetime(2026, 10, 1)
+
+
+def _issue(number, title="Flaky test", comments=0):
+    """(key, fields, insert_only) as a sync would pass them for one issue"""
+    return (
+        {"repo_id": REPO_ID, "number": number},
+        {
+            "title": title,
+            "state": "open",
+            "author_login": "octocat",
+            "comments_count": comments,
+            "created_at": CREATED,
+            "updated_at": CREATED,
+            "github_id": 1000 + number,
+        },
+        {"ai_summary": "Summarised once"},
+    )
+
+
+def test_add_splits_fields_between_set_and_set_on_insert(init_db):
+    async def scenario():
+        await init_db(Issue)
+        writer = BulkUpserter(Issue, ("repo_id", "number"))
+        await writer.add(*_issue(1))
+        return writer._ops[0]
+
+    op = asyncio.run(scenario())
+    assert op._filter == {"repo_id": REPO_ID, "number": 1}
+    assert op._upsert
+    update = op._doc
+    assert update["$set"]["title"] == "Flaky test"
+    assert update["$set"]["state"] == "open"
+    # Insert-only values and model defaults are only written for new documents
+    assert update["$setOnInsert"]["ai_summary"] == "Summarised once"
+    assert update["$setOnInsert"]["labels"] == []
+    assert not set(update["$set"]) & set(update["$setOnInsert"])
+    assert not {"_id", "repo_id", "number"} & set(update["$setOnInsert"])
+
+
+def test_flush_counts_inserted_updated_and_unchanged(init_db):
+    async def scenario():
+        await init_db(Issue)
+        async with BulkUpserter(Issue, ("repo_id", "number")) as first:
+            for number in (1, 2, 3):
+                await first.add(*_issue(number))
+        async with BulkUpserter(Issue, ("repo_id", "number"), batch_size=2) as second:
+            await second.add(*_issue(1, title="Flaky test on CI"))
+            await second.add(*_issue(2))
+            key, fields, _ = _issue(3, comments=4)
+            await second.add(key, fields, {"ai_summary": "Overwritten"})
+            await second.add(*_issue(4))
+        stored = {issue.number: issue for issue in await Issue.find_all().to_list()}
+        return first.stats, second.stats, stored
+
+    first, second, stored = asyncio.run(scenario())
+    assert first.as_dict() == {"inserted": 3, "updated": 0, "unchanged": 0, "failed": 0}
+    assert second.as_dict() == {"inserted": 1, "updated": 2, "unchanged": 1, "failed": 0}
+    assert stored[1].title == "Flaky test on CI"
+    assert stored[3].comments_count == 4
+    # Updates never touch insert-only fields
+    assert stored[3].ai_summary == "Summarised once"
+    assert len(stored) == 4
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.core import cache
+from app.core.cache import MemoryCache, cached, get_or_compute, invalidate
+
+
+@pytest.fixture(autouse=True)
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", MemoryCache(100))
+
+
+class Counter:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"calls": self.calls}
+
+
+def test_value_is_computed_once_and_copied():
+    async def scenario():
+        compute = Counter()
+        first = await get_or_compute("teams", "k", 60, compute)
+        first["calls"] = 99
+        second = await get_or_compute("teams", "k", 60, compute)
+        return compute.calls, second
+
+    assert asyncio.run(scenario()) == (1, {"calls": 1})
+
+
+def test_invalidate_bumps_only_its_namespace():
+    async def scenario():
+        teams, users = Counter(), Counter()
+        await get_or_compute("teams", "k", 60, teams)
+        await get_or_compute("users", "k", 60, users)
+        await invalidate("teams")
+        await get_or_compute("teams", "k", 60, teams)
+        await get_or_compute("users", "k", 60, users)
+        return teams.calls, users.calls
+
+    assert asyncio.run(scenario()) == (2, 1)
+
+
+def test_result_is_not_stored_when_invalidated_while_computing():
+    async def scenario():
+        compute = Counter(delay=0.05)
+        pending = asyncio.create_task(get_or_compute("teams", "k", 60, compute))
+        await asyncio.sleep(0.01)
+        await invalidate("teams")
+        # The stale result still answers the caller that was waiting for it...
+        assert await pending == {"calls": 1}
+        # ...but the next read computes again
+        return await get_or_compute("teams", "k", 60, compute)
+
+    assert asyncio.run(scenario()) == {"calls": 2}
+
+
+def test_concurrent_misses_share_one_computation():
+    async def scenario():
+        compute = Counter(delay=0.02)
+        results = await asyncio.gather(*(get_or_compute("teams", "k", 60, compute) for _ in range(5)))
+        return compute.calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [{"calls": 1}] * 5
+
+
+def test_cached_invalidates_a_single_entry():
+    calls = []
+
+    @cached("test_cached_entries", ttl=60)
+    async def team_size(team_id, active_only=True):
+        calls.append(team_id)
+        return len(calls)
+
+    async def scenario():
+        await team_size("a")
+        await team_size("b")
+        # Keys come from the bound arguments, so defaults spelled out hit the same entry
+        await team_size("a", active_only=True)
+        await team_size.invalidate("a")
+        await team_size("a")
+        await team_size("b")
+
+    asyncio.run(scenario())
+    assert calls == ["a", "b", "a"]
+    assert team_size.cache_namespace == "test_cached_entries"
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import bson
+
+from app.api.routes.github_insights import _velocity_boundaries
+
+
+def _bson_round_trip(values):
+    """What MongoDB hands back for values it stored (dates keep milliseconds only)"""
+    return bson.decode(bson.encode({"values": values}))["values"]
+
+
+def test_boundaries_survive_bson_round_trip():
+    end = datetime(2026, 10, 17, 12, 30, 45, 82570)
+    boundaries = _velocity_boundaries(end - timedelta(weeks=12), end, timedelta(weeks=1))
+
+    assert len(boundaries) == 13
+    # $bucket returns each bucket's lower boundary as its _id
+    assert _bson_round_trip(boundaries) == boundaries
+
+
+def test_last_bucket_ends_at_range_end():
+    start = datetime(2026, 10, 1, 0, 0, 0, 500)
+    end = datetime(2026, 10, 2, 5, 0, 0, 999999)
+    boundaries = _velocity_boundaries(start, end, timedelta(hours=12))
+
+    assert boundaries == [
+        datetime(2026, 10, 1, 0, 0),
+        datetime(2026, 10, 1, 12, 0),
+        datetime(2026, 10, 2, 0, 0),
+        datetime(2026, 10, 2, 5, 0),
+    ]
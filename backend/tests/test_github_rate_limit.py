@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.github_rate_limit import GitHubRateLimiter, Priority, RateLimitExceeded
+
+
+def test_queued_interactive_request_gives_up_at_its_deadline(monkeypatch):
+    async def scenario():
+        limiter = GitHubRateLimiter(rate=100, burst=10, reserve=0)
+        limiter._pause(0.6)
+
+        # The head of the queue may wait out the pause...
+        monkeypatch.setattr(settings, "GITHUB_INTERACTIVE_MAX_WAIT_SECONDS", 1.0)
+        head = asyncio.create_task(limiter.acquire("core", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        # ...the request queued behind it may not
+        monkeypatch.setattr(settings, "GITHUB_INTERACTIVE_MAX_WAIT_SECONDS", 0.2)
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("core", Priority.INTERACTIVE)
+        gave_up_after = time.monotonic() - started
+
+        await head
+        return gave_up_after
+
+    assert asyncio.run(scenario()) < 0.5
+
+
+def test_interactive_request_raises_when_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_INTERACTIVE_MAX_WAIT_SECONDS", 0.2)
+
+    async def scenario():
+        limiter = GitHubRateLimiter(rate=100, burst=10, reserve=0)
+        limiter._set_budget("core", 5000, 0, time.time() + 3600)
+        results = await asyncio.gather(
+            limiter.acquire("core", Priority.INTERACTIVE),
+            limiter.acquire("core", Priority.INTERACTIVE),
+            return_exceptions=True,
+        )
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RateLimitExceeded) for r in results)
+    assert all(r.wait_seconds > 3000 for r in results)
@@ -0,0 +1,75 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from app.services import report_export
+from app.services.report_export import flatten_report, stream_csv, stream_ndjson, stream_report
+
+REPORT_DATA = {
+    "total_employees": 12,
+    "teams": [
+        {"team_name": "Platform", "total_xp": 340, "top_performers": [{"user_id": "u1", "total_xp": 200}]},
+        {"total_xp": 15},
+    ],
+    "pipeline": {"by_stage": {"Applied": 4, "Hired": 1}, "updated_at": datetime(2026, 10, 17, 9, 30)},
+}
+
+
+async def _rows(rows):
+    for row in rows:
+        yield row
+
+
+async def _collect_list(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def _collect(chunks):
+    return "".join(await _collect_list(chunks))
+
+
+def test_flatten_report_long_format():
+    rows = list(flatten_report(REPORT_DATA))
+
+    assert rows[0] == {"section": "summary", "item": "", "metric": "total_employees", "value": 12}
+    # List entries are labelled by a known key, or by their index
+    assert {"section": "teams", "item": "Platform", "metric": "top_performers[0].total_xp", "value": 200} in rows
+    assert {"section": "teams", "item": "1", "metric": "total_xp", "value": 15} in rows
+    assert {"section": "pipeline", "item": "", "metric": "by_stage.Hired", "value": 1} in rows
+    assert len(rows) == 9
+
+
+def test_stream_csv_batches_rows():
+    rows = list(flatten_report(REPORT_DATA))
+    chunks = asyncio.run(_collect_list(stream_csv(_rows(rows), batch_size=4)))
+
+    # Header plus 9 rows in batches of 4: two full batches and the remainder
+    assert len(chunks) == 3
+    parsed = list(csv.reader(io.StringIO("".join(chunks))))
+    assert parsed[0] == report_export.EXPORT_COLUMNS
+    assert len(parsed) == 10
+    assert ["pipeline", "", "updated_at", "2026-10-17T09:30:00"] in parsed
+
+
+def test_stream_ndjson_one_object_per_line():
+    rows = list(flatten_report(REPORT_DATA))
+    body = asyncio.run(_collect(stream_ndjson(_rows(rows))))
+
+    lines = body.splitlines()
+    assert len(lines) == len(rows)
+    assert json.loads(lines[0]) == rows[0]
+    assert json.loads(lines[-1])["value"] == "2026-10-17 09:30:00"
+
+
+def test_stream_report_reads_generated_data(monkeypatch):
+    async def fake_generate(db, report, force=False):
+        return REPORT_DATA, datetime.utcnow(), True
+
+    monkeypatch.setattr(report_export, "generate_report_data", fake_generate)
+    body = asyncio.run(_collect(stream_report(None, {"report_type": "executive"}, "ndjson")))
+
+    assert [json.loads(line) for line in body.splitlines()] == json.loads(
+        json.dumps(list(flatten_report(REPORT_DATA)), default=str)
+    )
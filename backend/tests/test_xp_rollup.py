@@ -0,0 +1,89 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from beanie import PydanticObjectId
+
+from app.models import XPEvent, XPPeriodTotals, XPRankBucket, XPSource, XPUserTotals
+from app.services import xp_rollup
+from app.services.xp_rank import RANK_WINDOWS, XPRankIndex
+from app.services.xp_rollup import RANK_BUCKET_WIDTH, _bucket_moves, current_streak, streak_from_days
+
+EXPIRES = datetime(2026, 11, 1)
+
+
+def _moves(before, amount):
+    """(bucket, delta) pairs of the bucket updates for one XP change"""
+    return [
+        (op._filter["bucket"], op._doc["$inc"]["users"])
+        for op in _bucket_moves("weekly", "2026-W42", before, amount, EXPIRES)
+    ]
+
+
+def test_first_event_adds_the_user_to_a_bucket():
+    assert _moves(None, 250) == [(250 // RANK_BUCKET_WIDTH, 1)]
+
+
+def test_bucket_moves_only_when_the_bucket_changes():
+    assert _moves({"total_xp": 120}, 5) == []
+    assert _moves({"total_xp": 195}, 10) == [(1, -1), (2, 1)]
+    # Decay can move a user down, below zero included
+    assert _moves({"total_xp": 30}, -40) == [(0, -1), (-1, 1)]
+
+
+def test_bucket_updates_carry_the_period_expiry():
+    op = _bucket_moves("daily", "2026-10-17", None, 1, EXPIRES)[0]
+    assert op._doc["$setOnInsert"] == {"expires_at": EXPIRES}
+    assert op._upsert
+
+
+def test_streak_from_days_counts_the_latest_run():
+    assert streak_from_days([]) == (None, 0)
+    assert streak_from_days(["2026-10-15", "2026-10-17", "2026-10-16", "2026-10-12"]) == ("2026-10-17", 3)
+
+
+def test_current_streak_extends_from_yesterday_and_resets_after_a_gap():
+    totals = XPUserTotals.model_construct(streak_last_day="2026-10-16", streak_days=4)
+    assert current_streak(totals, datetime(2026, 10, 16, 20)) == 4
+    assert current_streak(totals, datetime(2026, 10, 17, 9)) == 5
+    assert current_streak(totals, datetime(2026, 10, 18, 9)) == 0
+
+
+def test_ranks_from_buckets_match_a_full_count(init_db):
+    async def scenario():
+        await init_db(XPEvent, XPUserTotals, XPPeriodTotals, XPRankBucket)
+        rng = random.Random(7)
+        users = [PydanticObjectId() for _ in range(25)]
+        now = datetime.utcnow()
+        # Concurrent events for the same users exercise the returned previous totals
+        await asyncio.gather(*(
+            xp_rollup.record_xp_event(XPEvent(
+                person_id=rng.choice(users),
+                source=XPSource.COMMIT,
+                amount=rng.choice([1, 5, 40, 130, -60]),
+                created_at=now - timedelta(minutes=rng.randint(0, 60)),
+            ))
+            for _ in range(150)
+        ))
+
+        async def mismatches():
+            found = []
+            for window in RANK_WINDOWS:
+                index = XPRankIndex(window, now)
+                for xp in (-50, 0, 1, 99, 100, 250, 1000):
+                    expected = await index._collection().count_documents(index._scope(total_xp={"$gt": xp})) + 1
+                    if await index.rank_for_xp(xp) != expected:
+                        found.append((window, xp))
+            return found
+
+        async def bucket_counts():
+            docs = await XPRankBucket.get_motor_collection().find({"users": {"$ne": 0}}).to_list(None)
+            return sorted((d["window"], d["period_key"], d["bucket"], d["users"]) for d in docs)
+
+        incremental = await bucket_counts()
+        assert await mismatches() == []
+        await xp_rollup.rebuild_rank_buckets()
+        assert await bucket_counts() == incremental
+        assert await mismatches() == []
+
+    asyncio.run(scenario())
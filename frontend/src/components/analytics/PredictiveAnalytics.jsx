@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   Box,
   Button,
@@ -36,30 +36,65 @@ import {
 import { WarningIcon, CheckCircleIcon, InfoIcon } from '@chakra-ui/icons';
 import api from '../../api/client';
 
+const POLL_INTERVAL_MS = 2000;
+
 export default function PredictiveAnalytics() {
   const [loading, setLoading] = useState(false);
   const [predictions, setPredictions] = useState(null);
   const [modelType, setModelType] = useState('all');
   const [error, setError] = useState(null);
+  const [job, setJob] = useState(null);
+  const pollTimer = useRef(null);
+
+  useEffect(() => () => clearTimeout(pollTimer.current), []);
+
+  const pollJob = async (jobId) => {
+    try {
+      const { data } = await api.get(`/analytics/predictive/jobs/${jobId}`);
+      setJob(data);
+      if (data.status === 'completed') {
+        setPredictions(data.result);
+        setLoading(false);
+      } else if (data.status === 'failed' || data.status === 'interrupted') {
+        setError(data.status === 'interrupted'
+          ? 'The analysis was interrupted before it finished'
+          : 'Failed to run predictive analysis');
+        setLoading(false);
+      } else {
+        pollTimer.current = setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+      }
+    } catch (err) {
+      console.error('Failed to load predictive analysis job:', err);
+      setError('Failed to load predictive analysis progress');
+      setLoading(false);
+    }
+  };
 
-  const runPredictiveAnalysis = async () => {
+  const startJob = async (submit) => {
+    clearTimeout(pollTimer.current);
     try {
       setLoading(true);
       setError(null);
-      const response = await api.post('/analytics/predictive/analyze', {
-        model_type: modelType,
-        time_horizon_days: 90,
-        include_recommendations: true
-      });
-      setPredictions(response.data);
+      setJob(null);
+      const response = await submit();
+      pollJob(response.data.job_id);
     } catch (err) {
       console.error('Failed to run predictive analysis:', err);
       setError('Failed to run predictive analysis');
-    } finally {
       setLoading(false);
     }
   };
 
+  const runPredictiveAnalysis = () => startJob(() => api.post('/analytics/predictive/jobs', {
+    model_type: modelType,
+    time_horizon_days: 90,
+    include_recommendations: true
+  }));
+
+  const retryPredictiveAnalysis = () => startJob(
+    () => api.post(`/analytics/predictive/jobs/${job.id}/retry`)
+  );
+
   const getRiskColor = (risk) => {
     switch (risk?.toLowerCase()) {
       case 'high':
@@ -123,6 +158,11 @@ export default function PredictiveAnalytics() {
             <Alert status="error" mb={4}>
               <AlertIcon />
               {error}
+              {job?.can_retry && (
+                <Button size="sm" ml="auto" onClick={retryPredictiveAnalysis}>
+                  Retry
+                </Button>
+              )}
             </Alert>
           )}
 
@@ -136,7 +176,10 @@ export default function PredictiveAnalytics() {
           {loading && (
             <div className="flex justify-center items-center py-12">
               <Spinner size="xl" color="blue.500" />
-              <span className="ml-4 text-gray-600">Analyzing data and generating predictions...</span>
+              <span className="ml-4 text-gray-600">
+                Analyzing data and generating predictions...
+                {job?.progress?.total > 0 && ` (${job.progress.completed} of ${job.progress.total} models done)`}
+              </span>
             </div>
           )}
 